@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Certificate
+from .models import Certificate, RevokedCertificate
 
 @admin.register(Certificate)
 class CertificateAdmin(admin.ModelAdmin):
@@ -8,3 +8,10 @@ class CertificateAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name', 'course__title')
     date_hierarchy = 'issue_date'
     readonly_fields = ('verification_id', 'issue_date', 'created_at', 'updated_at')
+
+
+@admin.register(RevokedCertificate)
+class RevokedCertificateAdmin(admin.ModelAdmin):
+    list_display = ('verification_id', 'revoked_at')
+    search_fields = ('verification_id',)
+    readonly_fields = ('verification_id', 'revoked_at')
@@ -6,3 +6,6 @@ class CertificateConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'certificate'
     verbose_name = _('Сертификаты')
+    
+    def ready(self):
+        from . import signals  # noqa: F401
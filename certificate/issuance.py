@@ -0,0 +1,74 @@
+"""
+Bulk issuance of certificates for students who completed a course.
+
+Completion comes from the denormalized UserProgress counters, so finding
+every student of a course who is owed a certificate is one query, and the
+missing certificates are inserted with bulk_create in batches. PDFs of the
+new certificates are then rendered in parallel.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db.models import Exists, F, OuterRef
+
+from core.background import run_task
+from core.models import UserProgress
+
+from .models import Certificate
+from .pdf import render_certificate_pdf, schedule_certificate_pdf
+
+
+def get_uncertified_completions(course_ids=None):
+    """Completed enrollments that don't have a certificate yet"""
+    enrollments = UserProgress.objects.filter(
+        total_lessons__gt=0,
+        lessons_completed_count__gte=F('total_lessons')
+    ).exclude(
+        Exists(Certificate.objects.filter(user_id=OuterRef('user_id'), course_id=OuterRef('course_id')))
+    )
+    if course_ids is not None:
+        enrollments = enrollments.filter(course_id__in=course_ids)
+    return enrollments
+
+
+def issue_certificates(course_ids=None, batch_size=500):
+    """
+    Create the missing certificates of every completed enrollment.
+    Returns the IDs of the certificates that were created.
+    """
+    pairs = list(get_uncertified_completions(course_ids).values_list('user_id', 'course_id'))
+    if not pairs:
+        return []
+
+    # Conflicts mean someone generated the certificate meanwhile, that's fine.
+    # bulk_create doesn't send post_save, so PDFs are queued by the callers.
+    Certificate.objects.bulk_create(
+        [Certificate(user_id=user_id, course_id=course_id) for user_id, course_id in pairs],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    )
+
+    # PKs aren't returned when conflicts are ignored, look the new rows up
+    certificate_ids = []
+    pairs_by_course = {}
+    for user_id, course_id in pairs:
+        pairs_by_course.setdefault(course_id, []).append(user_id)
+    for course_id, user_ids in pairs_by_course.items():
+        for start in range(0, len(user_ids), batch_size):
+            certificate_ids.extend(Certificate.objects.filter(
+                course_id=course_id, user_id__in=user_ids[start:start + batch_size], pdf_file=''
+            ).values_list('id', flat=True))
+
+    return certificate_ids
+
+
+def queue_certificate_pdfs(certificate_ids):
+    """Queue PDF rendering of certificates in the shared background pool"""
+    return sum(schedule_certificate_pdf(certificate_id) for certificate_id in certificate_ids)
+
+
+def render_certificate_pdfs(certificate_ids, workers=4):
+    """Render PDFs of certificates with a dedicated pool and wait for all of them"""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='certificate-bulk') as executor:
+        futures = [executor.submit(run_task, render_certificate_pdf, certificate_id) for certificate_id in certificate_ids]
+        wait(futures)
+    return sum(1 for future in futures if future.result())
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from certificate.issuance import get_uncertified_completions, issue_certificates, render_certificate_pdfs
+
+
+class Command(BaseCommand):
+    help = 'Issue certificates to every student who completed a course and render their PDFs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course', action='append', type=int, dest='course_ids',
+            help='Only issue certificates for this course ID (can be repeated)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of PDFs rendered in parallel (default: 4)'
+        )
+        parser.add_argument(
+            '--no-pdf', action='store_true',
+            help='Only create the certificates, PDFs are rendered on first download'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the certificates that would be issued'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        
+        if options['dry_run']:
+            count = get_uncertified_completions(options['course_ids']).count()
+            self.stdout.write(f'{count} certificates would be issued')
+            return
+        
+        certificate_ids = issue_certificates(options['course_ids'])
+        self.stdout.write(f'Issued {len(certificate_ids)} certificates')
+        
+        if certificate_ids and not options['no_pdf']:
+            rendered = render_certificate_pdfs(certificate_ids, workers=max(options['workers'], 1))
+            self.stdout.write(f'Rendered {rendered} PDFs')
+        
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificate', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_file',
+            field=models.FileField(blank=True, editable=False, upload_to='certificates/', verbose_name='PDF'),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_version',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
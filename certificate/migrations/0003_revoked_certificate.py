@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificate', '0002_certificate_pdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedCertificate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verification_id', models.UUIDField(unique=True, verbose_name='Verification ID')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, verbose_name='Revoked At')),
+            ],
+            options={
+                'verbose_name': 'Revoked certificate',
+                'verbose_name_plural': 'Revoked certificates',
+            },
+        ),
+    ]
@@ -21,6 +21,9 @@ class Certificate(models.Model):
     issue_date = models.DateField(auto_now_add=True, verbose_name=_('Issue Date'))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated At'))
+    # Rendered PDF and the version it was rendered for (see certificate/pdf.py)
+    pdf_file = models.FileField(upload_to='certificates/', blank=True, editable=False, verbose_name=_('PDF'))
+    pdf_version = models.CharField(max_length=32, blank=True, editable=False)
     
     class Meta:
         verbose_name = _('Certificate')
@@ -30,3 +33,16 @@ class Certificate(models.Model):
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.course.title}"
+
+
+class RevokedCertificate(models.Model):
+    """Verification ID of a deleted certificate, whose signed tokens must no longer verify"""
+    verification_id = models.UUIDField(unique=True, verbose_name=_('Verification ID'))
+    revoked_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Revoked At'))
+    
+    class Meta:
+        verbose_name = _('Revoked certificate')
+        verbose_name_plural = _('Revoked certificates')
+    
+    def __str__(self):
+        return str(self.verification_id)
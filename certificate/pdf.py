@@ -0,0 +1,133 @@
+"""
+Server-side PDF rendering of certificates.
+
+A certificate is rendered once with WeasyPrint from the print template and
+stored as a file. The stored PDF is tagged with a version built from the
+template source and the data printed on it, so a redesign or a renamed
+course re-renders it while every other download serves the stored file.
+Rendering runs in a background pool, started when the certificate is
+created or when a download finds no current PDF.
+"""
+import hashlib
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone, translation
+
+from core.background import submit_on_commit
+
+from .models import Certificate
+
+logger = logging.getLogger(__name__)
+
+CERTIFICATE_TEMPLATE = 'certificate/certificate_pdf.html'
+RENDER_LOCK_TIMEOUT = 60 * 5
+
+
+class PDFRenderingUnavailable(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_template_version():
+    """Fingerprint of the certificate template source"""
+    source = get_template(CERTIFICATE_TEMPLATE).template.source
+    return hashlib.md5(source.encode()).hexdigest()[:12]
+
+
+def get_pdf_version(certificate):
+    """Version of the PDF a certificate should have now"""
+    data = '|'.join([
+        get_template_version(),
+        str(certificate.verification_id),
+        certificate.user.get_full_name(),
+        certificate.course.title,
+        certificate.issue_date.isoformat(),
+    ])
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def has_current_pdf(certificate):
+    return bool(certificate.pdf_file) and certificate.pdf_version == get_pdf_version(certificate)
+
+
+def reject_remote_urls(url):
+    # Rendering must never wait on the network, remote images are left out
+    from weasyprint import default_url_fetcher
+
+    if not url.startswith(('file:', 'data:')):
+        raise ValueError(f'Remote resources are not fetched: {url}')
+    return default_url_fetcher(url)
+
+
+def render_pdf(certificate):
+    """Render the PDF bytes of a certificate"""
+    try:
+        from weasyprint import HTML
+    except (ImportError, OSError) as exc:
+        # WeasyPrint needs Pango and friends installed on the system
+        raise PDFRenderingUnavailable(str(exc))
+
+    context = {
+        'certificate': certificate,
+        'course': certificate.course,
+        'user': certificate.user,
+        'today': timezone.now(),
+        'print_version': True,
+    }
+    with translation.override(certificate.course.language):
+        html = render_to_string(CERTIFICATE_TEMPLATE, context)
+
+    return HTML(string=html, base_url=str(settings.BASE_DIR), url_fetcher=reject_remote_urls).write_pdf()
+
+
+def render_certificate_pdf(certificate_id):
+    """Render and store the PDF of a certificate unless a current one exists"""
+    certificate = Certificate.objects.select_related('user', 'course').filter(pk=certificate_id).first()
+    if certificate is None:
+        return None
+
+    version = get_pdf_version(certificate)
+    if certificate.pdf_file and certificate.pdf_version == version:
+        return certificate.pdf_file.name
+
+    try:
+        pdf = render_pdf(certificate)
+    except PDFRenderingUnavailable as exc:
+        # Keep the render lock, so downloads don't retry until it expires
+        logger.warning('Certificate PDF rendering is unavailable: %s', exc)
+        return None
+    except Exception:
+        cache.delete(_render_lock_key(certificate_id))
+        raise
+
+    old_name = certificate.pdf_file.name
+    name = certificate.pdf_file.storage.save(
+        f'certificates/{certificate.verification_id}-{version[:12]}.pdf', ContentFile(pdf)
+    )
+    # A plain update keeps updated_at and doesn't send signals
+    Certificate.objects.filter(pk=certificate_id).update(pdf_file=name, pdf_version=version)
+    if old_name and old_name != name:
+        certificate.pdf_file.storage.delete(old_name)
+    cache.delete(_render_lock_key(certificate_id))
+    return name
+
+
+def _render_lock_key(certificate_id):
+    return f'certificate_pdf_rendering_{certificate_id}'
+
+
+def schedule_certificate_pdf(certificate_id):
+    """Render the PDF of a certificate in the background, at most once at a time"""
+    if not cache.add(_render_lock_key(certificate_id), True, RENDER_LOCK_TIMEOUT):
+        return False
+
+    submit_on_commit(
+        'certificate-rendering', getattr(settings, 'CERTIFICATE_RENDER_WORKERS', 1),
+        render_certificate_pdf, certificate_id
+    )
+    return True
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Certificate
+from .pdf import schedule_certificate_pdf
+from .verification import forget_certificate, revoke_certificate
+
+
+# Render the PDF right away, so the first download doesn't wait for it
+@receiver(post_save, sender=Certificate)
+def certificate_saved(sender, instance, created, **kwargs):
+    if created:
+        schedule_certificate_pdf(instance.pk)
+    forget_certificate(instance.verification_id)
+
+
+# Tokens of deleted certificates must stop verifying
+@receiver(post_delete, sender=Certificate)
+def certificate_deleted(sender, instance, **kwargs):
+    revoke_certificate(instance.verification_id)
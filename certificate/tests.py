@@ -1,3 +1,62 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from certificate.models import Certificate
+from certificate.verification import make_verification_token, verify_id, verify_token
+from core import query_budgets
+from core.models import Course, CustomUser
+from core.query_budgets import Budget
+
+
+class CertificateQueryBudgetTests(query_budgets.QueryBudgetTestCase):
+    urlconf = 'certificate.urls'
+    url_prefix = '/certificate/'
+    budgets = {
+        'generate/<int:course_id>/': Budget(5, course_id='course'),
+        'view/<int:certificate_id>/': Budget(5, certificate_id='certificate'),
+        'verify/': 2,
+        'api/verify/': 0,
+        'download/<int:certificate_id>/': Budget(3, certificate_id='certificate'),
+    }
+
+
+class CertificateVerificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        student = CustomUser.objects.create_user('student', password='password', first_name='Айгуль', last_name='Ибраева')
+        cls.course = Course.objects.create(title='Course', description='', author=author)
+        cls.certificate = Certificate.objects.create(user=student, course=cls.course)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_signed_token(self):
+        token = make_verification_token(self.certificate)
+        result = verify_token(token)
+        self.assertEqual(result['verification_id'], str(self.certificate.verification_id))
+        self.assertEqual(result['holder'], 'Айгуль Ибраева')
+        self.assertEqual(result['course_id'], self.course.pk)
+
+        self.assertIsNone(verify_token(token[:-2] + 'xx'))
+        self.assertIsNone(verify_token('not a token'))
+
+    def test_verification_id(self):
+        self.assertEqual(verify_id(self.certificate.verification_id)['course'], 'Course')
+        self.assertIsNone(verify_id('00000000-0000-0000-0000-000000000000'))
+        self.assertIsNone(verify_id('not an id'))
+
+    def test_deleted_certificate_no_longer_verifies(self):
+        token = make_verification_token(self.certificate)
+        verification_id = self.certificate.verification_id
+        self.assertIsNotNone(verify_token(token))
+        self.assertIsNotNone(verify_id(verification_id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.certificate.delete()
+
+        self.assertIsNone(verify_token(token))
+        self.assertIsNone(verify_id(verification_id))
+        # Revocation is stored in the database, not only in this process's cache
+        cache.clear()
+        self.assertIsNone(verify_token(token))
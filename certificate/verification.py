@@ -0,0 +1,122 @@
+"""
+Public certificate verification.
+
+A certificate can be verified two ways. The signed verification token
+carries the holder, course and issue date and is checked with the secret
+key, plus a lookup of its verification ID among the revoked certificates.
+A plain verification ID is looked up through the cache: both found and
+unknown IDs are cached, so repeated checks of the same ID don't reach the
+database.
+
+Deleted certificates are recorded in RevokedCertificate by the signals in
+certificate/signals.py. The cache only saves database lookups: it may not
+be shared by the processes, so cached results expire after a few minutes
+and a deletion is seen everywhere within that time.
+"""
+import uuid
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Certificate, RevokedCertificate
+
+TOKEN_SALT = 'certificate.verification'
+
+FOUND_CACHE_TIMEOUT = 60 * 5
+MISSING_CACHE_TIMEOUT = 60 * 5
+REVOCATION_CACHE_TIMEOUT = 60
+MISSING = 'missing'
+
+
+def get_certificate_data(certificate):
+    """Public details of a certificate shown by the verification endpoint"""
+    return {
+        'verification_id': str(certificate.verification_id),
+        'holder': certificate.user.get_full_name(),
+        'course': certificate.course.title,
+        'course_id': certificate.course_id,
+        'issue_date': certificate.issue_date.isoformat(),
+    }
+
+
+def make_verification_token(certificate):
+    """Compact signed token with the public details of a certificate"""
+    data = get_certificate_data(certificate)
+    return signing.dumps(
+        [uuid.UUID(data['verification_id']).hex, data['holder'], data['course'], data['course_id'], data['issue_date']],
+        salt=TOKEN_SALT,
+        compress=True
+    )
+
+
+def _result_key(verification_id):
+    return f'certificate_verification_{verification_id}'
+
+
+def _revoked_key(verification_id):
+    return f'certificate_revoked_{verification_id}'
+
+
+def verify_token(token):
+    """Return the certificate details of a valid token, or None"""
+    try:
+        verification_hex, holder, course, course_id, issue_date = signing.loads(token, salt=TOKEN_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+    verification_id = str(uuid.UUID(verification_hex))
+    if is_revoked(verification_id):
+        return None
+
+    return {
+        'verification_id': verification_id,
+        'holder': holder,
+        'course': course,
+        'course_id': course_id,
+        'issue_date': issue_date,
+    }
+
+
+def verify_id(verification_id):
+    """Return the certificate details of a verification ID, or None"""
+    try:
+        verification_id = str(uuid.UUID(str(verification_id)))
+    except ValueError:
+        return None
+
+    cache_key = _result_key(verification_id)
+    result = cache.get(cache_key)
+    if result is None:
+        certificate = Certificate.objects.select_related('user', 'course').filter(
+            verification_id=verification_id
+        ).first()
+        if certificate is None:
+            cache.set(cache_key, MISSING, MISSING_CACHE_TIMEOUT)
+            return None
+        result = get_certificate_data(certificate)
+        cache.set(cache_key, result, FOUND_CACHE_TIMEOUT)
+
+    return None if result == MISSING else result
+
+
+def is_revoked(verification_id):
+    """Whether the certificate of a verification ID was deleted"""
+    cache_key = _revoked_key(verification_id)
+    revoked = cache.get(cache_key)
+    if revoked is None:
+        revoked = RevokedCertificate.objects.filter(verification_id=verification_id).exists()
+        cache.set(cache_key, revoked, REVOCATION_CACHE_TIMEOUT)
+    return revoked
+
+
+def forget_certificate(verification_id):
+    """Drop the cached verification result of a certificate once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_result_key(verification_id)))
+
+
+def revoke_certificate(verification_id):
+    """Make the tokens of a deleted certificate fail verification"""
+    RevokedCertificate.objects.get_or_create(verification_id=verification_id)
+    forget_certificate(verification_id)
+    transaction.on_commit(lambda: cache.set(_revoked_key(verification_id), True, REVOCATION_CACHE_TIMEOUT))
@@ -1,13 +1,19 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
 from django.views.decorators.http import require_GET
 from django.utils import timezone
 import uuid
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework.views import APIView
 
 from .models import Certificate
+from .pdf import has_current_pdf, schedule_certificate_pdf
+from .verification import make_verification_token, verify_id, verify_token
 from core.models import CustomUser, Course, UserProgress
 
 
@@ -51,6 +57,7 @@ def view_certificate(request, certificate_id):
         'certificate': certificate,
         'course': certificate.course,
         'user': certificate.user,
+        'verification_token': make_verification_token(certificate),
     }
     
     return render(request, 'certificate/certificate_view.html', context)
@@ -66,7 +73,7 @@ def verify_certificate(request):
         try:
             # Convert string to UUID
             uuid_obj = uuid.UUID(verification_id)
-            certificate = Certificate.objects.filter(verification_id=uuid_obj).first()
+            certificate = Certificate.objects.select_related('user', 'course').filter(verification_id=uuid_obj).first()
         except (ValueError, TypeError):
             # If verification_id is not a valid UUID
             pass
@@ -79,16 +86,59 @@ def verify_certificate(request):
     return render(request, 'certificate/certificate_verify.html', context)
 
 
+class CertificateVerifyThrottle(SimpleRateThrottle):
+    """Limits verification requests per client IP, signed in or not"""
+    scope = 'certificate_verify'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class CertificateVerifyAPIView(APIView):
+    """
+    Public JSON verification of a certificate by signed token (?token=)
+    or by verification ID (?verification_id=)
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = [CertificateVerifyThrottle]
+
+    def get(self, request):
+        token = request.query_params.get('token', '').strip()
+        verification_id = request.query_params.get('verification_id', '').strip()
+
+        if token:
+            certificate = verify_token(token)
+        elif verification_id:
+            certificate = verify_id(verification_id)
+        else:
+            return Response({'detail': _('Pass a token or a verification_id.')}, status=400)
+
+        if certificate is None:
+            return Response({'valid': False}, status=404)
+        return Response({'valid': True, 'certificate': certificate})
+
+
 @login_required
 def download_certificate(request, certificate_id):
-    """Download certificate as HTML for printing"""
-    certificate = get_object_or_404(Certificate, id=certificate_id)
+    """Download the rendered PDF of a certificate, or the printable HTML while it is rendered"""
+    certificate = get_object_or_404(Certificate.objects.select_related('user', 'course'), id=certificate_id)
     
     # Ensure the user is either the certificate owner or an admin
     if request.user != certificate.user and not request.user.is_staff:
         messages.error(request, _('You do not have permission to download this certificate.'))
         return redirect('home')
     
+    if request.GET.get('format') != 'html':
+        if has_current_pdf(certificate):
+            return FileResponse(
+                certificate.pdf_file.open('rb'),
+                as_attachment=True,
+                filename=f'certificate-{certificate.verification_id}.pdf',
+                content_type='application/pdf'
+            )
+        schedule_certificate_pdf(certificate.id)
+    
     # Prepare context for the template
     context = {
         'certificate': certificate,
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils.translation import gettext_lazy as _
 from .models import (
     CustomUser, Course, Material, Comment, Test, 
     Question, Answer, Certificate, UserProgress
@@ -37,12 +38,22 @@ class CourseAdmin(admin.ModelAdmin):
     list_filter = ('is_published', 'language', 'created_at')
     search_fields = ('title', 'description', 'author__username')
     inlines = [MaterialInline, TestInline]
+    actions = ['issue_certificates']
+    
+    @admin.action(description=_('Выдать сертификаты завершившим курс'))
+    def issue_certificates(self, request, queryset):
+        from certificate.issuance import issue_certificates, queue_certificate_pdfs
+        
+        certificate_ids = issue_certificates(list(queryset.values_list('id', flat=True)))
+        queue_certificate_pdfs(certificate_ids)
+        self.message_user(request, _('Выдано сертификатов: %(count)d') % {'count': len(certificate_ids)})
 
 @admin.register(Material)
 class MaterialAdmin(admin.ModelAdmin):
-    list_display = ('name', 'material_type', 'course', 'author', 'language', 'created_at')
-    list_filter = ('material_type', 'language', 'created_at')
+    list_display = ('name', 'material_type', 'course', 'author', 'language', 'extraction_status', 'created_at')
+    list_filter = ('material_type', 'language', 'extraction_status', 'created_at')
     search_fields = ('name', 'description', 'author__username')
+    readonly_fields = ('content_hash', 'extraction_status')
 
 @admin.register(Test)
 class TestAdmin(admin.ModelAdmin):
@@ -78,7 +89,7 @@ class CertificateAdmin(admin.ModelAdmin):
 
 @admin.register(UserProgress)
 class UserProgressAdmin(admin.ModelAdmin):
-    list_display = ('user', 'course', 'last_access')
+    list_display = ('user', 'course', 'completion_percentage', 'last_access')
     list_filter = ('course', 'last_access')
     search_fields = ('user__username', 'course__title')
     filter_horizontal = ('materials_completed', 'tests_completed')
@@ -0,0 +1,47 @@
+"""
+Small thread pools for work that shouldn't run inside a request.
+
+Tasks are submitted once the current transaction commits, so they always
+see the rows that scheduled them. Each pool has its own size, configured
+in settings; a size of 0 runs tasks inline, which is what tests and
+SQLite development databases usually want.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(pool_name, max_workers):
+    with _executors_lock:
+        if pool_name not in _executors:
+            _executors[pool_name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=pool_name)
+        return _executors[pool_name]
+
+
+def run_task(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    except Exception:
+        logger.exception('Background task %s%r failed', func.__name__, args)
+    finally:
+        # Drop this thread's connection if it broke or outlived CONN_MAX_AGE
+        close_old_connections()
+
+
+def submit_on_commit(pool_name, max_workers, func, *args):
+    """Run func(*args) in the named pool once the current transaction commits"""
+    def submit():
+        if max_workers > 0:
+            get_executor(pool_name, max_workers).submit(run_task, func, *args)
+        else:
+            func(*args)
+
+    transaction.on_commit(submit)
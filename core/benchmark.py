@@ -0,0 +1,390 @@
+"""
+HTTP load benchmark of the hot student endpoints.
+
+The benchmark replays scripted student sessions against a running server:
+log in, open the dashboard, the course list API and the course page, step
+through a few lessons marking every step completed, then take the quiz of
+the module question by question. Sessions run concurrently, each with its
+own cookies and connection, and every request is timed. The number of
+queries comes from the Server-Timing header added by
+QueryInstrumentationMiddleware.
+
+The plans (which student studies which lessons and answers which quiz) are
+built from the database with a fixed seed, so runs against a freshly
+generated dataset replay the same sessions.
+"""
+import http.client
+import json
+import math
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Count, F
+
+from .load_dataset import student_username
+from .models import Lesson, UserProgress
+
+# Endpoints in the order a session visits them
+ENDPOINTS = [
+    'login', 'dashboard', 'course_list_api', 'course_detail',
+    'lesson_detail', 'mark_step_completed', 'take_quiz', 'submit_answer',
+]
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+ATTEMPT_RE = re.compile(r'/quiz/attempts/(\d+)/submit/')
+SERVER_START_TIMEOUT = 30
+
+# The server runs with DEBUG off, as in production, behind an HTTPS proxy
+PROXY_HEADERS = {'X-Forwarded-Proto': 'https'}
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+# Session plans
+
+def build_session_plans(count, lessons_per_session=2, seed=1):
+    """
+    Plans of count sessions, each for a different student with an
+    unfinished enrollment: the next lessons to study with their number of
+    steps and the quiz of the module those lessons belong to.
+    """
+    from quiz.models import Choice, Quiz
+
+    enrollments = list(UserProgress.objects.filter(
+        user__role='student',
+        course__is_published=True,
+        lessons_completed_count__lt=F('total_lessons')
+    ).order_by('user_id', 'course_id').values_list('pk', 'user__username', 'course_id'))
+
+    # One enrollment per student
+    by_user = {}
+    for progress_id, username, course_id in enrollments:
+        by_user.setdefault(username, (progress_id, username, course_id))
+    rng = random.Random(seed)
+    chosen = sorted(by_user.values())
+    chosen = rng.sample(chosen, min(count, len(chosen)))
+    if not chosen:
+        return []
+
+    course_ids = {course_id for _, _, course_id in chosen}
+    lessons = defaultdict(list)
+    for course_id, lesson_id, module_id, steps in Lesson.objects.filter(
+        module__course_id__in=course_ids
+    ).annotate(step_count=Count('steps')).order_by('module__order', 'order').values_list(
+        'module__course_id', 'pk', 'module_id', 'step_count'
+    ):
+        lessons[course_id].append((lesson_id, module_id, steps))
+
+    completed = defaultdict(set)
+    through = UserProgress.lessons_completed.through
+    for progress_id, lesson_id in through.objects.filter(
+        userprogress_id__in=[progress_id for progress_id, _, _ in chosen]
+    ).values_list('userprogress_id', 'lesson_id'):
+        completed[progress_id].add(lesson_id)
+
+    quizzes = dict(Quiz.objects.filter(
+        course_id__in=course_ids, module__isnull=False
+    ).values_list('module_id', 'pk'))
+    questions = defaultdict(dict)
+    for quiz_id, question_id, choice_id, is_correct in Choice.objects.filter(
+        question__quiz_id__in=quizzes.values()
+    ).order_by('question__order', 'question_id', 'pk').values_list(
+        'question__quiz_id', 'question_id', 'pk', 'is_correct'
+    ):
+        question = questions[quiz_id].setdefault(question_id, {'id': question_id, 'correct': None, 'wrong': []})
+        if is_correct:
+            question['correct'] = choice_id
+        else:
+            question['wrong'].append(choice_id)
+
+    plans = []
+    for progress_id, username, course_id in chosen:
+        remaining = [lesson for lesson in lessons[course_id] if lesson[0] not in completed[progress_id]]
+        studied = remaining[:lessons_per_session]
+        quiz_id = quizzes.get(studied[0][1]) if studied else None
+        plans.append({
+            'username': username,
+            'course_id': course_id,
+            'lessons': [(lesson_id, steps) for lesson_id, _, steps in studied],
+            'quiz_id': quiz_id,
+            'questions': list(questions[quiz_id].values()) if quiz_id else [],
+            'seed': rng.getrandbits(32),
+        })
+    return plans
+
+
+# HTTP client
+
+class BenchmarkSession:
+    """One student's connection and cookies; records every request it makes"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+        self.records = []
+
+    def request(self, endpoint, method, path, body=None, headers=None):
+        headers = {
+            **PROXY_HEADERS,
+            'Host': f'{self.host}:{self.port}',
+            # Secure requests are CSRF-checked against the referer
+            'Referer': f'https://{self.host}:{self.port}/',
+            **(headers or {}),
+        }
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.records.append((endpoint, 0, time.perf_counter() - start, None))
+            return 0, b''
+        elapsed = time.perf_counter() - start
+
+        # Secure cookies aren't sent back over plain HTTP by cookie jars, keep them by hand
+        for header in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = header.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+
+        match = QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+        self.records.append((endpoint, response.status, elapsed, int(match.group(1)) if match else None))
+        return response.status, content
+
+    def get(self, endpoint, path):
+        return self.request(endpoint, 'GET', path)
+
+    def post_form(self, endpoint, path, data):
+        data = {'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''), **data}
+        return self.request(endpoint, 'POST', path, urlencode(data, doseq=True), {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        })
+
+    def post_json(self, endpoint, path, data):
+        return self.request(endpoint, 'POST', path, json.dumps(data), {
+            'Content-Type': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest',
+            'X-CSRFToken': self.cookies.get('csrftoken', ''),
+        })
+
+    def close(self):
+        self.connection.close()
+
+
+def run_session(host, port, plan, password, think_time=0):
+    """Replay one student session, returns its request records"""
+    rng = random.Random(plan['seed'])
+    session = BenchmarkSession(host, port)
+
+    def think():
+        if think_time:
+            time.sleep(rng.uniform(0.5, 1.5) * think_time)
+
+    try:
+        # The login page sets the CSRF cookie, it isn't part of the measured flow
+        session.request(None, 'GET', '/login/')
+        status, _ = session.post_form('login', '/login/', {'username': plan['username'], 'password': password})
+        if status != 302:
+            return session.records
+
+        session.get('dashboard', '/dashboard/')
+        think()
+        session.get('course_list_api', '/api/courses/')
+        session.get('course_detail', f"/courses/{plan['course_id']}/")
+        think()
+
+        for lesson_id, steps in plan['lessons']:
+            for step in range(1, steps + 1):
+                session.get('lesson_detail', f'/lessons/{lesson_id}/?step={step}')
+                think()
+                session.post_json('mark_step_completed', '/mark-step-completed/', {'lesson_id': lesson_id, 'step': step})
+
+        if plan['quiz_id']:
+            status, content = session.get('take_quiz', f"/quiz/{plan['quiz_id']}/take/")
+            match = ATTEMPT_RE.search(content.decode('utf-8', 'replace'))
+            if status == 200 and match:
+                attempt_id = match.group(1)
+                for number, question in enumerate(plan['questions'], 1):
+                    think()
+                    correct = rng.random() < 0.7 or not question['wrong']
+                    choice_id = question['correct'] if correct else rng.choice(question['wrong'])
+                    session.post_form('submit_answer', f'/quiz/attempts/{attempt_id}/submit/', {
+                        'question_id': question['id'], 'choice_id': choice_id,
+                    })
+                    # The answer redirects to the next question, the last one to the results
+                    if number < len(plan['questions']):
+                        session.get('take_quiz', f"/quiz/{plan['quiz_id']}/take/")
+    finally:
+        session.close()
+
+    return session.records
+
+
+def run_sessions(host, port, plans, password, concurrency, think_time=0):
+    """Replay sessions with concurrency of them at a time; returns the records and the wall time"""
+    started = time.perf_counter()
+    records = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark') as executor:
+        for session_records in executor.map(
+            lambda plan: run_session(host, port, plan, password, think_time), plans
+        ):
+            records.extend(record for record in session_records if record[0] is not None)
+    return records, time.perf_counter() - started
+
+
+# Results
+
+def summarize(records, duration):
+    """Latency percentiles, throughput and queries per request of each endpoint"""
+    by_endpoint = defaultdict(list)
+    for record in records:
+        by_endpoint[record[0]].append(record)
+
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        endpoint_records = by_endpoint.get(endpoint)
+        if not endpoint_records:
+            continue
+        latencies = sorted(elapsed * 1000 for _, _, elapsed, _ in endpoint_records)
+        queries = [count for _, _, _, count in endpoint_records if count is not None]
+        statuses = defaultdict(int)
+        for _, status, _, _ in endpoint_records:
+            statuses[str(status)] += 1
+        endpoints[endpoint] = {
+            'requests': len(endpoint_records),
+            'errors': sum(1 for _, status, _, _ in endpoint_records if not status or status >= 400),
+            'statuses': dict(statuses),
+            'throughput': round(len(endpoint_records) / duration, 2),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'mean': round(sum(latencies) / len(latencies), 2),
+                'max': round(latencies[-1], 2),
+            },
+            'queries': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+        }
+
+    return {
+        'duration': round(duration, 2),
+        'requests': len(records),
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'throughput': round(len(records) / duration, 2) if duration else 0,
+        'endpoints': endpoints,
+    }
+
+
+def compare(previous, current):
+    """Rows of (endpoint, metric, previous, current, change in %) for two results"""
+    rows = []
+    for endpoint, stats in current['endpoints'].items():
+        old = previous.get('endpoints', {}).get(endpoint)
+        if not old:
+            continue
+        for metric, old_value, new_value in (
+            ('p50', old['latency_ms']['p50'], stats['latency_ms']['p50']),
+            ('p95', old['latency_ms']['p95'], stats['latency_ms']['p95']),
+            ('p99', old['latency_ms']['p99'], stats['latency_ms']['p99']),
+            ('queries', old['queries']['mean'], stats['queries']['mean']),
+        ):
+            if old_value is None or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            rows.append((endpoint, metric, old_value, new_value, round(change, 1)))
+    return rows
+
+
+# Server
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, env):
+    """Start the app with gunicorn, or the development server where gunicorn isn't available"""
+    try:
+        import gunicorn  # noqa: F401
+        command = [
+            sys.executable, '-m', 'gunicorn', 'online_academy_backend.wsgi',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning',
+        ]
+    except ImportError:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+
+def wait_for_server(port, process, timeout=SERVER_START_TIMEOUT):
+    """Wait until the server answers; False if it exited or didn't start in time"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/login/', headers=PROXY_HEADERS)
+            connection.getresponse().read()
+            connection.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def is_local_database(database):
+    return database['ENGINE'].endswith('sqlite3') or database.get('HOST') in ('', None, 'localhost', '127.0.0.1', '::1')
+
+
+def get_dataset_size():
+    from quiz.models import QuizAttempt
+
+    from .models import Course, CustomUser, StepCompletion
+
+    return {
+        'students': CustomUser.objects.filter(username__startswith=student_username('')).count(),
+        'courses': Course.objects.count(),
+        'lessons': Lesson.objects.count(),
+        'step_completions': StepCompletion.objects.count(),
+        'quiz_attempts': QuizAttempt.objects.count(),
+    }
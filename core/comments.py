@@ -0,0 +1,77 @@
+"""
+Comment thread loading for materials.
+
+Comments store a materialized path (see Comment.path), so a whole thread
+comes back depth-first from one query ordered by path and the tree is put
+together in memory. Each comment gets a thread_replies list with its
+direct replies.
+"""
+from rest_framework.pagination import CursorPagination
+
+from .models import Comment
+
+
+class CommentCursorPagination(CursorPagination):
+    """Cursor pagination over top-level comments in thread order"""
+    ordering = 'path'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def build_comment_tree(comments):
+    """
+    Attach every comment to its parent's thread_replies and return the roots.
+    Comments must be ordered by path, so parents come before their replies.
+    """
+    by_id = {}
+    roots = []
+    for comment in comments:
+        comment.thread_replies = []
+        by_id[comment.id] = comment
+        parent = by_id.get(comment.parent_id)
+        if parent is not None:
+            parent.thread_replies.append(comment)
+        else:
+            roots.append(comment)
+    return roots
+
+
+def get_material_thread(material_id):
+    """Return the top-level comments of a material with all replies attached"""
+    comments = Comment.objects.filter(material_id=material_id).select_related('author').order_by('path')
+    return build_comment_tree(comments)
+
+
+def attach_replies(roots):
+    """
+    Load the replies of a page of top-level comments with one query.
+    The roots must be ordered by path; their descendants all fall between
+    the first root's path and the end of the last root's subtree.
+    """
+    roots = list(roots)
+    if not roots:
+        return roots
+
+    root_paths = {root.path for root in roots}
+    replies = Comment.objects.filter(
+        material_id__in={root.material_id for root in roots},
+        path__gt=roots[0].path,
+        path__lt=roots[-1].path + '~',  # '~' sorts after the digits and '/'
+        parent__isnull=False
+    ).select_related('author').order_by('path')
+
+    # Roots of other materials can fall in the same range, keep only our threads
+    replies = [reply for reply in replies if reply.root_path in root_paths]
+
+    build_comment_tree(roots + replies)
+    return roots
+
+
+def attach_subtree(comment):
+    """Load every reply below a single comment with one query"""
+    replies = Comment.objects.filter(
+        material_id=comment.material_id, path__startswith=comment.path, parent__isnull=False
+    ).exclude(pk=comment.pk).select_related('author').order_by('path')
+    build_comment_tree([comment] + list(replies))
+    return comment
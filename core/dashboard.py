@@ -0,0 +1,151 @@
+"""
+Data service for the student and parent dashboard.
+
+All enrollment stats, next lessons and course durations are computed with
+grouped queries and set lookups, so the number of queries stays the same
+however many courses the user is enrolled in.
+"""
+from django.db.models import Sum
+
+from .models import Course, Lesson, Certificate, UserProgress
+
+
+def get_course_summaries(course_ids):
+    """
+    Return {course_id: summary} with the ordered lessons, lesson count and
+    total duration (lessons plus module quizzes) of every course.
+    """
+    from quiz.models import Quiz
+
+    summaries = {
+        course_id: {'lessons': [], 'lesson_count': 0, 'total_duration': 0}
+        for course_id in course_ids
+    }
+    if not summaries:
+        return summaries
+
+    lessons = Lesson.objects.filter(module__course_id__in=summaries).order_by(
+        'module__course_id', 'module__order', 'order'
+    ).values('id', 'title', 'estimated_time', 'module__course_id')
+
+    for lesson in lessons:
+        summary = summaries[lesson['module__course_id']]
+        summary['lessons'].append(lesson)
+        summary['lesson_count'] += 1
+        summary['total_duration'] += lesson['estimated_time']
+
+    quiz_durations = Quiz.objects.filter(
+        course_id__in=summaries, module__isnull=False
+    ).values('course_id').annotate(duration=Sum('time_limit')).values_list('course_id', 'duration')
+
+    for course_id, duration in quiz_durations:
+        summaries[course_id]['total_duration'] += duration or 0
+
+    return summaries
+
+
+def get_completed_lessons_by_progress(progress_ids):
+    """Return {user_progress_id: set of completed lesson IDs}"""
+    completed = {progress_id: set() for progress_id in progress_ids}
+    if not completed:
+        return completed
+
+    through = UserProgress.lessons_completed.through
+    for progress_id, lesson_id in through.objects.filter(
+        userprogress_id__in=completed
+    ).values_list('userprogress_id', 'lesson_id'):
+        completed[progress_id].add(lesson_id)
+
+    return completed
+
+
+def get_student_dashboard_data(user):
+    """Return the dashboard context of a student or parent"""
+    user_progress_list = list(UserProgress.objects.filter(user=user).select_related('course'))
+
+    completed_by_progress = get_completed_lessons_by_progress([progress.id for progress in user_progress_list])
+
+    # Suggested courses are summarized together with the enrolled ones
+    enrolled_ids = [progress.course_id for progress in user_progress_list]
+    suggested_courses = list(
+        Course.objects.filter(is_published=True).exclude(id__in=enrolled_ids).order_by('-created_at')[:3]
+    )
+    summaries = get_course_summaries(enrolled_ids + [course.id for course in suggested_courses])
+
+    enrolled_courses = []
+    completed_lessons_count = 0
+    total_lessons_count = 0
+    completed_quizzes_count = 0
+    total_quizzes_count = 0
+
+    for progress in user_progress_list:
+        summary = summaries[progress.course_id]
+        completed_lesson_ids = completed_by_progress[progress.id]
+
+        # Find next lesson to continue
+        next_lesson = next(
+            (lesson for lesson in summary['lessons'] if lesson['id'] not in completed_lesson_ids), None
+        )
+
+        enrolled_courses.append({
+            'course': progress.course,
+            'progress_percentage': progress.completion_percentage,
+            'last_access': progress.last_access,
+            'next_lesson': next_lesson,
+            'total_duration': summary['total_duration'],
+        })
+
+        # Update statistics from the stored counters
+        completed_lessons_count += progress.lessons_completed_count
+        total_lessons_count += progress.total_lessons
+        completed_quizzes_count += progress.quizzes_completed_count
+        total_quizzes_count += progress.total_quizzes
+
+    certificates = list(Certificate.objects.filter(user=user).select_related('course').order_by('-issued_at'))
+
+    # Calculate averages for statistics
+    completed_lessons_percentage = 0
+    if total_lessons_count > 0:
+        completed_lessons_percentage = (completed_lessons_count / total_lessons_count) * 100
+
+    completed_quizzes_percentage = 0
+    if total_quizzes_count > 0:
+        completed_quizzes_percentage = (completed_quizzes_count / total_quizzes_count) * 100
+
+    # Find next content to study
+    next_content = None
+    for enrollment in enrolled_courses:
+        if enrollment['next_lesson']:
+            next_content = {
+                'type': 'lesson',
+                'title': enrollment['next_lesson']['title'],
+                'course': enrollment['course'],
+                'estimated_time': enrollment['next_lesson']['estimated_time'],
+                'url': f"/lessons/{enrollment['next_lesson']['id']}/"
+            }
+            break
+
+    return {
+        'enrolled_courses': enrolled_courses,
+        'enrolled_courses_count': len(enrolled_courses),
+        'completed_courses_count': len(certificates),
+        'certificates_count': len(certificates),
+        'certificates': certificates[:3],  # Show only the most recent certificates
+        'completed_lessons_count': completed_lessons_count,
+        'total_lessons_count': total_lessons_count,
+        'completed_lessons_percentage': round(completed_lessons_percentage),
+        'completed_quizzes_count': completed_quizzes_count,
+        'total_quizzes_count': total_quizzes_count,
+        'completed_quizzes_percentage': round(completed_quizzes_percentage),
+        'average_quiz_score': 0,  # Placeholder - implement actual calculation
+        'next_content': next_content,
+        'suggested_courses': [
+            {
+                'course': course,
+                'lesson_count': summaries[course.id]['lesson_count'],
+                'total_duration': summaries[course.id]['total_duration'],
+            }
+            for course in suggested_courses
+        ],
+        'recent_activities': [],  # Placeholder - implement actual activity tracking
+    }
@@ -0,0 +1,176 @@
+"""
+Authenticated delivery of material files.
+
+Access is checked once per request, then the file is either handed off to
+the web server (X-Accel-Redirect, when MATERIAL_ACCEL_REDIRECT_PREFIX is
+set) or streamed from storage in chunks. Streamed responses support single
+byte ranges, so videos and presentations can be seeked and resumed, and
+ETag/If-None-Match, so unchanged files are not sent again.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from django.utils.text import slugify
+
+from .models import UserProgress
+from .storage import get_digest_from_name
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def user_can_access_material(user, material):
+    """
+    Staff, doctors and the author see every material. Others see materials
+    outside of courses, and course materials once the course is published;
+    students and parents also have to be enrolled in the course.
+    """
+    if user.is_staff or user.role == 'doctor' or material.author_id == user.id:
+        return True
+    if material.course_id is None:
+        return True
+    if not material.course.is_published:
+        return False
+    if user.role in ('student', 'parent'):
+        return UserProgress.objects.filter(user=user, course_id=material.course_id).exists()
+    return True
+
+
+def get_material_etag(material):
+    """
+    ETag of the stored file itself, so a replaced file never matches the old
+    tag. Content-addressed names carry the SHA-256 of the content, other files
+    use their name, size and modification time.
+    Raises FileNotFoundError when the file is missing.
+    """
+    digest = get_digest_from_name(material.file.name)
+    if digest:
+        return f'"{digest}"'
+
+    storage, name = material.file.storage, material.file.name
+    try:
+        modified = storage.get_modified_time(name).timestamp()
+    except NotImplementedError:
+        modified = material.updated_at.timestamp()
+    token = f'{name}:{storage.size(name)}:{modified}'
+    return f'"{hashlib.md5(token.encode()).hexdigest()}"'
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of a single byte range, both inclusive, or None if the
+    whole file should be sent. Multiple ranges are answered with the whole file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range, the last N bytes
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def iter_file_range(file, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def serve_material_file(request, material, as_attachment=False):
+    """Build the response delivering the file of a material"""
+    try:
+        etag = get_material_etag(material)
+    except FileNotFoundError:
+        raise Http404('The file of this material is missing')
+    # Stored files are named by content hash, users get the material name
+    extension = os.path.splitext(material.file.name)[1]
+    filename = f'{slugify(material.name, allow_unicode=True) or "material"}{extension}'
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    accel_prefix = getattr(settings, 'MATERIAL_ACCEL_REDIRECT_PREFIX', None)
+    if accel_prefix:
+        # The web server reads the file and handles ranges itself
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + material.file.name
+    else:
+        try:
+            size = material.file.storage.size(material.file.name)
+            file = material.file.storage.open(material.file.name, 'rb')
+        except FileNotFoundError:
+            raise Http404('The file of this material is missing')
+
+        byte_range = None
+        range_header = request.headers.get('Range')
+        # If-Range only allows a partial response of the same version of the file
+        if range_header and (not request.headers.get('If-Range') or request.headers['If-Range'] == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                file.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                response['Accept-Ranges'] = 'bytes'
+                return response
+
+        if byte_range is None:
+            # FileResponse lets the server use wsgi.file_wrapper / sendfile
+            response = FileResponse(file, content_type=content_type)
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                iter_file_range(file, start, length), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = length
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
@@ -0,0 +1,174 @@
+"""
+Text extraction for uploaded material files.
+
+Uploads only schedule the work: once the transaction commits the material
+is handed to a small thread pool, which streams the file from storage,
+hashes it, extracts and normalizes its text and feeds it to the search
+index. Files whose SHA-256 matches the stored hash, or a material that was
+already extracted, reuse that text instead of being parsed again.
+
+TXT and DOCX are read with the standard library; PDF needs the optional
+pypdf package and is marked unsupported without it, like legacy DOC files.
+"""
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+import zipfile
+from xml.etree import ElementTree
+
+from django.conf import settings
+
+from .background import submit_on_commit
+from .models import Material, SearchDocument
+from .search import index_object
+from .storage import get_digest_from_name
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+MAX_EXTRACTED_CHARS = 2 * 1024 * 1024  # Protocols are long, but not this long
+
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1251', 'latin-1')
+DOCX_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+WHITESPACE_RE = re.compile(r'[ \t\f\v]+')
+BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def hash_file(field_file):
+    """SHA-256 of a stored file, read in chunks"""
+    # Content-addressed files are named after their digest already
+    digest = get_digest_from_name(field_file.name)
+    if digest:
+        return digest
+
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def normalize_text(text):
+    """Unicode-normalize extracted text and collapse runs of whitespace"""
+    text = unicodedata.normalize('NFKC', text).replace('\r\n', '\n').replace('\r', '\n')
+    text = ''.join(char for char in text if char in '\n\t' or unicodedata.category(char)[0] != 'C')
+    text = WHITESPACE_RE.sub(' ', text)
+    text = BLANK_LINES_RE.sub('\n\n', text)
+    return '\n'.join(line.strip() for line in text.split('\n')).strip()[:MAX_EXTRACTED_CHARS]
+
+
+def extract_txt(file):
+    data = file.read(MAX_EXTRACTED_CHARS * 4)
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='ignore')
+
+
+def extract_docx(file):
+    with zipfile.ZipFile(file) as archive:
+        with archive.open('word/document.xml') as document:
+            paragraphs = []
+            # Parse incrementally, finished paragraphs are dropped from the tree
+            for _, element in ElementTree.iterparse(document):
+                if element.tag == f'{DOCX_NAMESPACE}p':
+                    paragraphs.append(''.join(
+                        node.text or '' for node in element.iter(f'{DOCX_NAMESPACE}t')
+                    ))
+                    element.clear()
+    return '\n'.join(paragraphs)
+
+
+def extract_pdf(file):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFormat('pypdf is not installed')
+
+    pages = []
+    for page in PdfReader(file).pages:
+        pages.append(page.extract_text() or '')
+    return '\n\n'.join(pages)
+
+
+EXTRACTORS = {
+    '.txt': extract_txt,
+    '.md': extract_txt,
+    '.docx': extract_docx,
+    '.pdf': extract_pdf,
+}
+
+
+def extract_text(field_file):
+    """Extract the raw text of a stored file based on its extension"""
+    extractor = EXTRACTORS.get(os.path.splitext(field_file.name)[1].lower())
+    if extractor is None:
+        raise UnsupportedFormat(field_file.name)
+
+    field_file.open('rb')
+    try:
+        return extractor(field_file)
+    finally:
+        field_file.close()
+
+
+def process_material(material_id, force=False):
+    """
+    Hash and extract the file of a material, then refresh its search document.
+    Returns the resulting extraction status, or None if the material is gone.
+    """
+    material = Material.objects.filter(pk=material_id).first()
+    if material is None:
+        return None
+
+    if not material.file:
+        updates = {'content_hash': '', 'extracted_text': '', 'extraction_status': Material.EXTRACTION_UNSUPPORTED}
+    else:
+        content_hash = hash_file(material.file)
+        if not force and content_hash == material.content_hash and material.extraction_status == Material.EXTRACTION_DONE:
+            return material.extraction_status
+
+        updates = {'content_hash': content_hash}
+
+        # Identical file already extracted for another material
+        duplicate = Material.objects.filter(
+            content_hash=content_hash, extraction_status=Material.EXTRACTION_DONE
+        ).exclude(pk=material.pk).values('extracted_text').first()
+
+        if duplicate is not None and not force:
+            updates.update(extracted_text=duplicate['extracted_text'], extraction_status=Material.EXTRACTION_DONE)
+        else:
+            try:
+                updates.update(
+                    extracted_text=normalize_text(extract_text(material.file)),
+                    extraction_status=Material.EXTRACTION_DONE
+                )
+            except UnsupportedFormat:
+                updates.update(extracted_text='', extraction_status=Material.EXTRACTION_UNSUPPORTED)
+            except Exception:
+                logger.exception('Text extraction failed for material %s', material_id)
+                updates.update(extracted_text='', extraction_status=Material.EXTRACTION_FAILED)
+
+    # A plain update, saving the material would schedule another extraction
+    Material.objects.filter(pk=material_id).update(**updates)
+    index_object(SearchDocument.MATERIAL, material_id)
+    return updates['extraction_status']
+
+
+def schedule_material_extraction(material_id):
+    """Extract the text of a material in the background once the transaction commits"""
+    submit_on_commit(
+        'material-extraction', getattr(settings, 'MATERIAL_EXTRACTION_WORKERS', 2), process_material, material_id
+    )
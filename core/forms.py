@@ -99,6 +99,8 @@ class LessonForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['module'].empty_label = _('Выберите модуль')
+        # Module labels include the course title
+        self.fields['module'].queryset = self.fields['module'].queryset.select_related('course')
 
 class LessonContentForm(forms.ModelForm):
     class Meta:
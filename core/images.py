@@ -0,0 +1,150 @@
+"""
+Resized variants of uploaded images.
+
+Each variant is stored next to its original under a deterministic name
+(<name>_<variant>.<format>). Variants are rendered in a background pool
+when an image is uploaded, or when a page asks for a variant that is
+missing, e.g. after a deploy; until they are stored pages get the original
+image, so no request ever waits for Pillow. Whether a variant exists is
+cached, so pages showing images don't touch the storage at all once warm.
+WebP is used when Pillow supports it, JPEG otherwise.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import features, Image, ImageOps
+
+from .background import submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of every variant
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'small': 320,
+    'medium': 800,
+    'large': 1600,
+}
+
+VARIANT_FORMAT = 'webp' if features.check('webp') else 'jpeg'
+VARIANT_QUALITY = 80
+VARIANT_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # Variants never change for a given name
+VARIANT_FAILURE_CACHE_TIMEOUT = 60 * 60  # Don't retry broken images on every request
+RENDER_LOCK_TIMEOUT = 60 * 5
+
+
+def get_variant_name(name, variant, image_format=VARIANT_FORMAT):
+    base, _ = os.path.splitext(name)
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return f'{base}_{variant}.{extension}'
+
+
+def _exists_cache_key(storage_name):
+    return f'image_variant_{hashlib.md5(storage_name.encode()).hexdigest()}'
+
+
+def _render_lock_key(name):
+    return f'image_variants_rendering_{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def render_variant(storage, name, variant, image_format=VARIANT_FORMAT):
+    """Resize a stored image to a variant and return the encoded bytes"""
+    size = IMAGE_VARIANTS[variant]
+
+    with storage.open(name, 'rb') as image_file, Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        if image_format == 'jpeg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+        output = BytesIO()
+        image.save(output, format=image_format.upper(), quality=VARIANT_QUALITY, optimize=True)
+
+    return output.getvalue()
+
+
+def render_image_variants(storage, name, image_format=VARIANT_FORMAT):
+    """Render and store every missing variant of a stored image"""
+    try:
+        for variant in IMAGE_VARIANTS:
+            variant_name = get_variant_name(name, variant, image_format)
+            if not storage.exists(variant_name):
+                try:
+                    data = render_variant(storage, name, variant, image_format)
+                except Exception:
+                    logger.exception('Could not render %s variant of %s', variant, name)
+                    cache.set(_exists_cache_key(variant_name), 'failed', VARIANT_FAILURE_CACHE_TIMEOUT)
+                    continue
+                # Variants of content-addressed images are kept under their exact name, not as blobs
+                save = getattr(storage, 'save_derivative', storage.save)
+                save(variant_name, ContentFile(data))
+            cache.set(_exists_cache_key(variant_name), 'ready', VARIANT_CACHE_TIMEOUT)
+    finally:
+        cache.delete(_render_lock_key(name))
+
+
+def schedule_image_variants(field_file):
+    """Render the variants of an image in the background, at most once at a time"""
+    if not field_file or not cache.add(_render_lock_key(field_file.name), True, RENDER_LOCK_TIMEOUT):
+        return False
+
+    submit_on_commit(
+        'image-variants', getattr(settings, 'IMAGE_VARIANT_WORKERS', 1),
+        render_image_variants, field_file.storage, field_file.name
+    )
+    return True
+
+
+def get_image_variant_url(field_file, variant, image_format=VARIANT_FORMAT):
+    """
+    Return the URL of an image variant. A missing variant is scheduled for
+    rendering and the original URL is returned until it is stored, as it is
+    for images that can't be processed.
+    """
+    if not field_file:
+        return ''
+    if variant not in IMAGE_VARIANTS:
+        raise ValueError(f'Unknown image variant: {variant}')
+
+    storage = field_file.storage
+    variant_name = get_variant_name(field_file.name, variant, image_format)
+    cache_key = _exists_cache_key(variant_name)
+
+    state = cache.get(cache_key)
+    if state == 'failed':
+        return field_file.url
+
+    if state is None:
+        if not storage.exists(variant_name):
+            schedule_image_variants(field_file)
+            return field_file.url
+        cache.set(cache_key, 'ready', VARIANT_CACHE_TIMEOUT)
+
+    return storage.url(variant_name)
+
+
+def get_image_variant_urls(field_file, variants=None):
+    """Return {'original': url, variant: url, ...} for an image"""
+    if not field_file:
+        return None
+    urls = {'original': field_file.url}
+    for variant in variants or IMAGE_VARIANTS:
+        urls[variant] = get_image_variant_url(field_file, variant)
+    return urls
+
+
+def delete_image_variants(storage, name):
+    for variant in IMAGE_VARIANTS:
+        for image_format in ('webp', 'jpeg'):
+            variant_name = get_variant_name(name, variant, image_format)
+            cache.delete(_exists_cache_key(variant_name))
+            if storage.exists(variant_name):
+                storage.delete(variant_name)
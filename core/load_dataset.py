@@ -0,0 +1,669 @@
+"""
+Synthetic dataset for load testing.
+
+generate() fills an empty database at a given scale. Scale 1 is about
+100k students, 1k doctors and 1k courses of 5 modules x 10 lessons x 4
+steps (50k lessons, 200k steps), and the students' enrollments, step
+completions, quiz attempts and answers, which run into the millions.
+
+Rows are written with bulk_create in batches. The work of each phase
+(doctors, students, courses, activity) is split into chunks of users or
+courses, every chunk runs in its own transaction and the chunks of a phase
+run in a pool of processes. Each chunk draws from its own random generator
+seeded with the seed, the phase and the chunk number, so the same seed and
+scale produce the same data whatever the number of workers; only primary
+keys may differ.
+
+bulk_create doesn't send signals, so the denormalized counters are written
+directly and the search index has to be rebuilt afterwards.
+"""
+import multiprocessing
+import random
+import uuid
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    Answer, Course, CustomUser, LearningOutcome, Lesson, LessonContent, Material, MaterialType, Module,
+    Question, StepCompletion, StoredBlob, Test, UserProgress
+)
+from .storage import content_addressed_storage, get_digest_from_name
+
+# Number of rows at scale 1, and the minimum at small scales
+SCALE_SIZES = {'students': 100_000, 'doctors': 1_000, 'courses': 1_000}
+MINIMUM_SIZES = {'students': 10, 'doctors': 2, 'courses': 2}
+
+MODULES_PER_COURSE = 5
+LESSONS_PER_MODULE = 10
+STEPS_PER_LESSON = 4
+OUTCOMES_PER_COURSE = 3
+QUESTIONS_PER_QUIZ = 5
+CHOICES_PER_QUESTION = 4
+MATERIALS_PER_COURSE = 5
+TEST_QUESTIONS = 5
+
+# Every tenth course is a draft, every fifth student is also a patient
+UNPUBLISHED_EVERY = 10
+PATIENT_EVERY = 5
+
+MAX_ENROLLMENTS = 5
+# Share of enrollments that went through the whole course
+COMPLETED_SHARE = 0.1
+# Popularity of the n-th course is proportional to 1 / n ** COURSE_POPULARITY
+COURSE_POPULARITY = 0.8
+OPEN_ATTEMPT_SHARE = 0.2
+
+USERS_PER_CHUNK = 500
+COURSES_PER_CHUNK = 10
+
+FIRST_NAMES = ['Алексей', 'Мария', 'Дмитрий', 'Екатерина', 'Никита', 'Вероника', 'Иван', 'Елена', 'Михаил', 'Анна']
+LAST_NAMES = ['Кузнецов', 'Новикова', 'Федоров', 'Волкова', 'Андреев', 'Лебедева', 'Петров', 'Смирнова', 'Соколов']
+
+COURSE_TOPICS = [
+    'Основы детской онкологии',
+    'Детская гематология: современные подходы',
+    'Лимфомы у детей: диагностика и лечение',
+    'Лейкозы в педиатрической практике',
+    'Опухоли ЦНС у детей',
+    'Нейробластома: протоколы лечения',
+    'Саркомы мягких тканей в детском возрасте',
+    'Солидные опухоли у детей',
+    'Поддерживающая терапия в детской онкологии',
+    'Трансплантация костного мозга у детей',
+]
+
+SPECIALIZATIONS = [
+    'Детская онкология', 'Онкогематология', 'Радиология',
+    'Химиотерапия', 'Хирургическая онкология', 'Паллиативная помощь',
+]
+QUALIFICATIONS = [
+    'Кандидат медицинских наук', 'Доктор медицинских наук',
+    'Высшая категория', 'Первая категория', 'Вторая категория',
+]
+DISEASES = [
+    ('Острый лимфобластный лейкоз', 'Наиболее распространенная форма рака у детей.'),
+    ('Нейробластома', 'Рак, развивающийся из незрелых нервных клеток.'),
+    ('Лимфома Ходжкина', 'Рак лимфатической системы.'),
+    ('Опухоль Вильмса', 'Редкий вид рака почек, встречающийся преимущественно у детей.'),
+    ('Медуллобластома', 'Злокачественная опухоль мозжечка.'),
+    ('Остеосаркома', 'Злокачественная опухоль костной ткани.'),
+    ('Ретинобластома', 'Злокачественное заболевание сетчатки глаза.'),
+    ('Рабдомиосаркома', 'Злокачественная опухоль мягких тканей.'),
+]
+
+STEP_CONTENT = (
+    '<p>Шаг {step} урока «{lesson}». Разбор клинического случая, ключевые понятия '
+    'и рекомендации международных протоколов лечения.</p>'
+)
+MATERIAL_TEXT = 'Учебный материал ({material_type}): методические рекомендации и практические примеры.\n'
+
+
+def get_sizes(scale):
+    """Number of students, doctors and courses at a scale"""
+    return {name: max(MINIMUM_SIZES[name], round(size * scale)) for name, size in SCALE_SIZES.items()}
+
+
+def student_username(number):
+    return f'student{number}'
+
+
+def doctor_username(number):
+    return f'doctor{number}'
+
+
+def course_title(number):
+    return f'{COURSE_TOPICS[(number - 1) % len(COURSE_TOPICS)]}, поток {number}'
+
+
+def course_number(title):
+    return int(title.rsplit(' ', 1)[1])
+
+
+def is_published(number):
+    return number % UNPUBLISHED_EVERY != 0
+
+
+def generate(scale=1.0, seed=1, workers=1, password='password', batch_size=2000, log=None):
+    """
+    Fill the database with the load dataset. Returns the number of rows
+    created per model. Meant for an empty database: a failed run leaves
+    the chunks that were already committed.
+    """
+    log = log or (lambda message: None)
+    sizes = get_sizes(scale)
+
+    if connection.vendor == 'sqlite' and workers > 1:
+        # SQLite has one writer at a time, parallel chunks would only wait on the lock
+        log('SQLite allows one writer at a time, generating in a single process')
+        workers = 1
+
+    options = {
+        'run': uuid.uuid4().hex,
+        'seed': seed,
+        'batch_size': batch_size,
+        # Hashing once keeps 100k users from taking hours, they all share the password
+        'password': make_password(password),
+        **sizes,
+    }
+    totals = create_reference_data(options)
+
+    phases = [
+        ('doctors', sizes['doctors'], USERS_PER_CHUNK),
+        ('students', sizes['students'], USERS_PER_CHUNK),
+        ('courses', sizes['courses'], COURSES_PER_CHUNK),
+        ('activity', sizes['students'], USERS_PER_CHUNK),
+    ]
+    for phase, total, chunk_size in phases:
+        tasks = [
+            (phase, index, start, min(start + chunk_size, total + 1), options)
+            for index, start in enumerate(range(1, total + 1, chunk_size))
+        ]
+        for done, counts in enumerate(_map_chunks(tasks, workers), 1):
+            totals.update(counts)
+            log(f'{phase}: {done}/{len(tasks)} chunks')
+
+    return totals
+
+
+def _map_chunks(tasks, workers):
+    if workers <= 1:
+        yield from map(run_chunk, tasks)
+        return
+
+    # Forked workers must open their own connections
+    connections.close_all()
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(run_chunk, tasks)
+
+
+def _init_worker():
+    import django
+
+    # Spawned workers start without settings and apps, forked ones already have them
+    django.setup()
+    connections.close_all()
+
+
+def run_chunk(task):
+    phase, index, start, stop, options = task
+    rng = random.Random(f"{options['seed']}:{phase}:{index}")
+    counts = Counter()
+    with transaction.atomic():
+        PHASES[phase](rng, range(start, stop), options, counts)
+    return counts
+
+
+class BatchWriter:
+    """Collects model instances and inserts them with bulk_create once a batch is full"""
+
+    def __init__(self, model, counts, batch_size, after_insert=None):
+        self.model = model
+        self.counts = counts
+        self.batch_size = batch_size
+        self.after_insert = after_insert
+        self.objects = []
+
+    def add(self, obj):
+        self.objects.append(obj)
+        if len(self.objects) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.objects:
+            return
+        objects, self.objects = self.objects, []
+        self.model.objects.bulk_create(objects)
+        self.counts[self.model._meta.label] += len(objects)
+        if self.after_insert:
+            self.after_insert(objects)
+
+
+def _bulk_create(model, objects, counts, batch_size):
+    """Insert objects, which get their primary keys, and count them"""
+    model.objects.bulk_create(objects, batch_size=batch_size)
+    counts[model._meta.label] += len(objects)
+    return objects
+
+
+def _random_name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _user(username, role, rng, options, **fields):
+    first_name, last_name = _random_name(rng)
+    return CustomUser(
+        username=username,
+        email=f'{username}@example.com',
+        password=options['password'],
+        first_name=first_name,
+        last_name=last_name,
+        role=role,
+        **fields
+    )
+
+
+def _user_ids(usernames):
+    return dict(CustomUser.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+
+# Reference data
+
+def create_reference_data(options):
+    """Rows shared by all chunks: the admin, specializations, diseases and material files"""
+    from medical.models import Disease, Specialization
+
+    counts = Counter()
+    with transaction.atomic():
+        if not CustomUser.objects.filter(username='admin').exists():
+            _bulk_create(CustomUser, [_user(
+                'admin', 'doctor', random.Random(options['seed']), options, is_staff=True, is_superuser=True
+            )], counts, 1)
+        _bulk_create(Specialization, [Specialization(name=name) for name in SPECIALIZATIONS], counts, None)
+        _bulk_create(Disease, [
+            Disease(name=name, description=description) for name, description in DISEASES
+        ], counts, None)
+
+    # One stored file per material type, shared by all materials of that type
+    options['material_files'] = {
+        material_type: content_addressed_storage.save(
+            f'materials/{material_type}.txt',
+            ContentFile(MATERIAL_TEXT.format(material_type=material_type).encode())
+        )
+        for material_type in MaterialType.values
+    }
+    options['specialization_ids'] = list(Specialization.objects.order_by('pk').values_list('pk', flat=True))
+    options['disease_ids'] = list(Disease.objects.order_by('pk').values_list('pk', flat=True))
+    return counts
+
+
+# Users
+
+def create_doctors(rng, numbers, options, counts):
+    from medical.models import Contact, Doctor
+
+    users = _bulk_create(CustomUser, [
+        _user(doctor_username(number), 'doctor', rng, options) for number in numbers
+    ], counts, options['batch_size'])
+
+    _bulk_create(Doctor, [
+        Doctor(
+            user=user,
+            specialization_id=rng.choice(options['specialization_ids']),
+            qualification=rng.choice(QUALIFICATIONS),
+            experience_years=rng.randint(3, 25)
+        )
+        for user in users
+    ], counts, options['batch_size'])
+    _bulk_create(Contact, [
+        Contact(user=user, code='phone', value=f'8-900-{user.pk % 1000:03d}-{rng.randint(0, 9999):04d}')
+        for user in users
+    ], counts, options['batch_size'])
+
+
+def create_students(rng, numbers, options, counts):
+    from medical.models import Contact, DiseaseStatus, MedicalHistory, Patient
+
+    users = _bulk_create(CustomUser, [
+        _user(student_username(number), 'parent' if number % 50 == 0 else 'student', rng, options)
+        for number in numbers
+    ], counts, options['batch_size'])
+
+    patients = [user for number, user in zip(numbers, users) if number % PATIENT_EVERY == 0]
+    if not patients:
+        return
+
+    doctors = _user_ids([doctor_username(number) for number in range(1, options['doctors'] + 1)])
+    _bulk_create(Patient, [Patient(user=user) for user in patients], counts, options['batch_size'])
+    _bulk_create(Contact, [
+        Contact(user=user, code='email', value=user.email) for user in patients
+    ], counts, options['batch_size'])
+    _bulk_create(MedicalHistory, [
+        MedicalHistory(
+            patient_id=user.pk,
+            disease_id=rng.choice(options['disease_ids']),
+            doctor_id=doctors[doctor_username(rng.randint(1, options['doctors']))],
+            status=DiseaseStatus.DURING_TREATMENT if rng.random() < 0.7 else DiseaseStatus.CURED
+        )
+        for user in patients
+        for _ in range(rng.randint(1, 3))
+    ], counts, options['batch_size'])
+
+
+# Catalog
+
+def create_courses(rng, numbers, options, counts):
+    from quiz.models import Choice, Question as QuizQuestion, Quiz
+
+    batch_size = options['batch_size']
+    authors = _user_ids([doctor_username(number) for number in range(1, options['doctors'] + 1)])
+
+    courses = _bulk_create(Course, [
+        Course(
+            title=course_title(number),
+            description=f'Курс «{course_title(number)}» для врачей, студентов и родителей.',
+            author_id=authors[doctor_username(rng.randint(1, options['doctors']))],
+            is_published=is_published(number),
+            language=rng.choices(['ru', 'en', 'ky'], weights=[6, 3, 1])[0]
+        )
+        for number in numbers
+    ], counts, batch_size)
+
+    _bulk_create(LearningOutcome, [
+        LearningOutcome(course=course, text=f'Результат обучения {order}', order=order)
+        for course in courses for order in range(1, OUTCOMES_PER_COURSE + 1)
+    ], counts, batch_size)
+
+    modules = _bulk_create(Module, [
+        Module(course=course, title=f'Модуль {order}', description='Описание модуля', order=order)
+        for course in courses for order in range(1, MODULES_PER_COURSE + 1)
+    ], counts, batch_size)
+
+    lessons = _bulk_create(Lesson, [
+        Lesson(
+            module=module, title=f'Урок {module.order}.{order}', order=order,
+            estimated_time=rng.choice([10, 15, 20, 30])
+        )
+        for module in modules for order in range(1, LESSONS_PER_MODULE + 1)
+    ], counts, batch_size)
+
+    steps = BatchWriter(LessonContent, counts, batch_size)
+    for lesson in lessons:
+        for order in range(1, STEPS_PER_LESSON + 1):
+            steps.add(LessonContent(
+                lesson=lesson, title=f'Шаг {order}', order=order,
+                content=STEP_CONTENT.format(step=order, lesson=lesson.title)
+            ))
+    steps.flush()
+
+    # Points are drawn first, the quizzes are created with their totals
+    points = {module.pk: [rng.randint(1, 3) for _ in range(QUESTIONS_PER_QUIZ)] for module in modules}
+    quizzes = _bulk_create(Quiz, [
+        Quiz(
+            title=f'Тест: {module.title}', description='Проверка знаний по модулю',
+            module=module, course=module.course,
+            question_count=QUESTIONS_PER_QUIZ, total_points=sum(points[module.pk])
+        )
+        for module in modules
+    ], counts, batch_size)
+
+    questions = _bulk_create(QuizQuestion, [
+        QuizQuestion(quiz=quiz, text=f'Вопрос {order} теста «{quiz.title}»', points=question_points, order=order)
+        for quiz in quizzes
+        for order, question_points in enumerate(points[quiz.module_id], 1)
+    ], counts, batch_size)
+
+    choices = BatchWriter(Choice, counts, batch_size)
+    for question in questions:
+        correct = rng.randint(1, CHOICES_PER_QUESTION)
+        for order in range(1, CHOICES_PER_QUESTION + 1):
+            choices.add(Choice(question=question, text=f'Вариант {order}', is_correct=order == correct))
+    choices.flush()
+
+    create_materials(rng, courses, options, counts)
+    create_tests(rng, courses, options, counts)
+
+
+def create_materials(rng, courses, options, counts):
+    materials = []
+    for course in courses:
+        for number in range(1, MATERIALS_PER_COURSE + 1):
+            material_type = rng.choice(MaterialType.values)
+            file_name = options['material_files'][material_type]
+            materials.append(Material(
+                name=f'Материал {number}: {course.title}'[:100],
+                description='Методические рекомендации по теме курса',
+                file=file_name,
+                author_id=course.author_id,
+                course=course,
+                material_type=material_type,
+                language=course.language,
+                # The text is known, so extraction doesn't have to run
+                content_hash=get_digest_from_name(file_name) or '',
+                extracted_text=MATERIAL_TEXT.format(material_type=material_type),
+                extraction_status=Material.EXTRACTION_DONE
+            ))
+    _bulk_create(Material, materials, counts, options['batch_size'])
+
+    # bulk_create doesn't send the signals counting blob references
+    for file_name, references in Counter(material.file.name for material in materials).items():
+        StoredBlob.objects.filter(name=file_name).update(ref_count=F('ref_count') + references)
+
+
+def create_tests(rng, courses, options, counts):
+    tests = _bulk_create(Test, [
+        Test(
+            title=f'Итоговый тест: {course.title}'[:100], description='Проверка знаний по темам курса',
+            course=course, passing_score=rng.randint(60, 80), language=course.language
+        )
+        for course in courses
+    ], counts, options['batch_size'])
+
+    questions = _bulk_create(Question, [
+        Question(test=test, text=f'Вопрос {order}', points=rng.randint(1, 3))
+        for test in tests for order in range(1, TEST_QUESTIONS + 1)
+    ], counts, options['batch_size'])
+
+    answers = BatchWriter(Answer, counts, options['batch_size'])
+    for question in questions:
+        correct = rng.randint(1, CHOICES_PER_QUESTION)
+        for order in range(1, CHOICES_PER_QUESTION + 1):
+            answers.add(Answer(question=question, text=f'Вариант ответа {order}', is_correct=order == correct))
+    answers.flush()
+
+
+# Activity
+
+_catalog = {}
+
+
+def get_catalog(options):
+    """
+    Lessons and quizzes of every generated course, by course number. Loaded
+    once per process and run, as every activity chunk needs all of it.
+    """
+    if _catalog.get('run') == options['run']:
+        return _catalog['courses']
+
+    from quiz.models import Choice, Quiz
+
+    courses = {
+        course_id: {
+            'number': course_number(title),
+            'id': course_id,
+            'modules': {},
+        }
+        for course_id, title in Course.objects.filter(
+            title__in=[course_title(number) for number in range(1, options['courses'] + 1)]
+        ).values_list('pk', 'title')
+    }
+
+    lessons = Lesson.objects.filter(module__course_id__in=courses).order_by('module__order', 'order')
+    for course_id, module_id, lesson_id in lessons.values_list('module__course_id', 'module_id', 'pk'):
+        module = courses[course_id]['modules'].setdefault(module_id, {'lessons': [], 'quiz': None})
+        module['lessons'].append(lesson_id)
+
+    quizzes = {}
+    for quiz_id, module_id, course_id, total_points, passing_score in Quiz.objects.filter(
+        course_id__in=courses, module__isnull=False
+    ).values_list('pk', 'module_id', 'course_id', 'total_points', 'passing_score'):
+        quizzes[quiz_id] = {
+            'id': quiz_id, 'total_points': total_points, 'passing_score': passing_score, 'questions': {}
+        }
+        courses[course_id]['modules'][module_id]['quiz'] = quizzes[quiz_id]
+
+    choices = Choice.objects.filter(question__quiz_id__in=quizzes).order_by('question__order', 'pk')
+    for quiz_id, question_id, points, choice_id, is_correct in choices.values_list(
+        'question__quiz_id', 'question_id', 'question__points', 'pk', 'is_correct'
+    ):
+        question = quizzes[quiz_id]['questions'].setdefault(
+            question_id, {'id': question_id, 'points': points, 'correct': None, 'wrong': []}
+        )
+        if is_correct:
+            question['correct'] = choice_id
+        else:
+            question['wrong'].append(choice_id)
+
+    for quiz in quizzes.values():
+        quiz['questions'] = list(quiz['questions'].values())
+
+    by_number = {}
+    for course in courses.values():
+        course['modules'] = list(course['modules'].values())
+        course['lessons'] = [lesson_id for module in course['modules'] for lesson_id in module['lessons']]
+        by_number[course['number']] = course
+
+    published = sorted(number for number in by_number if is_published(number))
+    cum_weights, total = [], 0.0
+    for number in published:
+        total += 1 / number ** COURSE_POPULARITY
+        cum_weights.append(total)
+
+    _catalog.update(run=options['run'], courses=(by_number, published, cum_weights))
+    return _catalog['courses']
+
+
+def create_activity(rng, numbers, options, counts):
+    """Enrollments of a chunk of students with their step completions, quiz attempts and certificates"""
+    from certificate.models import Certificate
+    from quiz.models import QuizAttempt, StudentAnswer
+
+    batch_size = options['batch_size']
+    catalog, published, cum_weights = get_catalog(options)
+    students = _user_ids([student_username(number) for number in numbers])
+
+    # Draw every enrollment first, the rows are created once the progress IDs are known
+    enrollments = []
+    for number in numbers:
+        picked = rng.choices(published, cum_weights=cum_weights, k=rng.randint(1, MAX_ENROLLMENTS))
+        for picked_number in sorted(set(picked)):
+            course = catalog[picked_number]
+            total = len(course['lessons'])
+            if rng.random() < COMPLETED_SHARE:
+                lessons_done = total
+            else:
+                lessons_done = int(rng.random() ** 2 * total)
+            partial_steps = rng.randint(0, STEPS_PER_LESSON - 1) if lessons_done < total else 0
+            enrollments.append((students[student_username(number)], course, lessons_done, partial_steps))
+
+    progresses = []
+    for user_id, course, lessons_done, partial_steps in enrollments:
+        total = len(course['lessons'])
+        progresses.append(UserProgress(
+            user_id=user_id,
+            course_id=course['id'],
+            lessons_completed_count=lessons_done,
+            total_lessons=total,
+            steps_completed_count=lessons_done * STEPS_PER_LESSON + partial_steps,
+            total_steps=total * STEPS_PER_LESSON,
+            # Every completed module has a finished attempt at its quiz
+            quizzes_completed_count=_modules_done(course, lessons_done),
+            total_quizzes=len(course['modules']),
+            completion_percentage=min(100, round(lessons_done / total * 100)) if total else 0
+        ))
+    _bulk_create(UserProgress, progresses, counts, batch_size)
+
+    step_completions = BatchWriter(StepCompletion, counts, batch_size)
+    lessons_completed = BatchWriter(UserProgress.lessons_completed.through, counts, batch_size)
+    certificates = []
+    attempts = []
+    for progress, (user_id, course, lessons_done, partial_steps) in zip(progresses, enrollments):
+        lessons = course['lessons']
+        for lesson_id in lessons[:lessons_done]:
+            lessons_completed.add(UserProgress.lessons_completed.through(userprogress_id=progress.pk, lesson_id=lesson_id))
+            for step in range(1, STEPS_PER_LESSON + 1):
+                step_completions.add(StepCompletion(progress_id=progress.pk, lesson_id=lesson_id, step=step))
+        if lessons_done < len(lessons):
+            for step in range(1, partial_steps + 1):
+                step_completions.add(StepCompletion(progress_id=progress.pk, lesson_id=lessons[lessons_done], step=step))
+
+        modules_done = _modules_done(course, lessons_done)
+        for module in course['modules'][:modules_done]:
+            # Earlier attempts tend to fail, the last one is usually passed
+            tries = rng.randint(1, 3)
+            for attempt_number in range(1, tries + 1):
+                accuracy = 0.9 if attempt_number == tries else 0.5
+                attempts.append(_attempt(rng, user_id, module['quiz'], accuracy))
+        if modules_done < len(course['modules']) and rng.random() < OPEN_ATTEMPT_SHARE:
+            attempts.append(_attempt(rng, user_id, course['modules'][modules_done]['quiz'], None))
+
+        if lessons_done == len(lessons):
+            certificates.append(Certificate(
+                user_id=user_id, course_id=course['id'],
+                verification_id=uuid.UUID(int=rng.getrandbits(128), version=4)
+            ))
+    step_completions.flush()
+    lessons_completed.flush()
+
+    _bulk_create(QuizAttempt, [attempt for attempt, _ in attempts], counts, batch_size)
+
+    def add_selected_choices(answers):
+        through = StudentAnswer.choices.through
+        _bulk_create(through, [
+            through(studentanswer_id=answer.pk, choice_id=answer.selected_choice_id) for answer in answers
+        ], counts, batch_size)
+
+    answers = BatchWriter(StudentAnswer, counts, batch_size, after_insert=add_selected_choices)
+    for attempt, attempt_answers in attempts:
+        for question, choice_id, is_correct in attempt_answers:
+            answer = StudentAnswer(
+                attempt_id=attempt.pk, question_id=question['id'], is_correct=is_correct,
+                points_earned=question['points'] if is_correct else 0
+            )
+            answer.selected_choice_id = choice_id
+            answers.add(answer)
+    answers.flush()
+
+    _bulk_create(Certificate, certificates, counts, batch_size)
+
+
+def _modules_done(course, lessons_done):
+    """Number of leading modules whose lessons are all completed"""
+    done = 0
+    remaining = lessons_done
+    for module in course['modules']:
+        if remaining < len(module['lessons']):
+            break
+        remaining -= len(module['lessons'])
+        done += 1
+    return done
+
+
+def _attempt(rng, user_id, quiz, accuracy):
+    """A quiz attempt and its answers; accuracy None is an attempt still in progress"""
+    from quiz.models import QuizAttempt
+
+    if accuracy is None:
+        return QuizAttempt(quiz_id=quiz['id'], user_id=user_id), []
+
+    answers = []
+    for question in quiz['questions']:
+        is_correct = rng.random() < accuracy
+        choice_id = question['correct'] if is_correct else rng.choice(question['wrong'])
+        answers.append((question, choice_id, is_correct))
+
+    score = float(sum(question['points'] for question, _, is_correct in answers if is_correct))
+    total_points = quiz['total_points']
+    attempt = QuizAttempt(
+        quiz_id=quiz['id'],
+        user_id=user_id,
+        end_time=timezone.now(),
+        score=score,
+        is_completed=True,
+        answered_count=len(answers),
+        score_percentage=round(score * 100 / total_points, 2) if total_points else 0,
+        is_passed=bool(total_points) and score >= quiz['passing_score'] * total_points / 100
+    )
+    return attempt, answers
+
+
+PHASES = {
+    'doctors': create_doctors,
+    'students': create_students,
+    'courses': create_courses,
+    'activity': create_activity,
+}
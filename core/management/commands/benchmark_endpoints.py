@@ -0,0 +1,198 @@
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core import benchmark
+from core.load_dataset import student_username
+from core.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a local database, start the app and replay concurrent student sessions against the hot '
+        'endpoints; reports latency percentiles, throughput and queries per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=0.01,
+            help='Scale of the generated dataset, see generate_load_dataset (default: 0.01)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Seed of the dataset and the session plans (default: 1)'
+        )
+        parser.add_argument(
+            '--fresh', action='store_true',
+            help='Delete all data and generate the dataset again, so runs start from the same state'
+        )
+        parser.add_argument(
+            '--sessions', type=int, default=100,
+            help='Number of measured student sessions (default: 100)'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Number of sessions running at the same time (default: 10)'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=None,
+            help='Sessions replayed before measuring (default: same as --concurrency)'
+        )
+        parser.add_argument(
+            '--lessons-per-session', type=int, default=2,
+            help='Lessons each session steps through before taking the quiz (default: 2)'
+        )
+        parser.add_argument(
+            '--think-time', type=float, default=0,
+            help='Average pause between page views in seconds (default: 0)'
+        )
+        parser.add_argument(
+            '--server-workers', type=int, default=min(os.cpu_count() or 1, 4),
+            help='Number of gunicorn worker processes (default: number of CPUs, at most 4)'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of the generated users (default: password)'
+        )
+        parser.add_argument(
+            '--work-dir', default=os.path.join(tempfile.gettempdir(), 'online-academy-benchmark'),
+            help='Directory for media, static files and results'
+        )
+        parser.add_argument(
+            '--output',
+            help='Path of the JSON results (default: results-<commit>-<time>.json in the work directory)'
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON results of an earlier run to compare against'
+        )
+
+    def handle(self, *args, **options):
+        if not benchmark.is_local_database(connection.settings_dict):
+            raise CommandError(
+                'The benchmark writes to and may flush the database, point DATABASE_URL at a local one '
+                '(e.g. sqlite:////tmp/benchmark.sqlite3)'
+            )
+
+        work_dir = options['work_dir']
+        media_root = os.path.join(work_dir, 'media')
+        static_root = os.path.join(work_dir, 'static')
+        os.makedirs(work_dir, exist_ok=True)
+
+        with override_settings(MEDIA_ROOT=media_root, STATIC_ROOT=static_root):
+            self.prepare_database(options)
+            self.stdout.write('Collecting static files...')
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+        warmup = options['concurrency'] if options['warmup'] is None else options['warmup']
+        plans = benchmark.build_session_plans(
+            warmup + options['sessions'], options['lessons_per_session'], options['seed']
+        )
+        if len(plans) <= warmup:
+            raise CommandError('The dataset has too few students with unfinished courses, use a larger --scale')
+        warmup_plans, plans = plans[:warmup], plans[warmup:]
+        dataset = benchmark.get_dataset_size()
+
+        port = benchmark.get_free_port()
+        env = {
+            **os.environ,
+            'DEBUG': 'False',
+            'MEDIA_ROOT': media_root,
+            'STATIC_ROOT': static_root,
+            'QUERY_INSTRUMENTATION': 'True',
+            'QUERY_SERVER_TIMING': 'True',
+        }
+        self.stdout.write(f"Starting the server with {options['server_workers']} workers on port {port}...")
+        server = benchmark.start_server(port, options['server_workers'], env)
+        try:
+            if not benchmark.wait_for_server(port, server):
+                raise CommandError('The server did not start')
+
+            self.stdout.write(f'Warming up with {len(warmup_plans)} sessions...')
+            benchmark.run_sessions(
+                '127.0.0.1', port, warmup_plans, options['password'], options['concurrency'], options['think_time']
+            )
+
+            self.stdout.write(f"Replaying {len(plans)} sessions, {options['concurrency']} at a time...")
+            records, duration = benchmark.run_sessions(
+                '127.0.0.1', port, plans, options['password'], options['concurrency'], options['think_time']
+            )
+        finally:
+            benchmark.stop_server(server)
+
+        commit = benchmark.get_git_commit()
+        results = {
+            'commit': commit,
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'options': {
+                name: options[name] for name in (
+                    'scale', 'seed', 'fresh', 'sessions', 'concurrency', 'lessons_per_session',
+                    'think_time', 'server_workers'
+                )
+            },
+            **benchmark.summarize(records, duration),
+        }
+
+        output = options['output'] or os.path.join(
+            work_dir, f"results-{commit or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        with open(output, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+
+        self.print_results(results)
+        if options['compare']:
+            with open(options['compare']) as previous_file:
+                self.print_comparison(benchmark.compare(json.load(previous_file), results))
+
+        message = f'Results written to {output}'
+        if results['errors']:
+            self.stdout.write(self.style.WARNING(f"{results['errors']} requests failed. {message}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def prepare_database(self, options):
+        call_command('migrate', interactive=False, verbosity=0)
+        if options['fresh']:
+            self.stdout.write('Deleting all data...')
+            call_command('flush', interactive=False, verbosity=0)
+
+        if not CustomUser.objects.filter(username=student_username(1)).exists():
+            call_command(
+                'generate_load_dataset', scale=options['scale'], seed=options['seed'],
+                password=options['password'], stdout=self.stdout
+            )
+        elif not options['fresh']:
+            self.stdout.write('Using the existing dataset, pass --fresh for repeatable results')
+
+    def print_results(self, results):
+        self.stdout.write(
+            f"\n{results['requests']} requests in {results['duration']}s, "
+            f"{results['throughput']} requests/s, {results['errors']} errors\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<22}{'requests':>9}{'errors':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        for endpoint, stats in results['endpoints'].items():
+            latency = stats['latency_ms']
+            queries = stats['queries']['mean']
+            self.stdout.write(
+                f"{endpoint:<22}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput']:>9}"
+                f"{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}"
+                f"{'-' if queries is None else queries:>9}"
+            )
+
+    def print_comparison(self, rows):
+        self.stdout.write(f"\n{'endpoint':<22}{'metric':<9}{'before':>10}{'after':>10}{'change':>9}")
+        for endpoint, metric, before, after, change in rows:
+            self.stdout.write(f'{endpoint:<22}{metric:<9}{before:>10}{after:>10}{change:>+8}%')
@@ -0,0 +1,74 @@
+from collections import Counter
+
+from django.apps import apps
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import StoredBlob
+from core.storage import (
+    CONTENT_ADDRESSED_FIELDS, content_addressed_storage, delete_unreferenced_blob, get_digest_from_name
+)
+
+
+class Command(BaseCommand):
+    help = 'Move uploaded files into the content-addressed blob store and recount blob references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Delete the original files once they have been moved into the blob store'
+        )
+        parser.add_argument(
+            '--gc', action='store_true',
+            help='Delete blobs that are no longer referenced'
+        )
+
+    def handle(self, *args, **options):
+        moved = 0
+        moved_names = {}
+        references = Counter()
+
+        for model_label, field_name in CONTENT_ADDRESSED_FIELDS:
+            model = apps.get_model(model_label)
+            rows = model._base_manager.exclude(Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True}))
+
+            for pk, name in rows.values_list('pk', field_name).iterator():
+                if name in moved_names:
+                    # Another row pointed at the same original file
+                    model._base_manager.filter(pk=pk).update(**{field_name: moved_names[name]})
+                    name = moved_names[name]
+                elif not get_digest_from_name(name):
+                    if not content_addressed_storage.exists(name):
+                        self.stdout.write(self.style.WARNING(f'Missing file {name} ({model_label} {pk})'))
+                        continue
+
+                    with content_addressed_storage.open(name, 'rb') as original:
+                        blob_name = content_addressed_storage.save(name, File(original, name=name))
+                    # Plain update, references are recounted below
+                    model._base_manager.filter(pk=pk).update(**{field_name: blob_name})
+                    if options['delete_originals']:
+                        content_addressed_storage.delete(name)
+                    moved_names[name] = blob_name
+                    name = blob_name
+                    moved += 1
+
+                references[name] += 1
+
+        # Recount every blob from the actual references
+        updated = 0
+        for blob in StoredBlob.objects.only('id', 'name', 'ref_count').iterator():
+            count = references.get(blob.name, 0)
+            if blob.ref_count != count:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=count)
+                updated += 1
+
+        deleted = 0
+        if options['gc']:
+            for name in StoredBlob.objects.filter(ref_count=0).values_list('name', flat=True):
+                deleted += delete_unreferenced_blob(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} files, {len(references)} blobs in use, '
+            f'{updated} reference counts fixed, {deleted} blobs deleted'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.extraction import process_material
+from core.models import Material
+
+
+class Command(BaseCommand):
+    help = 'Extract and index the text of uploaded material files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Process every material, not only the ones still pending'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Extract again even if the file hash did not change'
+        )
+
+    def handle(self, *args, **options):
+        materials = Material.objects.all()
+        if not options['all']:
+            materials = materials.filter(extraction_status=Material.EXTRACTION_PENDING)
+        
+        statuses = {}
+        for material_id in materials.values_list('pk', flat=True).iterator():
+            status = process_material(material_id, force=options['force'])
+            statuses[status] = statuses.get(status, 0) + 1
+        
+        for status, count in sorted(statuses.items(), key=lambda item: str(item[0])):
+            self.stdout.write(f'{status}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Processed {sum(statuses.values())} materials'))
@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.load_dataset import SCALE_SIZES, doctor_username, generate, get_sizes, student_username
+from core.models import CustomUser
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill an empty database with a synthetic load-testing dataset: users, courses with modules, '
+        'lessons, steps and quizzes, enrollments, step completions, quiz attempts and certificates'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=0.01,
+            help='Dataset size, 1 is {students} students, {doctors} doctors and {courses} courses '
+                 '(default: 0.01)'.format(**SCALE_SIZES)
+        )
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Random seed, the same seed and scale always produce the same data (default: 1)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of processes writing chunks in parallel, 1 on SQLite (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Rows per INSERT (default: 2000)'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of every generated user (default: password)'
+        )
+        parser.add_argument(
+            '--skip-index', action='store_true',
+            help="Don't rebuild the search index afterwards"
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError('The database must return primary keys from bulk inserts (PostgreSQL, SQLite 3.35+)')
+        if CustomUser.objects.filter(username__in=[doctor_username(1), student_username(1)]).exists():
+            raise CommandError('The database already has generated users, run this command on an empty database')
+
+        sizes = get_sizes(options['scale'])
+        self.stdout.write(
+            f"Generating {sizes['students']} students, {sizes['doctors']} doctors and {sizes['courses']} courses..."
+        )
+        totals = generate(
+            scale=options['scale'],
+            seed=options['seed'],
+            workers=max(options['workers'], 1),
+            password=options['password'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write if options['verbosity'] > 1 else None
+        )
+        for label, count in sorted(totals.items()):
+            self.stdout.write(f'  {label}: {count}')
+
+        if not options['skip_index']:
+            self.stdout.write('Rebuilding search index...')
+            self.stdout.write(f'  Indexed {rebuild_index()} objects')
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
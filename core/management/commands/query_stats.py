@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from core.query_stats import get_view_summary
+
+
+class Command(BaseCommand):
+    help = 'Show the views running the most queries, from the statistics of QueryInstrumentationMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, help='Only include the last minutes (default: all kept windows)')
+        parser.add_argument(
+            '--order-by', default='queries',
+            choices=['queries', 'avg_queries', 'max_queries', 'db_time', 'repeated'],
+            help='Sort views by this column'
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Number of views to show')
+        parser.add_argument('--repeated', action='store_true', help='Also list the repeated queries of each view')
+
+    def handle(self, *args, **options):
+        summary = get_view_summary(options['minutes'], options['order_by'])[:options['limit']]
+        if not summary:
+            self.stdout.write('No query statistics recorded yet (the cache must be shared with the web processes)')
+            return
+
+        self.stdout.write(f'{"view":<45} {"requests":>9} {"avg q":>7} {"max q":>6} {"avg db ms":>10} {"avg ms":>8} {"N+1":>5}')
+        for row in summary:
+            self.stdout.write(
+                f'{row["view"][:45]:<45} {row["requests"]:>9} {row["avg_queries"]:>7} {row["max_queries"]:>6} '
+                f'{row["avg_db_time"]:>10} {row["avg_time"]:>8} {len(row["repeated"]):>5}'
+            )
+            if options['repeated']:
+                for entry in row['repeated']:
+                    self.stdout.write(self.style.WARNING(
+                        f'    {entry["requests"]} requests, up to {entry["max_count"]}x: {entry["sql"][:200]}'
+                    ))
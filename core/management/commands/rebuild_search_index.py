@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SearchDocument
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of courses, lessons, lesson steps and materials'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', action='append', dest='object_types',
+            choices=[object_type for object_type, _ in SearchDocument.OBJECT_TYPES],
+            help='Only rebuild documents of this type (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding search index...')
+        
+        indexed = rebuild_index(options['object_types'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} objects'))
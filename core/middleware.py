@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from .query_stats import QueryRecorder, format_server_timing, get_view_name, view_stats
+
+
+class FileAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves file downloads alone. Compressing them would
+    drop Content-Length and break byte ranges, and media files are usually
+    compressed already.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Accept-Ranges') or response.has_header('X-Accel-Redirect'):
+            return response
+        return super().process_response(request, response)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records the queries of every request: count, database time and repeated
+    queries (likely N+1s). Adds them as a Server-Timing header and to the
+    per-view statistics of core.query_stats.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_INSTRUMENTATION:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        repeated = recorder.repeated()
+        view_stats.add(get_view_name(request), recorder, repeated, duration)
+        if settings.QUERY_SERVER_TIMING:
+            response['Server-Timing'] = format_server_timing(recorder, repeated, duration)
+        return response
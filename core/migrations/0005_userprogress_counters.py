@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+def fill_progress_counters(apps, schema_editor):
+    UserProgress = apps.get_model('core', 'UserProgress')
+    Lesson = apps.get_model('core', 'Lesson')
+    LessonContent = apps.get_model('core', 'LessonContent')
+    Quiz = apps.get_model('quiz', 'Quiz')
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    
+    course_totals = {}
+    for progress in UserProgress.objects.all().iterator():
+        if progress.course_id not in course_totals:
+            course_totals[progress.course_id] = {
+                'total_lessons': Lesson.objects.filter(module__course_id=progress.course_id).count(),
+                'total_steps': LessonContent.objects.filter(lesson__module__course_id=progress.course_id).count(),
+                'total_quizzes': Quiz.objects.filter(course_id=progress.course_id).count(),
+            }
+        totals = course_totals[progress.course_id]
+        
+        lessons_completed_count = progress.lessons_completed.count()
+        completion_percentage = 0
+        if totals['total_lessons'] > 0:
+            completion_percentage = min(100, round((lessons_completed_count / totals['total_lessons']) * 100))
+        
+        UserProgress.objects.filter(pk=progress.pk).update(
+            lessons_completed_count=lessons_completed_count,
+            steps_completed_count=sum(len(steps) for steps in (progress.lesson_steps_completed or {}).values()),
+            quizzes_completed_count=QuizAttempt.objects.filter(
+                user_id=progress.user_id,
+                quiz__course_id=progress.course_id,
+                is_completed=True
+            ).values('quiz_id').distinct().count(),
+            completion_percentage=completion_percentage,
+            **totals
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_course_is_published_alter_course_language_and_more'),
+        ('quiz', '0003_alter_question_order_alter_question_question_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='completion_percentage',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='lessons_completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='quizzes_completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='steps_completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='total_lessons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='total_quizzes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='total_steps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_progress_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_userprogress_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StepCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.PositiveIntegerField()),
+                ('completed_at', models.DateTimeField(auto_now_add=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='step_completions', to='core.lesson')),
+                ('progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='step_completions', to='core.userprogress')),
+            ],
+            options={
+                'unique_together': {('progress', 'lesson', 'step')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+from django.db import migrations
+
+
+def copy_steps_to_rows(apps, schema_editor):
+    UserProgress = apps.get_model('core', 'UserProgress')
+    Lesson = apps.get_model('core', 'Lesson')
+    StepCompletion = apps.get_model('core', 'StepCompletion')
+    
+    lesson_ids = set(Lesson.objects.values_list('id', flat=True))
+    
+    for progress in UserProgress.objects.exclude(lesson_steps_completed={}).iterator():
+        steps_by_lesson = progress.lesson_steps_completed
+        if not isinstance(steps_by_lesson, dict):
+            continue
+        
+        rows = []
+        for lesson_id, steps in steps_by_lesson.items():
+            # Skip lessons that were deleted after the steps were recorded
+            if not str(lesson_id).isdigit() or int(lesson_id) not in lesson_ids:
+                continue
+            for step in set(steps):
+                rows.append(StepCompletion(progress_id=progress.id, lesson_id=int(lesson_id), step=int(step)))
+        
+        StepCompletion.objects.bulk_create(rows, ignore_conflicts=True)
+        UserProgress.objects.filter(pk=progress.pk).update(
+            steps_completed_count=StepCompletion.objects.filter(progress_id=progress.id).count()
+        )
+
+
+def copy_rows_to_steps(apps, schema_editor):
+    UserProgress = apps.get_model('core', 'UserProgress')
+    StepCompletion = apps.get_model('core', 'StepCompletion')
+    
+    steps_by_progress = {}
+    for progress_id, lesson_id, step in StepCompletion.objects.values_list('progress_id', 'lesson_id', 'step').iterator():
+        steps_by_progress.setdefault(progress_id, {}).setdefault(str(lesson_id), []).append(step)
+    
+    for progress_id, steps_by_lesson in steps_by_progress.items():
+        UserProgress.objects.filter(pk=progress_id).update(lesson_steps_completed=steps_by_lesson)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_stepcompletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_steps_to_rows, copy_rows_to_steps),
+    ]
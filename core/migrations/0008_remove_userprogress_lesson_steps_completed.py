@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_copy_lesson_steps_completed'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprogress',
+            name='lesson_steps_completed',
+        ),
+    ]
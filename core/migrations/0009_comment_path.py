@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+# Same rule as Comment.accepts_replies
+PATH_STEP_LENGTH = 11
+MAX_PATH_LENGTH = 255
+
+
+def fill_comment_paths(apps, schema_editor):
+    """
+    Fill the paths of existing comments. Replies nested deeper than a path
+    can hold are moved up to their deepest ancestor that still accepts replies.
+    """
+    Comment = apps.get_model('core', 'Comment')
+    
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    paths = {}
+    moved = set()
+    
+    def get_path(comment_id):
+        if comment_id not in paths:
+            parent_id = parents[comment_id]
+            parent_path = get_path(parent_id) if parent_id else ''
+            while len(parent_path) + PATH_STEP_LENGTH > MAX_PATH_LENGTH:
+                parent_id = parents[parent_id]
+                parent_path = paths[parent_id]
+            if parent_id != parents[comment_id]:
+                parents[comment_id] = parent_id
+                moved.add(comment_id)
+            paths[comment_id] = f'{parent_path}{comment_id:010d}/'
+        return paths[comment_id]
+    
+    for comment_id in list(parents):
+        path = get_path(comment_id)
+        if comment_id in moved:
+            Comment.objects.filter(pk=comment_id).update(path=path, parent_id=parents[comment_id])
+        else:
+            Comment.objects.filter(pk=comment_id).update(path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_remove_userprogress_lesson_steps_completed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['material', 'path'], name='core_commen_materia_77502a_idx'),
+        ),
+        migrations.RunPython(fill_comment_paths, migrations.RunPython.noop),
+    ]
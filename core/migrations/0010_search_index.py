@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:11
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# GIN indexes only exist on PostgreSQL, other databases search through SearchTerm
+def create_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS core_searchdocument_vector_gin '
+            'ON core_searchdocument USING gin (search_vector)'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS core_searchdocument_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_comment_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('course', 'Курс'), ('lesson', 'Урок'), ('step', 'Шаг урока'), ('material', 'Материал')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('language', models.CharField(default='ru', max_length=10)),
+                ('config', models.CharField(default='russian', max_length=20)),
+                ('is_public', models.BooleanField(default=True)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='core.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='core.searchdocument')),
+            ],
+            options={
+                'unique_together': {('term', 'document')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=models.Index(fields=['object_type', 'is_public'], name='core_search_object__c4acee_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchdocument',
+            unique_together={('object_type', 'object_id')},
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
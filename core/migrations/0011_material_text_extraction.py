@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='extracted_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Ожидает обработки'), ('done', 'Текст извлечён'), ('unsupported', 'Формат не поддерживается'), ('failed', 'Ошибка извлечения')], default='pending', editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:17
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_material_text_extraction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_content_addressed_storage, upload_to='profile_pictures/'),
+        ),
+        migrations.AlterField(
+            model_name='lessoncontent',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_content_addressed_storage, upload_to='lesson_images/'),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='file',
+            field=models.FileField(storage=core.storage.get_content_addressed_storage, upload_to='materials/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='outline_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
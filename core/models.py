@@ -1,7 +1,11 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 
+from .storage import get_content_addressed_storage
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -12,7 +16,9 @@ class CustomUser(AbstractUser):
     role = models.CharField(max_length=15, choices=ROLE_CHOICES, default='student')
     first_name = models.CharField(max_length=30)
     last_name = models.CharField(max_length=30)
-    profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
+    profile_picture = models.ImageField(
+        upload_to='profile_pictures/', storage=get_content_addressed_storage, null=True, blank=True
+    )
     bio = models.TextField(blank=True, null=True)
     
     def __str__(self):
@@ -31,6 +37,8 @@ class Course(models.Model):
         ('en', _('Английский')),
         ('ky', _('Кыргызский'))
     ), default='ru', db_index=True)
+    # Bumped whenever the course structure changes, see core/outline.py
+    outline_version = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         indexes = [
@@ -41,6 +49,15 @@ class Course(models.Model):
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # The outline version is only bumped in the database, a stale instance must not write an older one back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'outline_version'
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def lesson_count(self):
         """Return total number of lessons in the course"""
@@ -110,27 +127,13 @@ class Module(models.Model):
 
     def get_progress_for_user(self, user):
         """Get progress percentage for a specific user"""
-        # Get user progress for the course
-        from .models import UserProgress
+        from .progress import resolve_course_progress
         
-        try:
-            user_progress = UserProgress.objects.get(user=user, course=self.course)
-            # Count total and completed lessons
-            total_lessons = self.lessons.count()
-            if total_lessons == 0:
-                return 0, False
-                
-            completed_lessons = user_progress.lessons_completed.filter(module=self).count()
-            progress_percentage = (completed_lessons / total_lessons) * 100
-            is_completed = (completed_lessons == total_lessons)
-            
-            # Check if module has a quiz and it's completed
-            if hasattr(self, 'quiz') and self.quiz:
-                is_completed = is_completed and (self.quiz in user_progress.tests_completed.all())
-            
-            return round(progress_percentage), is_completed
-        except UserProgress.DoesNotExist:
+        progress = resolve_course_progress(user, self.course_id)
+        module_status = progress.get_module(self.id)
+        if not progress.is_enrolled or module_status is None:
             return 0, False
+        return module_status['progress_percentage'], module_status['completed']
 
 
 class Lesson(models.Model):
@@ -166,14 +169,8 @@ class Lesson(models.Model):
     def is_finished(self, user):
         """Check if the specified user has completed this lesson"""
         from .models import UserProgress
-        try:
-            # Get user progress for this course
-            progress = UserProgress.objects.get(user=user, course=self.course)
-            
-            # Check if this lesson is in completed_lessons
-            return self in progress.lessons_completed.all()
-        except UserProgress.DoesNotExist:
-            return False
+        
+        return UserProgress.objects.filter(user=user, lessons_completed=self).exists()
 
 
 class LessonContent(models.Model):
@@ -182,7 +179,9 @@ class LessonContent(models.Model):
     title = models.CharField(max_length=100)
     content = models.TextField(help_text=_('HTML content for this step'))
     order = models.PositiveIntegerField(default=1)
-    image = models.ImageField(upload_to='lesson_images/', null=True, blank=True)
+    image = models.ImageField(
+        upload_to='lesson_images/', storage=get_content_addressed_storage, null=True, blank=True
+    )
     code_snippet = models.TextField(blank=True, null=True, help_text=_('Optional code snippet for this step'))
     
     class Meta:
@@ -235,7 +234,7 @@ class MaterialType(models.TextChoices):
 class Material(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    file = models.FileField(upload_to='materials/')
+    file = models.FileField(upload_to='materials/', storage=get_content_addressed_storage)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='materials', null=True, blank=True)
@@ -251,11 +250,39 @@ class Material(models.Model):
         ('ky', _('Кыргызский'))
     ), default='ru')
     
+    # Text extracted from the file in the background (see core/extraction.py)
+    EXTRACTION_PENDING = 'pending'
+    EXTRACTION_DONE = 'done'
+    EXTRACTION_UNSUPPORTED = 'unsupported'
+    EXTRACTION_FAILED = 'failed'
+    EXTRACTION_STATUSES = (
+        (EXTRACTION_PENDING, _('Ожидает обработки')),
+        (EXTRACTION_DONE, _('Текст извлечён')),
+        (EXTRACTION_UNSUPPORTED, _('Формат не поддерживается')),
+        (EXTRACTION_FAILED, _('Ошибка извлечения')),
+    )
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True)
+    extracted_text = models.TextField(blank=True, default='', editable=False)
+    extraction_status = models.CharField(
+        max_length=20, choices=EXTRACTION_STATUSES, default=EXTRACTION_PENDING, editable=False
+    )
+    
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
         return self.name
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored file so a re-upload can be told apart from other edits
+        instance._loaded_file_name = dict(zip(field_names, values)).get('file')
+        return instance
+    
+    @property
+    def file_changed(self):
+        return self.file.name != getattr(self, '_loaded_file_name', None)
 
 
 class Comment(models.Model):
@@ -265,9 +292,48 @@ class Comment(models.Model):
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='comments')
     material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='comments')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Materialized path of zero-padded IDs from the root, e.g. "0000000012/0000000034/".
+    # Ordering by it returns every thread depth-first in a single query.
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    
+    PATH_STEP_LENGTH = 11  # 10 digits and a slash
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['material', 'path']),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.material.name}"
+    
+    def clean(self):
+        if self.parent_id and not self.parent.accepts_replies:
+            raise ValidationError({'parent': _('Слишком глубокая вложенность ответов.')})
+    
+    def save(self, *args, **kwargs):
+        # A reply deeper than the path can hold is rejected, views and serializers check it first
+        if not self.path and self.parent_id and not self.parent.accepts_replies:
+            raise ValidationError({'parent': _('Слишком глубокая вложенность ответов.')})
+        
+        super().save(*args, **kwargs)
+        # The path needs the primary key, so it is filled in right after the insert
+        if not self.path:
+            parent_path = self.parent.path if self.parent_id else ''
+            self.path = f'{parent_path}{self.pk:010d}/'
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+    
+    @property
+    def depth(self):
+        return len(self.path) // self.PATH_STEP_LENGTH - 1
+    
+    @property
+    def accepts_replies(self):
+        """Whether the path of a reply to this comment still fits in the path field"""
+        return len(self.path) + self.PATH_STEP_LENGTH <= self._meta.get_field('path').max_length
+    
+    @property
+    def root_path(self):
+        return self.path[:self.PATH_STEP_LENGTH]
 
 
 class Test(models.Model):
@@ -323,8 +389,22 @@ class UserProgress(models.Model):
     tests_completed = models.ManyToManyField(Test, related_name='completed_by')
     lessons_completed = models.ManyToManyField(Lesson, related_name='completed_by')
     last_access = models.DateTimeField(auto_now=True)
-    lesson_steps_completed = models.JSONField(blank=True, default=dict, 
-                                             help_text=_('JSON containing lesson_id:step_number pairs for completed steps'))
+    
+    # Denormalized counters so that dashboards don't have to aggregate per course
+    lessons_completed_count = models.PositiveIntegerField(default=0)
+    total_lessons = models.PositiveIntegerField(default=0)
+    steps_completed_count = models.PositiveIntegerField(default=0)
+    total_steps = models.PositiveIntegerField(default=0)
+    quizzes_completed_count = models.PositiveIntegerField(default=0)
+    total_quizzes = models.PositiveIntegerField(default=0)
+    completion_percentage = models.PositiveSmallIntegerField(default=0)
+    
+    COUNTER_FIELDS = [
+        'lessons_completed_count', 'total_lessons',
+        'steps_completed_count', 'total_steps',
+        'quizzes_completed_count', 'total_quizzes',
+        'completion_percentage',
+    ]
     
     class Meta:
         indexes = [
@@ -334,3 +414,209 @@ class UserProgress(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.course.title}"
+    
+    def save(self, *args, **kwargs):
+        # New enrollments start with the current size of the course
+        if self._state.adding:
+            for field, value in self.get_course_totals(self.course_id).items():
+                setattr(self, field, value)
+        super().save(*args, **kwargs)
+    
+    @property
+    def is_completed(self):
+        """Check if all lessons of the course are completed"""
+        return self.total_lessons > 0 and self.lessons_completed_count >= self.total_lessons
+    
+    @staticmethod
+    def get_course_totals(course_id):
+        """Return the number of lessons, steps and quizzes in a course"""
+        from quiz.models import Quiz
+        
+        return {
+            'total_lessons': Lesson.objects.filter(module__course_id=course_id).count(),
+            'total_steps': LessonContent.objects.filter(lesson__module__course_id=course_id).count(),
+            'total_quizzes': Quiz.objects.filter(course_id=course_id).count(),
+        }
+    
+    def calculate_percentage(self):
+        """Return the completion percentage based on the lesson counters"""
+        if self.total_lessons == 0:
+            return 0
+        return min(100, round((self.lessons_completed_count / self.total_lessons) * 100))
+    
+    def update_counters(self, save=True):
+        """Recalculate the completed counters of this enrollment"""
+        from quiz.models import QuizAttempt
+        
+        self.lessons_completed_count = self.lessons_completed.count()
+        self.steps_completed_count = self.step_completions.count()
+        self.quizzes_completed_count = QuizAttempt.objects.filter(
+            user_id=self.user_id,
+            quiz__course_id=self.course_id,
+            is_completed=True
+        ).values('quiz_id').distinct().count()
+        self.completion_percentage = self.calculate_percentage()
+        
+        if save:
+            self.save(update_fields=self.COUNTER_FIELDS)
+    
+    def get_completed_steps(self, lesson):
+        """Return the set of step numbers completed in a lesson"""
+        return set(self.step_completions.filter(lesson=lesson).values_list('step', flat=True))
+    
+    def mark_step_completed(self, lesson, step):
+        """Record a completed lesson step"""
+        self.record_step_completions([(self.pk, lesson.pk, step)])
+    
+    @classmethod
+    def record_step_completions(cls, completions):
+        """
+        Store completed steps, given as (progress_id, lesson_id, step), and refresh
+        the step counters and last access of their enrollments with one insert and
+        one update, however many steps and enrollments there are.
+        The insert is idempotent, so concurrent requests for the same step can't
+        create duplicates or overwrite each other's progress.
+        """
+        from django.db.models import Count, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+        from django.utils import timezone
+        
+        StepCompletion.objects.bulk_create(
+            [StepCompletion(progress_id=progress_id, lesson_id=lesson_id, step=step)
+             for progress_id, lesson_id, step in completions],
+            ignore_conflicts=True
+        )
+        
+        completed_steps = StepCompletion.objects.filter(
+            progress_id=OuterRef('pk')
+        ).order_by().values('progress_id').annotate(total=Count('id')).values('total')
+        
+        cls.objects.filter(pk__in={progress_id for progress_id, _, _ in completions}).update(
+            steps_completed_count=Coalesce(Subquery(completed_steps), 0),
+            last_access=timezone.now()
+        )
+    
+    def mark_lesson_completed(self, lesson):
+        """Add a lesson to the completed lessons and refresh the counters"""
+        self.lessons_completed.add(lesson)
+        self.update_counters()
+    
+    @classmethod
+    def refresh_course_counters(cls, course_id):
+        """
+        Re-sync the counters of every enrollment in a course.
+        Used when lessons, steps or quizzes are added to or removed from the course.
+        """
+        from django.db.models import Count, OuterRef, Subquery
+        from django.db.models.functions import Coalesce, Round
+        from quiz.models import QuizAttempt
+        
+        totals = cls.get_course_totals(course_id)
+        
+        completed_lessons = cls.lessons_completed.through.objects.filter(
+            userprogress_id=OuterRef('pk')
+        ).order_by().values('userprogress_id').annotate(total=Count('lesson_id')).values('total')
+        
+        completed_steps = StepCompletion.objects.filter(
+            progress_id=OuterRef('pk')
+        ).order_by().values('progress_id').annotate(total=Count('id')).values('total')
+        
+        completed_quizzes = QuizAttempt.objects.filter(
+            user_id=OuterRef('user_id'),
+            quiz__course_id=course_id,
+            is_completed=True
+        ).order_by().values('user_id').annotate(total=Count('quiz_id', distinct=True)).values('total')
+        
+        enrollments = cls.objects.filter(course_id=course_id)
+        enrollments.update(
+            lessons_completed_count=Coalesce(Subquery(completed_lessons), 0),
+            steps_completed_count=Coalesce(Subquery(completed_steps), 0),
+            quizzes_completed_count=Coalesce(Subquery(completed_quizzes), 0),
+            **totals
+        )
+        
+        if totals['total_lessons'] > 0:
+            enrollments.update(completion_percentage=Round(
+                models.F('lessons_completed_count') * 100.0 / totals['total_lessons']
+            ))
+        else:
+            enrollments.update(completion_percentage=0)
+
+
+class StepCompletion(models.Model):
+    """A lesson step completed within an enrollment"""
+    progress = models.ForeignKey(UserProgress, on_delete=models.CASCADE, related_name='step_completions')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='step_completions')
+    step = models.PositiveIntegerField()
+    completed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('progress', 'lesson', 'step')
+    
+    def __str__(self):
+        return f"{self.progress} - {self.lesson.title} ({self.step})"
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of a course, lesson, lesson step or material.
+    On PostgreSQL search_vector holds the weighted tsvector (GIN indexed),
+    other databases use the SearchTerm inverted index instead.
+    """
+    COURSE = 'course'
+    LESSON = 'lesson'
+    STEP = 'step'
+    MATERIAL = 'material'
+    OBJECT_TYPES = (
+        (COURSE, _('Курс')),
+        (LESSON, _('Урок')),
+        (STEP, _('Шаг урока')),
+        (MATERIAL, _('Материал')),
+    )
+    
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPES)
+    object_id = models.PositiveIntegerField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='search_documents')
+    language = models.CharField(max_length=10, default='ru')
+    # PostgreSQL text search configuration matching the language
+    config = models.CharField(max_length=20, default='russian')
+    is_public = models.BooleanField(default=True)
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    search_vector = SearchVectorField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('object_type', 'object_id')
+        indexes = [
+            models.Index(fields=['object_type', 'is_public']),
+        ]
+    
+    def __str__(self):
+        return f"{self.object_type} {self.object_id}: {self.title}"
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry used for search when the database isn't PostgreSQL"""
+    term = models.CharField(max_length=100)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    weight = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        unique_together = ('term', 'document')
+    
+    def __str__(self):
+        return self.term
+
+
+class StoredBlob(models.Model):
+    """A file kept once by the content-addressed storage, with its reference count"""
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
@@ -0,0 +1,143 @@
+"""
+Precomputed course outline shared by the navigation views.
+
+The outline holds the ordered modules and lessons of a course, step counts,
+the next-lesson chain and module quizzes. It is cached per course under the
+course's outline_version, which the signals in core/signals.py bump in the
+database whenever the course structure changes. Every process reads the
+version from the database, so outdated outlines are never read again, even
+with a cache that isn't shared by the processes.
+"""
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .models import Course, Module, Lesson
+
+OUTLINE_CACHE_TIMEOUT = 60 * 60  # 1 hour, invalidation is handled by versions
+
+
+class CourseOutline:
+    """Ordered structure of a course built from a fixed number of queries"""
+
+    def __init__(self, course_id, modules, lessons, quizzes):
+        self.course_id = course_id
+        # Modules in order, each with its ordered lesson IDs and quiz (if any)
+        self.modules = []
+        # Lessons by ID
+        self.lessons = {}
+        # Lesson IDs in course order
+        self.lesson_ids = []
+
+        quizzes_by_module = {quiz['module_id']: quiz for quiz in quizzes if quiz['module_id']}
+        lessons_by_module = {}
+        for lesson in lessons:
+            lessons_by_module.setdefault(lesson['module_id'], []).append(lesson)
+
+        for module in modules:
+            module_lessons = lessons_by_module.get(module['id'], [])
+            self.modules.append({
+                'id': module['id'],
+                'title': module['title'],
+                'order': module['order'],
+                'lesson_ids': [lesson['id'] for lesson in module_lessons],
+                'quiz': quizzes_by_module.get(module['id']),
+            })
+            for lesson in module_lessons:
+                self.lessons[lesson['id']] = lesson
+                self.lesson_ids.append(lesson['id'])
+
+        # Link every lesson to the one that follows it in the course
+        for index, lesson_id in enumerate(self.lesson_ids):
+            next_id = self.lesson_ids[index + 1] if index + 1 < len(self.lesson_ids) else None
+            self.lessons[lesson_id]['next_lesson_id'] = next_id
+
+        self._modules_by_id = {module['id']: module for module in self.modules}
+
+    @property
+    def lesson_count(self):
+        return len(self.lesson_ids)
+
+    @property
+    def step_count(self):
+        return sum(lesson['step_count'] for lesson in self.lessons.values())
+
+    def get_module(self, module_id):
+        return self._modules_by_id.get(module_id)
+
+    def get_lesson(self, lesson_id):
+        return self.lessons.get(lesson_id)
+
+    def get_step_count(self, lesson_id):
+        lesson = self.lessons.get(lesson_id)
+        return lesson['step_count'] if lesson else 0
+
+    def get_module_lesson_ids(self, module_id):
+        module = self._modules_by_id.get(module_id)
+        return module['lesson_ids'] if module else []
+
+    def get_module_quiz(self, module_id):
+        module = self._modules_by_id.get(module_id)
+        return module['quiz'] if module else None
+
+    def get_next_lesson_id(self, lesson_id):
+        """Return the ID of the lesson following this one in the course"""
+        lesson = self.lessons.get(lesson_id)
+        return lesson['next_lesson_id'] if lesson else None
+
+    def get_next_lesson_in_module(self, lesson_id):
+        """Return the ID of the next lesson within the same module, if any"""
+        lesson = self.lessons.get(lesson_id)
+        if not lesson:
+            return None
+        next_id = lesson['next_lesson_id']
+        if next_id and self.lessons[next_id]['module_id'] == lesson['module_id']:
+            return next_id
+        return None
+
+    def get_first_uncompleted_lesson_id(self, completed_lesson_ids):
+        for lesson_id in self.lesson_ids:
+            if lesson_id not in completed_lesson_ids:
+                return lesson_id
+        return None
+
+
+def get_outline_version(course_id):
+    """Return the current outline version of a course, None if there is no such course"""
+    return Course.objects.filter(pk=course_id).values_list('outline_version', flat=True).first()
+
+
+def invalidate_course_outline(course_id):
+    """Bump the outline version of the course so the cached outline is rebuilt"""
+    Course.objects.filter(pk=course_id).update(outline_version=F('outline_version') + 1)
+
+
+def build_course_outline(course_id):
+    """Build the outline of a course straight from the database"""
+    from quiz.models import Quiz
+
+    modules = Module.objects.filter(course_id=course_id).order_by('order').values('id', 'title', 'order')
+    lessons = Lesson.objects.filter(module__course_id=course_id).annotate(
+        step_count=Count('steps')
+    ).order_by('module__order', 'order').values(
+        'id', 'title', 'order', 'module_id', 'estimated_time', 'step_count'
+    )
+    quizzes = Quiz.objects.filter(course_id=course_id).values('id', 'title', 'time_limit', 'module_id')
+
+    return CourseOutline(course_id, list(modules), list(lessons), list(quizzes))
+
+
+def get_course_outline(course_id, version=None):
+    """
+    Return the cached outline of a course, building it if needed.
+    Pass the outline version when the caller has already loaded the course.
+    """
+    if version is None:
+        version = get_outline_version(course_id)
+    cache_key = f'course_outline_{course_id}_{version}'
+    outline = cache.get(cache_key)
+
+    if outline is None:
+        outline = build_course_outline(course_id)
+        cache.set(cache_key, outline, OUTLINE_CACHE_TIMEOUT)
+
+    return outline
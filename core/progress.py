@@ -0,0 +1,105 @@
+"""
+Batched progress resolver for a user in a course.
+
+Per-module and per-lesson completion is computed from the cached course
+outline and a fixed number of queries, however many modules and lessons
+the course has.
+"""
+from django.db.models import Count
+
+from .models import UserProgress, StepCompletion
+from .outline import get_course_outline
+from .step_progress import merge_completed_step_counts
+
+
+class CourseProgress:
+    """Completion maps of a user in a course"""
+
+    def __init__(self, outline, user_progress, completed_lesson_ids, completed_quiz_ids, completed_steps):
+        self.outline = outline
+        self.user_progress = user_progress
+        self.completed_lesson_ids = completed_lesson_ids
+        self.completed_quiz_ids = completed_quiz_ids
+        self.next_lesson_id = outline.get_first_uncompleted_lesson_id(completed_lesson_ids)
+
+        # Lesson status by lesson ID
+        self.lessons = {}
+        for lesson_id, lesson in outline.lessons.items():
+            self.lessons[lesson_id] = {
+                'id': lesson_id,
+                'is_finished': lesson_id in completed_lesson_ids,
+                'is_current': lesson_id == self.next_lesson_id,
+                'steps_completed': completed_steps.get(lesson_id, 0),
+                'step_count': lesson['step_count'],
+            }
+
+        # Module status by module ID
+        self.modules = {}
+        for module in outline.modules:
+            lesson_ids = module['lesson_ids']
+            completed_count = sum(1 for lesson_id in lesson_ids if lesson_id in completed_lesson_ids)
+            completed = bool(lesson_ids) and completed_count == len(lesson_ids)
+            quiz_completed = bool(module['quiz']) and module['quiz']['id'] in completed_quiz_ids
+
+            # A module with a quiz is only completed once the quiz is passed as well
+            if module['quiz']:
+                completed = completed and quiz_completed
+
+            self.modules[module['id']] = {
+                'id': module['id'],
+                'lessons_completed': completed_count,
+                'lessons_total': len(lesson_ids),
+                'progress_percentage': round((completed_count / len(lesson_ids)) * 100) if lesson_ids else 0,
+                'completed': completed,
+                'quiz_completed': quiz_completed,
+            }
+
+    @property
+    def is_enrolled(self):
+        return self.user_progress is not None
+
+    def get_module(self, module_id):
+        return self.modules.get(module_id)
+
+    def get_lesson(self, lesson_id):
+        return self.lessons.get(lesson_id)
+
+    def is_lesson_finished(self, lesson_id):
+        return lesson_id in self.completed_lesson_ids
+
+    def is_quiz_completed(self, quiz_id):
+        return quiz_id in self.completed_quiz_ids
+
+
+def resolve_course_progress(user, course_id, user_progress=None, outline=None):
+    """
+    Return the CourseProgress of a user in a course.
+    Pass user_progress and outline when the caller has already loaded them.
+    """
+    from quiz.models import QuizAttempt
+
+    if outline is None:
+        outline = get_course_outline(course_id)
+
+    if user_progress is None and user.is_authenticated:
+        user_progress = UserProgress.objects.filter(user=user, course_id=course_id).first()
+
+    completed_lesson_ids = set()
+    completed_quiz_ids = set()
+    completed_steps = {}
+
+    if user_progress is not None:
+        completed_lesson_ids = set(user_progress.lessons_completed.values_list('id', flat=True))
+        completed_quiz_ids = set(QuizAttempt.objects.filter(
+            user=user,
+            quiz__course_id=course_id,
+            is_completed=True
+        ).values_list('quiz_id', flat=True))
+        completed_steps = dict(
+            StepCompletion.objects.filter(progress=user_progress)
+            .values('lesson_id').annotate(count=Count('id')).values_list('lesson_id', 'count')
+        )
+        # Steps recorded but not flushed yet count as completed
+        completed_steps = merge_completed_step_counts(user_progress, completed_steps)
+
+    return CourseProgress(outline, user_progress, completed_lesson_ids, completed_quiz_ids, completed_steps)
@@ -0,0 +1,294 @@
+"""
+Query-budget regression tests.
+
+QueryBudgetTestCase seeds a small load dataset (generate_load_dataset) plus
+a course with every kind of related object (an open quiz attempt, both
+kinds of certificates, comments with replies). Then it requests
+every URL of one URLconf as each role and fails when a view runs more
+queries than its declared budget, crashes, or has no budget at all.
+
+Each app declares its budgets in its tests.py, keyed by URL route. Import
+the module rather than the class, or the runner also collects the base:
+
+    class QuizQueryBudgetTests(query_budgets.QueryBudgetTestCase):
+        urlconf = 'quiz.urls'
+        url_prefix = '/quiz/'
+        budgets = {
+            '': 8,
+            '<int:pk>/': Budget(10, pk='quiz'),
+            '<int:pk>/take/': Budget({'student': 14, 'default': 12}, pk='quiz'),
+        }
+
+URL arguments name attributes of the seeded test class: pk='quiz' uses
+cls.quiz.pk, certificate_id='core_certificate.certificate_id' a field of it.
+Every request runs with a cold cache inside a savepoint that is rolled
+back, so requests don't influence each other.
+
+Requests are GETs unless the budget declares another method, with a payload
+built from the seeded objects; a route can have a list of budgets, one per
+request:
+
+    'api/comments/': [
+        4,
+        Budget(7, method='post', content_type=JSON,
+               data=lambda test: {'content': 'Ответ', 'material': test.material.pk}),
+    ],
+"""
+import io
+import re
+import shutil
+import tempfile
+from importlib import import_module
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+
+from .models import Comment, Course, CustomUser, Lesson, LessonContent, Material, Module, UserProgress
+
+ROLES = ('anonymous', 'student', 'doctor', 'staff')
+
+JSON = 'application/json'
+
+PATH_ARGUMENT_RE = re.compile(r'<(?:\w+:)?(\w+)>')
+REGEX_ARGUMENT_RE = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+class Budget:
+    """
+    Maximum number of queries of a view, one number or {role: number, 'default': number}.
+    known_failure documents a view that currently fails to render; its queries are
+    still counted, but a server error doesn't fail the test.
+    method, data and content_type describe the request; data is a dict or a function
+    of the test case returning one, headers are extra request headers.
+    """
+
+    def __init__(self, max_queries, known_failure=None, method='get', data=None, content_type=None,
+                 headers=None, **url_kwargs):
+        self.max_queries = max_queries
+        self.known_failure = known_failure
+        self.method = method
+        self.data = data
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.url_kwargs = url_kwargs
+
+    def for_role(self, role):
+        if isinstance(self.max_queries, dict):
+            return self.max_queries.get(role, self.max_queries['default'])
+        return self.max_queries
+
+
+def iter_routes(patterns, prefix=''):
+    """Full routes of a URLconf, without the router's format-suffix duplicates"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            route = prefix + str(pattern.pattern)
+            if 'format>' not in route:
+                yield route
+
+
+def build_path(route, kwargs):
+    path = REGEX_ARGUMENT_RE.sub(lambda match: str(kwargs[match.group(1)]), route)
+    path = PATH_ARGUMENT_RE.sub(lambda match: str(kwargs[match.group(1)]), path)
+    return path.replace('^', '').replace('$', '')
+
+
+class QueryBudgetTestCase(TestCase):
+    urlconf = None
+    url_prefix = '/'
+    budgets = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._settings_override = override_settings(
+            MEDIA_ROOT=cls._media_root,
+            MATERIAL_EXTRACTION_WORKERS=0,
+            CERTIFICATE_RENDER_WORKERS=0,
+            IMAGE_VARIANT_WORKERS=0,
+            MATERIAL_ACCEL_REDIRECT_PREFIX=None,
+            # The manifest only exists after collectstatic
+            STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+        )
+        cls._settings_override.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._settings_override.disable()
+            shutil.rmtree(cls._media_root, ignore_errors=True)
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._settings_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        if cls.urlconf is None:
+            return
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.seed()
+
+    @classmethod
+    def seed(cls):
+        call_command('generate_load_dataset', scale=0.0001, workers=1, stdout=io.StringIO())
+
+        cls.users = {
+            'student': CustomUser.objects.get(username='student1'),
+            'doctor': CustomUser.objects.get(username='doctor1'),
+            'staff': CustomUser.objects.get(username='admin'),
+        }
+        cls.student, cls.doctor, cls.staff = cls.users['student'], cls.users['doctor'], cls.users['staff']
+        cls.seed_course()
+
+    @classmethod
+    def seed_course(cls):
+        """A published course with modules, lessons, steps and quizzes, taken by the student"""
+        from certificate.models import Certificate
+        from quiz.models import Choice, Question, Quiz, QuizAttempt, StudentAnswer
+
+        student = cls.users['student']
+        cls.course = Course.objects.create(
+            title='Гематология: практикум', description='Курс для проверки числа запросов',
+            author=cls.users['doctor'], is_published=True
+        )
+        for module_order in range(1, 5):
+            module = Module.objects.create(course=cls.course, title=f'Модуль {module_order}', order=module_order)
+            for lesson_order in range(1, 5):
+                lesson = Lesson.objects.create(module=module, title=f'Урок {module_order}.{lesson_order}', order=lesson_order)
+                LessonContent.objects.bulk_create([
+                    LessonContent(lesson=lesson, title=f'Шаг {step}', content=f'<p>Содержание шага {step}</p>', order=step)
+                    for step in range(1, 6)
+                ])
+            quiz = Quiz.objects.create(title=f'Тест модуля {module_order}', description='Тест', module=module, course=cls.course)
+            for question_order in range(1, 6):
+                question = Question.objects.create(quiz=quiz, text=f'Вопрос {question_order}', order=question_order)
+                Choice.objects.bulk_create([
+                    Choice(question=question, text=f'Ответ {choice}', is_correct=choice == 1) for choice in range(1, 5)
+                ])
+            Quiz.refresh_totals(quiz.pk)
+
+        cls.module = module
+        lessons = list(Lesson.objects.filter(module__course=cls.course).order_by('module__order', 'order'))
+        cls.lesson = lessons[0]
+        # Every step but the last is completed, so marking it completes the lesson
+        cls.open_lesson = lessons[6]
+        cls.step = cls.lesson.steps.first()
+        cls.quiz = Quiz.objects.filter(course=cls.course).order_by('pk').first()
+        cls.question = cls.quiz.questions.first()
+
+        progress = UserProgress.objects.create(user=student, course=cls.course)
+        for lesson in lessons[:6]:
+            for step in range(1, 6):
+                progress.mark_step_completed(lesson, step)
+            progress.lessons_completed.add(lesson)
+        for step in range(1, 5):
+            progress.mark_step_completed(cls.open_lesson, step)
+        progress.update_counters()
+        # A published course the student hasn't enrolled in
+        cls.open_course = Course.objects.create(
+            title='Кардиология: практикум', description='Курс для записи', author=cls.users['doctor'], is_published=True
+        )
+
+        cls.attempt = QuizAttempt.objects.create(quiz=cls.quiz, user=student)
+        for question in cls.quiz.questions.prefetch_related('choices'):
+            answer = StudentAnswer.objects.create(attempt=cls.attempt, question=question, is_correct=True, points_earned=question.points)
+            answer.choices.add(*[choice for choice in question.choices.all() if choice.is_correct])
+        cls.attempt.record_answers(cls.quiz.question_count, cls.quiz.total_points)
+        cls.attempt.finish()
+        cls.open_attempt = QuizAttempt.objects.create(quiz=cls.quiz, user=student)
+
+        cls.certificate = Certificate.objects.create(user=student, course=cls.course)
+        cls.core_certificate = student.certificates.first() or student.certificates.create(
+            course=cls.course, certificate_id=f'{cls.course.pk}-{student.pk}-00001', score=90
+        )
+
+        cls.material = Material.objects.filter(course__isnull=False).select_related('course').first()
+        UserProgress.objects.get_or_create(user=student, course=cls.material.course)
+        cls.test = cls.material.course.tests.first() or cls.course.tests.create(title='Тест', description='Тест')
+        cls.comment = Comment.objects.create(author=student, material=cls.material, content='Вопрос по материалу')
+        for number in range(5):
+            reply = Comment.objects.create(
+                author=cls.users['doctor'], material=cls.material, parent=cls.comment, content=f'Ответ {number}'
+            )
+        cls.reply = reply
+
+    def get_routes(self):
+        return list(iter_routes(import_module(self.urlconf).urlpatterns))
+
+    def resolve_url_argument(self, value):
+        """'quiz' is the pk of cls.quiz, 'core_certificate.certificate_id' a field of it"""
+        if not isinstance(value, str):
+            return value
+        obj = self
+        for name in value.split('.'):
+            obj = getattr(obj, name)
+        return obj.pk if isinstance(obj, models.Model) else obj
+
+    def request(self, role, path, budget):
+        """Make the request of a budget as a role with a cold cache and return (response, queries)"""
+        self.client.logout()
+        if role != 'anonymous':
+            self.client.force_login(self.users[role])
+        cache.clear()
+
+        data = budget.data(self) if callable(budget.data) else budget.data
+        kwargs = {'content_type': budget.content_type} if budget.content_type else {}
+        send = getattr(self.client, budget.method)
+
+        savepoint = transaction.savepoint()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = send(
+                    path, data, secure=True, headers={'Accept-Language': 'ru', **budget.headers}, **kwargs
+                )
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        return response, queries
+
+    def test_every_route_has_a_budget(self):
+        if self.urlconf is None:
+            self.skipTest('No URLconf')
+        missing = [route for route in self.get_routes() if route not in self.budgets]
+        self.assertEqual(missing, [], f'Routes of {self.urlconf} without a query budget')
+
+    def test_query_budgets(self):
+        if self.urlconf is None:
+            self.skipTest('No URLconf')
+        self.client.raise_request_exception = False
+
+        for route, budgets in self.budgets.items():
+            for budget in budgets if isinstance(budgets, list) else [budgets]:
+                if not isinstance(budget, Budget):
+                    budget = Budget(budget)
+                kwargs = {name: self.resolve_url_argument(value) for name, value in budget.url_kwargs.items()}
+                path = self.url_prefix + build_path(route, kwargs)
+                request = f'{budget.method.upper()} {path}'
+
+                for role in ROLES:
+                    with self.subTest(route=route, method=budget.method, role=role):
+                        response, queries = self.request(role, path, budget)
+                        if not budget.known_failure:
+                            self.assertLess(
+                                response.status_code, 500,
+                                f'{request} as {role} failed: '
+                                f'{getattr(response, "exc_info", None) and response.exc_info[1]!r}'
+                            )
+                        max_queries = budget.for_role(role)
+                        if len(queries) > max_queries:
+                            executed = '\n'.join(
+                                f'{number}. {query["sql"]}'
+                                for number, query in enumerate(queries.captured_queries, start=1)
+                            )
+                            self.fail(
+                                f'{request} as {role} ran {len(queries)} queries, '
+                                f'the budget is {max_queries}:\n{executed}'
+                            )
@@ -0,0 +1,238 @@
+"""
+Per-request SQL instrumentation.
+
+Every query of a request goes through a connection execute wrapper, which
+works with DEBUG off, and is counted, timed and fingerprinted: the SQL with
+literals and IN lists normalized, so the same query with other parameters
+gets the same fingerprint. A fingerprint repeated QUERY_REPEAT_THRESHOLD
+times in one request is reported as a likely N+1.
+
+Totals are also accumulated per view in each process and merged into the
+cache once per QUERY_STATS_FLUSH_INTERVAL, in one-minute windows, so
+get_view_summary() shows the worst views across all workers for the last
+QUERY_STATS_WINDOWS minutes.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+MAX_FINGERPRINTS_PER_VIEW = 20
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\$\d+)\s*,?)+\)', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize SQL so queries differing only in parameters compare equal"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Counts and times the queries run while it is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def record(self):
+        """Install the recorder on every database connection of this thread"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    def repeated(self, threshold=None):
+        """Fingerprints run at least threshold times, most frequent first"""
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class ViewStats:
+    """Query totals per view, accumulated in this process and flushed to the cache"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.process_token = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.views = {}
+        self.reported = set()
+        self.last_flush = time.monotonic()
+
+    def add(self, view_name, recorder, repeated, duration):
+        with self.lock:
+            stats = self.views.setdefault(view_name, _empty_view_stats())
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['db_time'] += recorder.duration
+            stats['time'] += duration
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            for sql, count in repeated:
+                _add_repeated(stats['repeated'], sql, 1, count)
+
+            new_reports = [(sql, count) for sql, count in repeated if (view_name, sql) not in self.reported]
+            self.reported.update((view_name, sql) for sql, _ in new_reports)
+
+            flush = time.monotonic() - self.last_flush >= settings.QUERY_STATS_FLUSH_INTERVAL
+            if flush:
+                views, self.views = self.views, {}
+                self.reported = set()
+                self.last_flush = time.monotonic()
+
+        # Only the first occurrence per flush interval is logged, not every request
+        for sql, count in new_reports:
+            logger.warning('Possible N+1 in %s: query ran %d times: %s', view_name, count, sql[:500])
+
+        if flush:
+            self.flush(views)
+
+    def flush(self, views):
+        if not views:
+            return
+        window = int(time.time() // WINDOW_SECONDS)
+        try:
+            _register_process(window, self.process_token)
+            key = _process_key(window, self.process_token)
+            merged = cache.get(key) or {}
+            for view_name, stats in views.items():
+                _merge_view_stats(merged.setdefault(view_name, _empty_view_stats()), stats)
+            cache.set(key, merged, _window_timeout())
+        except Exception:
+            # Statistics must never break a request
+            logger.exception('Could not store query statistics')
+
+
+view_stats = ViewStats()
+
+
+def _empty_view_stats():
+    return {'requests': 0, 'queries': 0, 'db_time': 0.0, 'time': 0.0, 'max_queries': 0, 'repeated': {}}
+
+
+def _add_repeated(repeated, sql, requests, max_count):
+    entry = repeated.get(sql)
+    if entry is None:
+        if len(repeated) >= MAX_FINGERPRINTS_PER_VIEW:
+            return
+        entry = repeated[sql] = {'requests': 0, 'max_count': 0}
+    entry['requests'] += requests
+    entry['max_count'] = max(entry['max_count'], max_count)
+
+
+def _merge_view_stats(target, stats):
+    for field in ('requests', 'queries', 'db_time', 'time'):
+        target[field] += stats[field]
+    target['max_queries'] = max(target['max_queries'], stats['max_queries'])
+    for sql, entry in stats['repeated'].items():
+        _add_repeated(target['repeated'], sql, entry['requests'], entry['max_count'])
+
+
+def _window_timeout():
+    return (settings.QUERY_STATS_WINDOWS + 1) * WINDOW_SECONDS
+
+
+def _processes_key(window):
+    return f'query_stats_processes_{window}'
+
+
+def _process_key(window, process_token):
+    return f'query_stats_{window}_{process_token}'
+
+
+def _register_process(window, process_token):
+    # Processes register themselves once per window; re-check in case of a concurrent write
+    key = _processes_key(window)
+    for _ in range(3):
+        tokens = cache.get(key) or []
+        if process_token in tokens:
+            return
+        cache.set(key, tokens + [process_token], _window_timeout())
+
+
+def get_view_summary(minutes=None, order_by='queries'):
+    """
+    Query statistics per view over the last minutes, merged across processes,
+    sorted by order_by: queries, avg_queries, db_time, max_queries or repeated.
+    """
+    minutes = min(minutes or settings.QUERY_STATS_WINDOWS, settings.QUERY_STATS_WINDOWS)
+    current = int(time.time() // WINDOW_SECONDS)
+    windows = range(current - minutes + 1, current + 1)
+
+    tokens_by_window = cache.get_many([_processes_key(window) for window in windows])
+    keys = [
+        _process_key(int(processes_key.rsplit('_', 1)[1]), token)
+        for processes_key, tokens in tokens_by_window.items()
+        for token in tokens
+    ]
+
+    merged = {}
+    for views in cache.get_many(keys).values():
+        for view_name, stats in views.items():
+            _merge_view_stats(merged.setdefault(view_name, _empty_view_stats()), stats)
+
+    summary = []
+    for view_name, stats in merged.items():
+        requests = stats['requests']
+        summary.append({
+            'view': view_name,
+            'requests': requests,
+            'queries': stats['queries'],
+            'avg_queries': round(stats['queries'] / requests, 1),
+            'max_queries': stats['max_queries'],
+            'db_time': round(stats['db_time'] * 1000, 1),
+            'avg_db_time': round(stats['db_time'] * 1000 / requests, 2),
+            'avg_time': round(stats['time'] * 1000 / requests, 2),
+            'repeated': sorted(
+                ({'sql': sql, **entry} for sql, entry in stats['repeated'].items()),
+                key=lambda entry: entry['requests'], reverse=True
+            ),
+        })
+
+    if order_by == 'repeated':
+        key = lambda row: sum(entry['requests'] for entry in row['repeated'])
+    else:
+        key = lambda row: row[order_by]
+    return sorted(summary, key=key, reverse=True)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    # URL names aren't unique (the API router reuses names like course-list), the route is
+    return f'{match.view_name or match._func_path} [{match.route}]'
+
+
+def format_server_timing(recorder, repeated, duration):
+    metrics = [
+        f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+        f'app;dur={duration * 1000:.1f}',
+    ]
+    if repeated:
+        metrics.append(f'nplusone;desc="{len(repeated)} repeated queries"')
+    return ', '.join(metrics)
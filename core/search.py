@@ -0,0 +1,290 @@
+"""
+Full-text search over courses, lessons, lesson steps and materials.
+
+Every searchable object has one SearchDocument row with its title, body
+text, language and visibility, kept up to date by the signals in
+core/signals.py. On PostgreSQL the document carries a weighted tsvector
+(title A, body B) built with the text search configuration of its
+language and searched through a GIN index. Other databases (SQLite in
+tests and local development) use the SearchTerm inverted index: every
+query term must match and documents are ranked by the summed term weights.
+"""
+import re
+from collections import Counter
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+from .models import Course, Lesson, LessonContent, Material, SearchDocument, SearchTerm
+
+# PostgreSQL has no Kyrgyz dictionary, so Kyrgyz text is only lowercased
+SEARCH_CONFIGS = {
+    'ru': 'russian',
+    'en': 'english',
+    'ky': 'simple',
+}
+DEFAULT_SEARCH_CONFIG = 'simple'
+
+TITLE_WEIGHT = 3
+BODY_WEIGHT = 1
+MAX_QUERY_TERMS = 10
+# PostgreSQL refuses tsvectors over 1MB, long documents are indexed by their beginning
+MAX_INDEXED_TEXT = 300000
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def use_postgres_search():
+    return connection.vendor == 'postgresql'
+
+
+def get_search_config(language):
+    return SEARCH_CONFIGS.get(language, DEFAULT_SEARCH_CONFIG)
+
+
+def tokenize(text):
+    """Split text into lowercase terms for the inverted index"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 or token.isdigit()
+    ]
+
+
+# Document sources
+
+def course_document(course):
+    outcomes = course.learning_outcomes.values_list('text', flat=True)
+    return {
+        'course_id': course.id,
+        'language': course.language,
+        'is_public': course.is_published,
+        'title': course.title,
+        'body': '\n'.join([course.description, *outcomes]),
+    }
+
+
+def lesson_document(lesson):
+    course = lesson.module.course
+    return {
+        'course_id': course.id,
+        'language': course.language,
+        'is_public': course.is_published,
+        'title': lesson.title,
+        'body': lesson.description,
+    }
+
+
+def step_document(step):
+    course = step.lesson.module.course
+    return {
+        'course_id': course.id,
+        'language': course.language,
+        'is_public': course.is_published,
+        'title': step.title,
+        'body': '\n'.join([strip_tags(step.content), step.code_snippet or '']),
+    }
+
+
+def material_document(material):
+    course = material.course
+    return {
+        'course_id': material.course_id,
+        'language': material.language,
+        # Materials outside of courses are always visible
+        'is_public': course is None or course.is_published,
+        'title': material.name,
+        'body': '\n'.join([material.description, material.extracted_text[:MAX_INDEXED_TEXT]]),
+    }
+
+
+DOCUMENT_SOURCES = {
+    SearchDocument.COURSE: (Course.objects.all(), course_document),
+    SearchDocument.LESSON: (Lesson.objects.select_related('module__course'), lesson_document),
+    SearchDocument.STEP: (LessonContent.objects.select_related('lesson__module__course'), step_document),
+    SearchDocument.MATERIAL: (Material.objects.select_related('course'), material_document),
+}
+
+
+# Indexing
+
+def vector_expression(config=None):
+    """
+    Weighted tsvector of a document built from its own columns, with the
+    given text search configuration or the stored one. An UPDATE that also
+    changes config has to pass the new one, F('config') reads the old value.
+    """
+    config = config or F('config')
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('body', weight='B', config=config)
+    )
+
+
+def build_terms(document):
+    """Inverted index entries of a document"""
+    weights = Counter()
+    for term in tokenize(document.title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(document.body):
+        weights[term] += BODY_WEIGHT
+    return [SearchTerm(document=document, term=term, weight=weight) for term, weight in weights.items()]
+
+
+def index_object(object_type, object_id):
+    """Create or refresh the search document of an object, drop it if the object is gone"""
+    queryset, build = DOCUMENT_SOURCES[object_type]
+    obj = queryset.filter(pk=object_id).first()
+    if obj is None:
+        remove_object(object_type, object_id)
+        return None
+
+    values = build(obj)
+    values['config'] = get_search_config(values['language'])
+
+    with transaction.atomic():
+        document, _ = SearchDocument.objects.update_or_create(
+            object_type=object_type, object_id=object_id, defaults=values
+        )
+        if use_postgres_search():
+            SearchDocument.objects.filter(pk=document.pk).update(search_vector=vector_expression())
+        else:
+            document.terms.all().delete()
+            SearchTerm.objects.bulk_create(build_terms(document))
+
+    return document
+
+
+def remove_object(object_type, object_id):
+    SearchDocument.objects.filter(object_type=object_type, object_id=object_id).delete()
+
+
+def sync_course_documents(course):
+    """
+    Copy the visibility and language of a course to the documents of its
+    lessons, steps and materials without rebuilding them one by one.
+    """
+    documents = SearchDocument.objects.filter(course_id=course.id)
+    documents.update(is_public=course.is_published)
+
+    # Lessons and steps follow the course language, materials have their own
+    config = get_search_config(course.language)
+    updates = {'language': course.language, 'config': config}
+    if use_postgres_search():
+        updates['search_vector'] = vector_expression(config)
+    documents.filter(
+        object_type__in=[SearchDocument.LESSON, SearchDocument.STEP]
+    ).exclude(language=course.language).update(**updates)
+
+
+def rebuild_index(object_types=None, batch_size=500):
+    """Rebuild the search documents of every object, returns the number indexed"""
+    indexed = 0
+    for object_type in object_types or DOCUMENT_SOURCES:
+        queryset = DOCUMENT_SOURCES[object_type][0]
+        SearchDocument.objects.filter(object_type=object_type).exclude(
+            object_id__in=queryset.values('pk')
+        ).delete()
+        for object_id in queryset.values_list('pk', flat=True).order_by('pk').iterator(chunk_size=batch_size):
+            index_object(object_type, object_id)
+            indexed += 1
+    return indexed
+
+
+# Searching
+
+def match_documents(query, object_types=None, language=None, include_private=False):
+    """
+    Return the documents matching a query, annotated with rank and ordered
+    best first, or None if the query has nothing to search for.
+    """
+    documents = SearchDocument.objects.all()
+    if object_types:
+        documents = documents.filter(object_type__in=object_types)
+    if language:
+        documents = documents.filter(language=language)
+    if not include_private:
+        documents = documents.filter(is_public=True)
+
+    if use_postgres_search():
+        query = (query or '').strip()
+        if not query:
+            return None
+        # One constant query per configuration so each can use the GIN index
+        configs = [get_search_config(language)] if language else sorted(set(SEARCH_CONFIGS.values()))
+        matches = Q()
+        for config in configs:
+            matches |= Q(config=config, search_vector=SearchQuery(query, config=config, search_type='websearch'))
+        return documents.filter(matches).annotate(
+            rank=SearchRank(F('search_vector'), SearchQuery(query, config=F('config'), search_type='websearch'))
+        ).order_by('-rank', 'id')
+
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    # Every term must match, the rank is the summed weight of the matches
+    return documents.filter(terms__term__in=terms).annotate(
+        matched=Count('terms', distinct=True), rank=Sum('terms__weight')
+    ).filter(matched=len(terms)).order_by('-rank', 'id')
+
+
+def search_object_ids(query, object_type, include_private=True):
+    """
+    IDs of the objects of one type matching a query, for filtering an
+    existing queryset with id__in. Visibility is left to that queryset.
+    """
+    documents = match_documents(query, [object_type], include_private=include_private)
+    if documents is None:
+        return []
+    return documents.values('object_id')
+
+
+def get_document_url(document):
+    if document.object_type == SearchDocument.COURSE:
+        return reverse('course-detail', kwargs={'pk': document.object_id})
+    if document.object_type == SearchDocument.MATERIAL:
+        return reverse('material-detail', kwargs={'pk': document.object_id})
+    if document.object_type == SearchDocument.LESSON:
+        return reverse('lesson-detail', kwargs={'lesson_id': document.object_id})
+    return None
+
+
+def search(query, object_types=None, language=None, include_private=False, limit=20):
+    """Return ranked search results as dictionaries ready for the API"""
+    documents = match_documents(query, object_types, language, include_private)
+    if documents is None:
+        return []
+
+    documents = list(documents.only(
+        'id', 'object_type', 'object_id', 'course_id', 'language', 'title'
+    )[:limit])
+
+    # Steps link to their position inside the lesson
+    step_ids = [document.object_id for document in documents if document.object_type == SearchDocument.STEP]
+    steps = {
+        step['id']: step
+        for step in LessonContent.objects.filter(id__in=step_ids).values('id', 'lesson_id', 'order')
+    }
+
+    results = []
+    for document in documents:
+        url = get_document_url(document)
+        if document.object_type == SearchDocument.STEP:
+            step = steps.get(document.object_id)
+            if step is None:
+                continue
+            url = f"{reverse('lesson-detail', kwargs={'lesson_id': step['lesson_id']})}?step={step['order']}"
+        results.append({
+            'type': document.object_type,
+            'id': document.object_id,
+            'course_id': document.course_id,
+            'title': document.title,
+            'language': document.language,
+            'rank': round(float(document.rank), 4),
+            'url': url,
+        })
+    return results
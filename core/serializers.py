@@ -5,6 +5,53 @@ from .models import (
     CustomUser, Course, Material, Comment, Test, Question, Answer,
     Certificate, UserProgress
 )
+from .comments import attach_subtree
+from .images import get_image_variant_urls
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Read-only URLs of the resized variants of an image field:
+    {"original": ..., "thumb": ..., "small": ...}, or null without an image.
+    """
+    
+    def __init__(self, variants=None, **kwargs):
+        self.variants = variants
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        urls = get_image_variant_urls(value, self.variants)
+        if urls is None:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+        return urls
+
+class SparseFieldsetMixin:
+    """
+    Lets API clients pick the fields they need with ?fields=id,title,...
+    Unknown field names are ignored, an empty selection keeps every field.
+    """
+    
+    @classmethod
+    def get_requested_fields(cls, request):
+        """Return the set of known field names asked for in the request, or None for all of them"""
+        # Writes always need the full set of fields
+        if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        fields = request.query_params.get('fields')
+        if not fields:
+            return None
+        requested = {name.strip() for name in fields.split(',')} & set(cls.Meta.fields)
+        return requested or None
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        requested = self.get_requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, style={'input_type': 'password'})
@@ -53,9 +100,12 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError(_("Must include 'username' and 'password'."))
 
 class CustomUserSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField(source='profile_picture', variants=('thumb', 'small'))
+    
     class Meta:
         model = CustomUser
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'profile_picture', 'bio')
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'profile_picture',
+                  'profile_picture_variants', 'bio')
         read_only_fields = ('username', 'email')
 
 class AnswerSerializer(serializers.ModelSerializer):
@@ -87,10 +137,16 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'content', 'created_at', 'updated_at', 'author', 'author_name', 'material', 'parent', 'replies')
         extra_kwargs = {'author': {'read_only': True}}
     
+    def validate_parent(self, parent):
+        if parent is not None and not parent.accepts_replies:
+            raise serializers.ValidationError(_("Replies can't be nested this deep, reply to an earlier comment."))
+        return parent
+    
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
-        return []
+        # Threads are loaded in one query by core.comments, replies are never fetched per comment
+        if not hasattr(obj, 'thread_replies'):
+            attach_subtree(obj)
+        return CommentSerializer(obj.thread_replies, many=True, context=self.context).data
 
 class MaterialSerializer(serializers.ModelSerializer):
     author_name = serializers.ReadOnlyField(source='author.get_full_name')
@@ -101,13 +157,17 @@ class MaterialSerializer(serializers.ModelSerializer):
         model = Material
         fields = ('id', 'name', 'description', 'file', 'created_at', 'updated_at', 'author', 
                  'author_name', 'course', 'material_type', 'material_type_display', 
-                 'language', 'comments_count')
+                 'language', 'comments_count', 'extraction_status')
+        read_only_fields = ('extraction_status',)
         extra_kwargs = {'file': {'required': True}}
     
+    # The count comes annotated from MaterialViewSet, count directly otherwise
     def get_comments_count(self, obj):
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
         return obj.comments.count()
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author_name = serializers.ReadOnlyField(source='author.get_full_name')
     materials_count = serializers.SerializerMethodField()
     tests_count = serializers.SerializerMethodField()
@@ -119,10 +179,15 @@ class CourseSerializer(serializers.ModelSerializer):
                  'author_name', 'is_published', 'language', 'language_display',
                  'materials_count', 'tests_count')
     
+    # The counts come annotated from CourseViewSet, count directly otherwise
     def get_materials_count(self, obj):
+        if hasattr(obj, 'materials_total'):
+            return obj.materials_total
         return obj.materials.count()
     
     def get_tests_count(self, obj):
+        if hasattr(obj, 'tests_total'):
+            return obj.tests_total
         return obj.tests.count()
 
 class CertificateSerializer(serializers.ModelSerializer):
@@ -142,7 +207,11 @@ class UserProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProgress
         fields = ('id', 'user', 'user_name', 'course', 'course_title', 'last_access',
-                 'materials_completed', 'tests_completed', 'materials_completed_count', 'tests_completed_count')
+                 'materials_completed', 'tests_completed', 'materials_completed_count', 'tests_completed_count',
+                 'lessons_completed_count', 'total_lessons', 'steps_completed_count', 'total_steps',
+                 'quizzes_completed_count', 'total_quizzes', 'completion_percentage')
+        read_only_fields = ('lessons_completed_count', 'total_lessons', 'steps_completed_count', 'total_steps',
+                           'quizzes_completed_count', 'total_quizzes', 'completion_percentage')
     
     def get_materials_completed_count(self, obj):
         return obj.materials_completed.count()
@@ -0,0 +1,289 @@
+from django.db import models, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Course, Module, Lesson, LessonContent, LearningOutcome, Material, SearchDocument, UserProgress
+from .outline import invalidate_course_outline
+from .extraction import schedule_material_extraction
+from .images import schedule_image_variants
+from .storage import CONTENT_ADDRESSED_FIELDS, add_blob_reference, release_blob_reference
+from .search import index_object, remove_object, sync_course_documents
+
+
+class CourseChanges:
+    """
+    Courses changed in the current transaction whose outlines are invalidated
+    and enrollment counters re-synced once it commits. One instance is
+    registered per transaction, so a cascade deleting hundreds of lessons and
+    steps bumps the outline version and refreshes the counters of each course
+    once, and looks up the course of each module and lesson once.
+    """
+    
+    def __init__(self):
+        self.outline_course_ids = set()
+        self.counter_course_ids = set()
+        self.module_courses = {}
+        self.lesson_courses = {}
+        self.done = False
+    
+    def __call__(self):
+        self.done = True
+        for course_id in self.outline_course_ids:
+            invalidate_course_outline(course_id)
+        for course_id in self.counter_course_ids:
+            UserProgress.refresh_course_counters(course_id)
+
+
+def get_course_changes():
+    """The CourseChanges of the current transaction, or None in autocommit mode"""
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+    # Entries are (savepoint IDs, callback, robust). Reusing only the callback of
+    # the current savepoint keeps changes rolled back with a savepoint together.
+    savepoint_ids = set(connection.savepoint_ids)
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], CourseChanges) and not entry[1].done and entry[0] == savepoint_ids:
+            return entry[1]
+    changes = CourseChanges()
+    transaction.on_commit(changes)
+    return changes
+
+
+def schedule_counters_refresh(*course_ids):
+    """Re-sync enrollment counters of courses once the current transaction commits"""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if not course_ids:
+        return
+    changes = get_course_changes()
+    if changes is None:
+        for course_id in course_ids:
+            UserProgress.refresh_course_counters(course_id)
+    else:
+        changes.counter_course_ids.update(course_ids)
+
+
+def get_module_course_id(module_id):
+    changes = get_course_changes()
+    if changes is not None and module_id in changes.module_courses:
+        return changes.module_courses[module_id]
+    course_id = Module.objects.filter(pk=module_id).values_list('course_id', flat=True).first()
+    if changes is not None:
+        changes.module_courses[module_id] = course_id
+    return course_id
+
+
+def get_lesson_course_id(lesson_id):
+    changes = get_course_changes()
+    if changes is not None and lesson_id in changes.lesson_courses:
+        return changes.lesson_courses[lesson_id]
+    course_id = Lesson.objects.filter(pk=lesson_id).values_list('module__course_id', flat=True).first()
+    if changes is not None:
+        changes.lesson_courses[lesson_id] = course_id
+    return course_id
+
+
+def schedule_outline_invalidation(*course_ids):
+    """Drop the cached outlines of courses once the current transaction commits"""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if not course_ids:
+        return
+    changes = get_course_changes()
+    if changes is None:
+        for course_id in course_ids:
+            invalidate_course_outline(course_id)
+    else:
+        changes.outline_course_ids.update(course_ids)
+
+
+def schedule_search_update(object_type, instance, deleted=False):
+    """Refresh or drop the search document of an object once the current transaction commits"""
+    object_id = instance.pk
+    if deleted:
+        transaction.on_commit(lambda: remove_object(object_type, object_id))
+    else:
+        transaction.on_commit(lambda: index_object(object_type, object_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    schedule_outline_invalidation(instance.pk)
+
+
+# Learning outcomes are part of the cached course page
+@receiver(post_save, sender=LearningOutcome)
+@receiver(post_delete, sender=LearningOutcome)
+def learning_outcome_changed(sender, instance, **kwargs):
+    schedule_outline_invalidation(instance.course_id)
+
+
+# Moving a module, lesson, step or quiz to another course changes the size of both courses,
+# {model label: (parent field, lookup of the course)}
+COURSE_FIELDS = {
+    'core.Module': ('course', 'course_id'),
+    'core.Lesson': ('module', 'module__course_id'),
+    'core.LessonContent': ('lesson', 'lesson__module__course_id'),
+    'quiz.Quiz': ('course', 'course_id'),
+}
+
+
+def remember_course(sender, instance, update_fields=None, **kwargs):
+    field_name, course_lookup = COURSE_FIELDS[sender._meta.label]
+    instance._stored_course_id = None
+    if instance._state.adding or (update_fields is not None and field_name not in update_fields):
+        return
+    instance._stored_course_id = sender._base_manager.filter(pk=instance.pk).values_list(
+        course_lookup, flat=True
+    ).first()
+
+
+def get_moved_from(instance, course_id, signal_kwargs):
+    """The course an edited row was moved away from, if any"""
+    if signal_kwargs.get('created', True):
+        return None
+    stored_course_id = getattr(instance, '_stored_course_id', None)
+    return stored_course_id if stored_course_id != course_id else None
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, **kwargs):
+    moved_from = get_moved_from(instance, instance.course_id, kwargs)
+    changes = get_course_changes()
+    if changes is not None:
+        changes.module_courses[instance.pk] = instance.course_id
+        if moved_from:
+            changes.lesson_courses.clear()
+    schedule_outline_invalidation(instance.course_id, moved_from)
+    # Modules add nothing to count, but move their lessons and steps along
+    if moved_from:
+        schedule_counters_refresh(instance.course_id, moved_from)
+
+
+# Edits don't change the size of a course, only additions, removals and moves do
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    course_id = get_module_course_id(instance.module_id)
+    moved_from = get_moved_from(instance, course_id, kwargs)
+    changes = get_course_changes()
+    if changes is not None:
+        changes.lesson_courses[instance.pk] = course_id
+    schedule_outline_invalidation(course_id, moved_from)
+    if kwargs.get('created', True) or moved_from:
+        schedule_counters_refresh(course_id, moved_from)
+
+
+@receiver(post_save, sender=LessonContent)
+@receiver(post_delete, sender=LessonContent)
+def lesson_content_changed(sender, instance, **kwargs):
+    course_id = get_lesson_course_id(instance.lesson_id)
+    moved_from = get_moved_from(instance, course_id, kwargs)
+    schedule_outline_invalidation(course_id, moved_from)
+    if kwargs.get('created', True) or moved_from:
+        schedule_counters_refresh(course_id, moved_from)
+
+
+@receiver(post_save, sender='quiz.Quiz')
+@receiver(post_delete, sender='quiz.Quiz')
+def quiz_changed(sender, instance, **kwargs):
+    moved_from = get_moved_from(instance, instance.course_id, kwargs)
+    schedule_outline_invalidation(instance.course_id, moved_from)
+    if kwargs.get('created', True) or moved_from:
+        schedule_counters_refresh(instance.course_id, moved_from)
+
+
+for model_label in COURSE_FIELDS:
+    pre_save.connect(remember_course, sender=model_label, dispatch_uid=f'course_{model_label}')
+
+
+# Search index
+@receiver(post_save, sender=Course)
+def course_search_update(sender, instance, created, **kwargs):
+    schedule_search_update(SearchDocument.COURSE, instance)
+    if not created:
+        # Publishing or translating a course changes its lessons, steps and materials too
+        transaction.on_commit(lambda: sync_course_documents(instance))
+
+
+@receiver(post_delete, sender=Course)
+def course_search_delete(sender, instance, **kwargs):
+    schedule_search_update(SearchDocument.COURSE, instance, deleted=True)
+
+
+# Learning outcomes are indexed with their course
+@receiver(post_save, sender=LearningOutcome)
+@receiver(post_delete, sender=LearningOutcome)
+def learning_outcome_search_update(sender, instance, **kwargs):
+    course_id = instance.course_id
+    transaction.on_commit(lambda: index_object(SearchDocument.COURSE, course_id))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_search_update(sender, instance, **kwargs):
+    schedule_search_update(SearchDocument.LESSON, instance, deleted='created' not in kwargs)
+
+
+@receiver(post_save, sender=LessonContent)
+@receiver(post_delete, sender=LessonContent)
+def lesson_content_search_update(sender, instance, **kwargs):
+    schedule_search_update(SearchDocument.STEP, instance, deleted='created' not in kwargs)
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def material_search_update(sender, instance, **kwargs):
+    schedule_search_update(SearchDocument.MATERIAL, instance, deleted='created' not in kwargs)
+
+
+# Uploaded files are hashed and their text extracted in the background
+@receiver(post_save, sender=Material)
+def material_file_changed(sender, instance, created, **kwargs):
+    if created or instance.file_changed:
+        schedule_material_extraction(instance.pk)
+        instance._loaded_file_name = instance.file.name
+
+
+# Reference counts of content-addressed files
+BLOB_FIELD_NAMES = dict(CONTENT_ADDRESSED_FIELDS)
+
+
+def remember_blob_name(sender, instance, update_fields=None, **kwargs):
+    field_name = BLOB_FIELD_NAMES[sender._meta.label]
+    instance._stored_blob_name = None
+    if instance._state.adding or (update_fields is not None and field_name not in update_fields):
+        return
+    instance._stored_blob_name = sender._base_manager.filter(pk=instance.pk).values_list(
+        field_name, flat=True
+    ).first()
+
+
+def update_blob_references(sender, instance, update_fields=None, **kwargs):
+    field_name = BLOB_FIELD_NAMES[sender._meta.label]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    old_name = getattr(instance, '_stored_blob_name', None) or ''
+    new_name = getattr(instance, field_name).name or ''
+    if new_name != old_name:
+        if new_name:
+            add_blob_reference(new_name)
+            # Uploaded images get their resized variants right away
+            if isinstance(sender._meta.get_field(field_name), models.ImageField):
+                schedule_image_variants(getattr(instance, field_name))
+        if old_name:
+            release_blob_reference(old_name)
+    instance._stored_blob_name = new_name
+
+
+def release_blob_references(sender, instance, **kwargs):
+    name = getattr(instance, BLOB_FIELD_NAMES[sender._meta.label]).name
+    if name:
+        release_blob_reference(name)
+
+
+for model_label, field_name in CONTENT_ADDRESSED_FIELDS:
+    pre_save.connect(remember_blob_name, sender=model_label, dispatch_uid=f'blob_name_{model_label}')
+    post_save.connect(update_blob_references, sender=model_label, dispatch_uid=f'blob_save_{model_label}')
+    post_delete.connect(release_blob_references, sender=model_label, dispatch_uid=f'blob_delete_{model_label}')
@@ -0,0 +1,178 @@
+"""
+Write-coalescing tracker of completed lesson steps.
+
+Viewing a lesson step or marking it completed used to insert a
+StepCompletion and update the enrollment row on every click. Steps are
+now buffered in the process and written every
+STEP_PROGRESS_FLUSH_INTERVAL seconds, all buffered steps with one insert
+and one update of the counters and last access of their enrollments.
+Completing a lesson flushes the enrollment at once, so lesson and course
+completion are stored right away.
+
+Buffered steps are also kept in the cache per enrollment, so reads in any
+process merge them with the stored ones. That needs a cache shared by the
+processes, buffering is off (an interval of 0 writes every step at once)
+with the local-memory cache. A step buffered by a process that dies
+before its flush is lost and shows as not completed again.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .background import run_task
+from .models import StepCompletion, UserProgress
+
+logger = logging.getLogger(__name__)
+
+# Cached steps only have to outlive the flush of the process that buffered them
+CACHE_TIMEOUT_FLUSH_INTERVALS = 10
+
+_lock = threading.Lock()
+# Steps waiting for the next flush, {progress_id: {lesson_id: {step, ...}}}
+_pending = {}
+_timer = None
+
+
+def is_buffering():
+    return settings.STEP_PROGRESS_FLUSH_INTERVAL > 0
+
+
+def _buffer_key(progress_id):
+    return f'step_progress_buffer_{progress_id}'
+
+
+def record_step(user_progress, lesson, step):
+    """Record a completed step, buffered or written at once when buffering is off"""
+    if not is_buffering():
+        user_progress.mark_step_completed(lesson, step)
+        return
+
+    with _lock:
+        _pending.setdefault(user_progress.pk, {}).setdefault(lesson.pk, set()).add(step)
+        _schedule_flush()
+
+    # Concurrent requests of one student in other processes may overwrite this,
+    # those steps are still flushed by their process, only shown a bit later
+    key = _buffer_key(user_progress.pk)
+    buffered = cache.get(key) or {}
+    buffered[lesson.pk] = sorted(set(buffered.get(lesson.pk, ())) | {step})
+    cache.set(key, buffered, settings.STEP_PROGRESS_FLUSH_INTERVAL * CACHE_TIMEOUT_FLUSH_INTERVALS)
+
+
+def get_buffered_steps(progress_id):
+    """Steps of an enrollment that may not be stored yet, {lesson_id: {step, ...}}"""
+    if not is_buffering():
+        return {}
+
+    buffered = {lesson_id: set(steps) for lesson_id, steps in (cache.get(_buffer_key(progress_id)) or {}).items()}
+    with _lock:
+        for lesson_id, steps in _pending.get(progress_id, {}).items():
+            buffered.setdefault(lesson_id, set()).update(steps)
+    return buffered
+
+
+def get_completed_steps(user_progress, lesson):
+    """Step numbers completed in a lesson, stored or buffered"""
+    steps = user_progress.get_completed_steps(lesson)
+    steps.update(get_buffered_steps(user_progress.pk).get(lesson.pk, ()))
+    return steps
+
+
+def merge_completed_step_counts(user_progress, completed_steps):
+    """Add the buffered steps to stored step counts by lesson ID"""
+    buffered = get_buffered_steps(user_progress.pk)
+    if not buffered:
+        return completed_steps
+
+    stored = {}
+    for lesson_id, step in StepCompletion.objects.filter(
+        progress=user_progress, lesson_id__in=buffered
+    ).values_list('lesson_id', 'step'):
+        stored.setdefault(lesson_id, set()).add(step)
+
+    merged = dict(completed_steps)
+    for lesson_id, steps in buffered.items():
+        merged[lesson_id] = len(stored.get(lesson_id, set()) | steps)
+    return merged
+
+
+def flush(progress_ids=None):
+    """
+    Write the steps buffered in this process, of every enrollment or only
+    of progress_ids. Returns the number of steps written.
+    """
+    with _lock:
+        if progress_ids is None:
+            taken = dict(_pending)
+            _pending.clear()
+        else:
+            taken = {progress_id: _pending.pop(progress_id) for progress_id in progress_ids if progress_id in _pending}
+    return _write(taken)
+
+
+def flush_enrollment(user_progress):
+    """
+    Store every buffered step of an enrollment now, also the ones buffered
+    by other processes, so a completed lesson is counted at once.
+    """
+    if not is_buffering():
+        return 0
+
+    # The cached steps include this process's, and steps already stored, which are skipped
+    with _lock:
+        lessons = _pending.pop(user_progress.pk, {})
+    for lesson_id, steps in (cache.get(_buffer_key(user_progress.pk)) or {}).items():
+        lessons.setdefault(lesson_id, set()).update(steps)
+    return _write({user_progress.pk: lessons})
+
+
+def _write(buffered):
+    completions = [
+        (progress_id, lesson_id, step)
+        for progress_id, lessons in buffered.items()
+        for lesson_id, steps in lessons.items()
+        for step in steps
+    ]
+    if not completions:
+        return 0
+
+    try:
+        UserProgress.record_step_completions(completions)
+    except Exception:
+        # Keep the steps for the next flush
+        with _lock:
+            for progress_id, lesson_id, step in completions:
+                _pending.setdefault(progress_id, {}).setdefault(lesson_id, set()).add(step)
+            _schedule_flush()
+        raise
+    return len(completions)
+
+
+def _schedule_flush():
+    # Called with the lock held
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(settings.STEP_PROGRESS_FLUSH_INTERVAL, _flush_in_background)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_in_background():
+    global _timer
+    run_task(flush)
+    with _lock:
+        _timer = None
+        # Steps buffered while flushing, or kept after a failed flush
+        if _pending:
+            _schedule_flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not store buffered lesson steps')
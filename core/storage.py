@@ -0,0 +1,183 @@
+"""
+Content-addressed storage for uploaded files.
+
+Uploads are hashed while they are copied to a temporary file and then
+stored once under their SHA-256 digest (blobs/ab/cd/<digest><ext>), so
+identical uploads share one file and a repeated upload only costs the
+hashing. StoredBlob rows count how many file fields point at a blob; the
+signals in core/signals.py keep the counts up to date and a blob is
+deleted once nothing has referenced or re-uploaded it for a few minutes.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import LazyObject
+
+BLOB_PREFIX = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+# A blob that was just uploaded again may be about to get a new reference
+BLOB_DELETE_GRACE = timedelta(minutes=10)
+
+BLOB_NAME_RE = re.compile(r'^blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[\w.]+)?$')
+
+# File fields stored by digest, as (app_label.Model, field name)
+CONTENT_ADDRESSED_FIELDS = (
+    ('core.CustomUser', 'profile_picture'),
+    ('core.LessonContent', 'image'),
+    ('core.Material', 'file'),
+    ('quiz.Question', 'image'),
+)
+
+
+def get_blob_name(digest, original_name):
+    ext = os.path.splitext(original_name)[1].lower()
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def get_digest_from_name(name):
+    """Return the SHA-256 digest a blob name was built from, or None for other files"""
+    match = BLOB_NAME_RE.match(name or '')
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage keeping each distinct file content once"""
+
+    def _save(self, name, content):
+        blob_dir = self.path(BLOB_PREFIX)
+        os.makedirs(blob_dir, exist_ok=True)
+
+        # Hash while streaming to a temporary file next to the blobs, so the
+        # final move is a rename on the same file system
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=blob_dir, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+
+            blob_name = get_blob_name(digest.hexdigest(), name)
+            blob_path = self.path(blob_name)
+            # Registered before the file is reused, so a pending deletion of the blob skips it
+            register_blob(blob_name, digest.hexdigest(), size)
+            if os.path.exists(blob_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(temp_path, blob_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(blob_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return blob_name
+
+    def get_available_name(self, name, max_length=None):
+        # Names come from the content, an existing blob is simply reused
+        return name
+
+    def save_derivative(self, name, content):
+        """Store a file derived from a blob (like a resized image) under the given name"""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    temp_file.write(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+class DefaultContentAddressedStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = ContentAddressedStorage()
+
+
+content_addressed_storage = DefaultContentAddressedStorage()
+
+
+def get_content_addressed_storage():
+    return content_addressed_storage
+
+
+# Reference counting
+
+def register_blob(name, digest, size):
+    from .models import StoredBlob
+
+    blob, created = StoredBlob.objects.get_or_create(name=name, defaults={'digest': digest, 'size': size})
+    if not created:
+        StoredBlob.objects.filter(pk=blob.pk).update(last_used_at=timezone.now())
+
+
+def add_blob_reference(name):
+    from .models import StoredBlob
+
+    digest = get_digest_from_name(name)
+    if not digest:
+        return
+    updated = StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, last_used_at=timezone.now())
+    if not updated and content_addressed_storage.exists(name):
+        # The row was just garbage collected, recreating it keeps the file from being deleted
+        blob, created = StoredBlob.objects.get_or_create(
+            name=name, defaults={'digest': digest, 'size': content_addressed_storage.size(name), 'ref_count': 1}
+        )
+        if not created:
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+
+def release_blob_reference(name):
+    """Drop one reference to a blob and delete it once the last one is gone"""
+    from .models import StoredBlob
+
+    if not get_digest_from_name(name):
+        return
+    StoredBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: delete_unreferenced_blob(name))
+
+
+def delete_unreferenced_blob(name):
+    """
+    Delete a blob nothing has referenced or re-uploaded during the grace period.
+    The row is removed with a conditional DELETE, so a reference added meanwhile
+    keeps the blob, and the file only once that deletion has committed.
+    """
+    from .models import StoredBlob
+
+    with transaction.atomic():
+        deleted, _ = StoredBlob.objects.filter(
+            name=name, ref_count=0, last_used_at__lt=timezone.now() - BLOB_DELETE_GRACE
+        ).delete()
+        if deleted:
+            transaction.on_commit(lambda: delete_blob_file(name))
+    return bool(deleted)
+
+
+def delete_blob_file(name):
+    from .images import delete_image_variants
+    from .models import StoredBlob
+
+    # The same content may have been uploaded again since the row was deleted
+    if StoredBlob.objects.filter(name=name).exists():
+        return
+    content_addressed_storage.delete(name)
+    delete_image_variants(content_addressed_storage, name)
@@ -0,0 +1,13 @@
+from django import template
+
+from core.images import get_image_variant_url
+
+register = template.Library()
+
+@register.simple_tag
+def image_variant(image, variant='medium'):
+    """
+    URL of a resized variant of an uploaded image.
+    Usage: <img src="{% image_variant lesson_step.image 'medium' %}">
+    """
+    return get_image_variant_url(image, variant)
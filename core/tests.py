@@ -1,3 +1,662 @@
-from django.test import TestCase
+import importlib
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import Http404
+from django.utils import timezone
+from PIL import Image
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from core import query_budgets, step_progress
+from core.comments import attach_replies, attach_subtree
+from core.downloads import RangeNotSatisfiable, parse_range, serve_material_file
+from core.images import get_image_variant_url, get_variant_name
+from core.models import (
+    Comment, Course, CustomUser, Lesson, LessonContent, Material, Module, StepCompletion, StoredBlob, UserProgress
+)
+from core.outline import get_course_outline, get_outline_version
+from core.query_budgets import JSON, Budget
+from core.search import search
+from core.serializers import CommentSerializer
+from core.storage import BLOB_DELETE_GRACE, add_blob_reference, delete_unreferenced_blob
+from quiz.models import Quiz, QuizAttempt
+
+
+class CoreQueryBudgetTests(query_budgets.QueryBudgetTestCase):
+    urlconf = 'core.urls'
+    url_prefix = '/'
+    budgets = {
+        'api/^courses/$': 4,
+        'api/^courses/(?P<pk>[^/.]+)/$': Budget(3, pk='course'),
+        'api/^courses/(?P<pk>[^/.]+)/enroll/$': Budget(8, method='post', pk='open_course'),
+        'api/^materials/$': 5,
+        'api/^materials/(?P<pk>[^/.]+)/$': Budget(4, pk='material'),
+        'api/^materials/(?P<pk>[^/.]+)/mark_completed/$': Budget({'student': 7, 'default': 13}, method='post', pk='material'),
+        'api/^tests/$': 6,
+        'api/^tests/(?P<pk>[^/.]+)/$': Budget(5, pk='test'),
+        'api/^tests/(?P<pk>[^/.]+)/submit/$': Budget({'student': 8, 'default': 14}, method='post', content_type=JSON, data=lambda test: {
+            'answers': [
+                {'question_id': question.pk, 'answer_id': question.answers.first().pk}
+                for question in test.test.questions.all()
+            ]
+        }, pk='test'),
+        'api/^certificates/$': 4,
+        'api/^certificates/(?P<pk>[^/.]+)/$': Budget(3, pk='core_certificate'),
+        'api/^users/$': 4,
+        'api/^users/(?P<pk>[^/.]+)/$': Budget(3, pk='student'),
+        'api/': 2,
+        'api/auth/login/': 0,
+        'api/auth/logout/': 4,
+        'api/register/': 2,
+        'api/login/': 2,
+        'api/logout/': 2,
+        'api/profile/': 2,
+        'api/comments/': [
+            4,
+            Budget(7, method='post', content_type=JSON, data=lambda test: {
+                'content': 'Ответ', 'material': test.material.pk, 'parent': test.comment.pk
+            }),
+        ],
+        'api/comments/<int:pk>/': Budget(5, pk='comment'),
+        'api/courses/<int:course_id>/progress/': Budget(20, course_id='course'),
+        'api/search/': 2,
+        'api/query-stats/': 2,
+        'comments/create/': Budget(6, method='post', data=lambda test: {
+            'content': 'Ответ', 'material_id': test.material.pk, 'parent_id': test.comment.pk
+        }),
+        'comments/<int:pk>/delete/': Budget(7, pk='reply'),
+        '': 3,
+        'login/': 2,
+        'register/': 2,
+        'logout/': 4,
+        'dashboard/': {'student': 8, 'default': 2},
+        'profile/': 2,
+        'courses/': 4,
+        'courses/<int:pk>/': Budget({'student': 15, 'default': 12}, pk='course'),
+        'courses/create/': Budget(2, known_failure='crispy_forms is not installed'),
+        'courses/<int:pk>/update/': Budget(5, known_failure='crispy_forms is not installed', pk='course'),
+        'courses/<int:pk>/delete/': Budget(5, known_failure='core/course_confirm_delete.html is missing', pk='course'),
+        'courses/<int:pk>/enroll/': Budget(8, method='post', pk='open_course'),
+        'courses/<int:course_id>/certificate/': Budget(4, course_id='course'),
+        'materials/': 4,
+        'materials/<int:pk>/': Budget(6, pk='material'),
+        'materials/<int:pk>/download/': Budget(4, pk='material'),
+        'materials/create/': 3,
+        'materials/<int:pk>/update/': Budget(6, pk='material'),
+        'materials/<int:pk>/delete/': Budget(5, known_failure='core/material_confirm_delete.html is missing', pk='material'),
+        'tests/<int:pk>/': Budget(7, pk='test'),
+        'certificates/': 4,
+        'certificates/<str:certificate_id>/': Budget(5, certificate_id='core_certificate.certificate_id'),
+        'lessons/<int:lesson_id>/': Budget({'student': 11, 'default': 17}, lesson_id='lesson'),
+        'lessons/create/': 7,
+        'mark-step-completed/': Budget(
+            {'student': 16, 'default': 15}, method='post', content_type=JSON, headers={'X-Requested-With': 'XMLHttpRequest'},
+            data=lambda test: {'lesson_id': test.open_lesson.pk, 'step': 5}
+        ),
+        'modules/create/': 3,
+        'materials/<int:material_id>/comment/': Budget(5, method='post', data={'text': 'Вопрос'}, material_id='material'),
+        'comments/<int:comment_id>/reply/': Budget(6, method='post', data={'text': 'Ответ'}, comment_id='comment'),
+        'comments/<int:comment_id>/delete/': Budget(7, comment_id='reply'),
+        'api/course-progress/<int:course_id>/': Budget(2, course_id='course'),
+    }
+
+
+class ProgressCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        cls.student = CustomUser.objects.create_user('student', password='password')
+        cls.other_student = CustomUser.objects.create_user('other', password='password')
+        cls.course = Course.objects.create(title='Course', description='', author=author)
+        cls.module = Module.objects.create(course=cls.course, title='Module')
+        cls.lessons = [Lesson.objects.create(module=cls.module, title=f'Lesson {order}', order=order) for order in (1, 2)]
+        for lesson in cls.lessons:
+            for order in (1, 2, 3):
+                LessonContent.objects.create(lesson=lesson, title=f'Step {order}', content='', order=order)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='', module=cls.module, course=cls.course)
+
+    def setUp(self):
+        self.progress = UserProgress.objects.create(user=self.student, course=self.course)
+
+    def test_enrollment_starts_with_course_totals(self):
+        self.assertEqual(
+            (self.progress.total_lessons, self.progress.total_steps, self.progress.total_quizzes), (2, 6, 1)
+        )
+        self.assertEqual(self.progress.completion_percentage, 0)
+        self.assertFalse(self.progress.is_completed)
+
+    def test_marking_a_step_twice_stores_it_once(self):
+        self.progress.mark_step_completed(self.lessons[0], 1)
+        self.progress.mark_step_completed(self.lessons[0], 1)
+        self.progress.mark_step_completed(self.lessons[0], 2)
+
+        self.assertEqual(self.progress.get_completed_steps(self.lessons[0]), {1, 2})
+        self.assertEqual(StepCompletion.objects.filter(progress=self.progress).count(), 2)
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.steps_completed_count, 2)
+
+    def test_steps_of_several_enrollments_are_recorded_together(self):
+        other = UserProgress.objects.create(user=self.other_student, course=self.course)
+
+        with self.assertNumQueries(2):
+            UserProgress.record_step_completions([
+                (self.progress.pk, self.lessons[0].pk, 1),
+                (self.progress.pk, self.lessons[1].pk, 1),
+                (other.pk, self.lessons[0].pk, 3),
+            ])
+
+        counts = dict(UserProgress.objects.values_list('pk', 'steps_completed_count'))
+        self.assertEqual(counts, {self.progress.pk: 2, other.pk: 1})
+
+    def test_lesson_and_quiz_completion_update_counters(self):
+        self.progress.mark_lesson_completed(self.lessons[0])
+        self.assertEqual(self.progress.completion_percentage, 50)
+
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.student, is_completed=True)
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.student, is_completed=True)
+        self.progress.mark_lesson_completed(self.lessons[1])
+
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.lessons_completed_count, 2)
+        self.assertEqual(self.progress.quizzes_completed_count, 1)
+        self.assertEqual(self.progress.completion_percentage, 100)
+        self.assertTrue(self.progress.is_completed)
+
+    def test_course_changes_refresh_enrollment_counters(self):
+        self.progress.mark_lesson_completed(self.lessons[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(module=self.module, title='Lesson 3', order=3)
+            LessonContent.objects.create(lesson=lesson, title='Step', content='')
+
+        self.progress.refresh_from_db()
+        self.assertEqual((self.progress.total_lessons, self.progress.total_steps), (3, 7))
+        self.assertEqual(self.progress.lessons_completed_count, 1)
+        self.assertEqual(self.progress.completion_percentage, 33)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.delete()
+
+        self.progress.refresh_from_db()
+        self.assertEqual((self.progress.total_lessons, self.progress.total_steps), (2, 6))
+        self.assertEqual(self.progress.completion_percentage, 50)
+
+    def test_moving_a_lesson_refreshes_both_courses(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other_course = Course.objects.create(title='Other', description='', author=self.course.author)
+            other_module = Module.objects.create(course=other_course, title='Module')
+        other_progress = UserProgress.objects.create(user=self.student, course=other_course)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.get(pk=self.lessons[1].pk)
+            lesson.module = other_module
+            lesson.save()
+
+        self.progress.refresh_from_db()
+        other_progress.refresh_from_db()
+        self.assertEqual((self.progress.total_lessons, self.progress.total_steps), (1, 3))
+        self.assertEqual((other_progress.total_lessons, other_progress.total_steps), (1, 3))
+
+    def test_cascade_delete_refreshes_each_course_once(self):
+        with mock.patch.object(UserProgress, 'refresh_course_counters') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.module.delete()
+
+        refresh.assert_called_once_with(self.course.pk)
+
+
+class OutlineVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        cls.course = Course.objects.create(title='Course', description='', author=author)
+        cls.module = Module.objects.create(course=cls.course, title='Module')
+
+    def test_structure_change_bumps_version_in_database(self):
+        version = get_outline_version(self.course.pk)
+        self.assertEqual(get_course_outline(self.course.pk).lesson_count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(module=self.module, title='Lesson')
+
+        self.assertGreater(get_outline_version(self.course.pk), version)
+        self.assertEqual(get_course_outline(self.course.pk).lesson_count, 1)
+
+    def test_stale_instance_does_not_write_older_version(self):
+        course = Course.objects.get(pk=self.course.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(module=self.module, title='Lesson')
+        version = get_outline_version(self.course.pk)
+
+        course.title = 'Renamed'
+        course.save()
+
+        self.assertGreaterEqual(get_outline_version(self.course.pk), version)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).title, 'Renamed')
+
+    def test_cascade_delete_bumps_version_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for order in (1, 2, 3):
+                lesson = Lesson.objects.create(module=self.module, title='Lesson', order=order)
+                LessonContent.objects.create(lesson=lesson, title='Step', content='')
+        version = get_outline_version(self.course.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.module.delete()
+
+        self.assertEqual(get_outline_version(self.course.pk), version + 1)
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('student', password='password')
+        cls.material = Material.objects.create(name='Material', file='materials/material.txt')
+        cls.other_material = Material.objects.create(name='Other', file='materials/other.txt')
+
+    def comment(self, parent=None, material=None):
+        return Comment.objects.create(
+            content='Comment', author=self.user, material=material or self.material, parent=parent
+        )
+
+    def test_path_follows_parent(self):
+        root = self.comment()
+        reply = self.comment(root)
+        self.assertEqual(root.path, f'{root.pk:010d}/')
+        self.assertEqual(reply.path, f'{root.path}{reply.pk:010d}/')
+        self.assertEqual(reply.depth, 1)
+        self.assertEqual(reply.root_path, root.path)
+
+    def test_too_deep_reply_is_rejected(self):
+        comment = self.comment()
+        while comment.accepts_replies:
+            comment = self.comment(comment)
+
+        with self.assertRaises(ValidationError):
+            self.comment(comment)
+        serializer = CommentSerializer(data={'content': 'Reply', 'material': self.material.pk, 'parent': comment.pk})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('parent', serializer.errors)
+
+    def test_attach_subtree_loads_the_replies_with_one_query(self):
+        root = self.comment()
+        reply = self.comment(root)
+        nested_reply = self.comment(reply)
+        self.comment(self.comment())
+        root = Comment.objects.get(pk=root.pk)
+
+        with self.assertNumQueries(1):
+            attach_subtree(root)
+
+        self.assertEqual([comment.pk for comment in root.thread_replies], [reply.pk])
+        self.assertEqual([comment.pk for comment in root.thread_replies[0].thread_replies], [nested_reply.pk])
+
+    def test_path_backfill_stops_chains_at_the_path_limit(self):
+        migration = importlib.import_module('core.migrations.0009_comment_path')
+        comments = [self.comment()]
+        for _ in range(30):
+            comments.append(self.comment())
+            Comment.objects.filter(pk=comments[-1].pk).update(parent=comments[-2])
+
+        migration.fill_comment_paths(apps, None)
+
+        stored = {comment.pk: comment for comment in Comment.objects.all()}
+        for comment in stored.values():
+            self.assertLessEqual(len(comment.path), 255)
+            if comment.parent_id:
+                self.assertEqual(comment.path, f'{stored[comment.parent_id].path}{comment.pk:010d}/')
+        deepest = stored[comments[-1].pk]
+        self.assertFalse(deepest.accepts_replies)
+        self.assertTrue(stored[deepest.parent_id].accepts_replies)
+
+    def test_attach_replies_loads_only_the_page_threads(self):
+        first, second = self.comment(), self.comment()
+        first_reply = self.comment(first)
+        nested_reply = self.comment(first_reply)
+        second_reply = self.comment(second)
+        # Threads of other pages and other materials
+        self.comment(self.comment(material=self.other_material), material=self.other_material)
+        self.comment(self.comment())
+        page = list(Comment.objects.filter(pk__in=[first.pk, second.pk]).order_by('path'))
+
+        with self.assertNumQueries(1):
+            roots = attach_replies(page)
+
+        self.assertEqual([root.pk for root in roots], [first.pk, second.pk])
+        self.assertEqual([reply.pk for reply in roots[0].thread_replies], [first_reply.pk])
+        self.assertEqual([reply.pk for reply in roots[0].thread_replies[0].thread_replies], [nested_reply.pk])
+        self.assertEqual([reply.pk for reply in roots[1].thread_replies], [second_reply.pk])
+
+
+class SearchFallbackTests(TestCase):
+    """The inverted index used when the database isn't PostgreSQL"""
+
+    def setUp(self):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = Course.objects.create(
+                title='Anemia basics', description='Iron deficiency and blood loss', author=author, is_published=True
+            )
+            self.draft = Course.objects.create(title='Anemia drafts', description='', author=author)
+            module = Module.objects.create(course=self.course, title='Module')
+            self.lesson = Lesson.objects.create(module=module, title='Iron metabolism', description='Anemia')
+            self.step = LessonContent.objects.create(
+                lesson=self.lesson, title='Ferritin', content='<p>Ferritin shows iron stores</p>', order=2
+            )
+
+    def result_ids(self, query, **kwargs):
+        return [(result['type'], result['id']) for result in search(query, **kwargs)]
+
+    def test_every_term_must_match_and_titles_rank_first(self):
+        self.assertEqual(self.result_ids('anemia'), [('course', self.course.pk), ('lesson', self.lesson.pk)])
+        self.assertEqual(self.result_ids('IRON anemia'), [('course', self.course.pk), ('lesson', self.lesson.pk)])
+        self.assertEqual(self.result_ids('anemia ferritin'), [])
+        self.assertEqual(self.result_ids('  '), [])
+
+    def test_private_documents_and_visibility_changes(self):
+        self.assertNotIn(('course', self.draft.pk), self.result_ids('anemia'))
+        self.assertIn(('course', self.draft.pk), self.result_ids('anemia', include_private=True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.is_published = False
+            self.course.save()
+
+        self.assertEqual(self.result_ids('anemia'), [])
+        self.assertEqual(self.result_ids('ferritin'), [])
+
+    def test_step_links_to_its_position_and_disappears_when_deleted(self):
+        [result] = search('ferritin stores')
+        self.assertEqual(result['type'], 'step')
+        self.assertTrue(result['url'].endswith(f'/lessons/{self.lesson.pk}/?step=2'), result['url'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.step.delete()
+
+        self.assertEqual(search('ferritin'), [])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL text search')
+class PostgresSearchTests(TestCase):
+    def test_language_change_rebuilds_lesson_vectors(self):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(
+                title='Hematology', description='', author=author, is_published=True, language='ky'
+            )
+            module = Module.objects.create(course=course, title='Module')
+            lesson = Lesson.objects.create(module=module, title='Bleeding disorders')
+        # Kyrgyz text is only lowercased, so the stem doesn't match yet
+        self.assertEqual(search('bleed', object_types=['lesson'], language='ky'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.language = 'en'
+            course.save()
+
+        results = search('bleed', object_types=['lesson'], language='en')
+        self.assertEqual([result['id'] for result in results], [lesson.pk])
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        # The end is clamped to the file, a suffix longer than the file is the whole file
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_whole_file_for_unsupported_ranges(self):
+        self.assertIsNone(parse_range('bytes=0-1,5-9', 1000))
+        self.assertIsNone(parse_range('bytes=-', 1000))
+        self.assertIsNone(parse_range('items=0-1', 1000))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=1000-', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(header=header), self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1000)
+
+
+class MaterialFileServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MATERIAL_ACCEL_REDIRECT_PREFIX=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.material = Material.objects.create(
+            name='Protocol', file=SimpleUploadedFile('protocol.txt', b'0123456789')
+        )
+        self.factory = RequestFactory()
+
+    def serve(self, **headers):
+        return serve_material_file(self.factory.get('/', **headers), self.material)
+
+    def test_whole_file(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_partial_content(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_range_of_another_version_sends_whole_file(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_range_not_satisfiable(self):
+        response = self.serve(HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_not_modified(self):
+        etag = self.serve()['ETag']
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_replaced_file_gets_a_new_etag(self):
+        etag = self.serve()['ETag']
+        self.material.file = SimpleUploadedFile('protocol.txt', b'new content')
+        self.material.save()
+
+        response = self.serve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'new content')
+
+    def test_missing_file(self):
+        self.material.file.storage.delete(self.material.file.name)
+        with self.assertRaises(Http404):
+            self.serve()
+
+
+class BlobReferenceTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, content=b'protocol'):
+        return Material.objects.create(name='Protocol', file=SimpleUploadedFile('protocol.txt', content))
+
+    def expire(self, blob):
+        StoredBlob.objects.filter(pk=blob.pk).update(last_used_at=timezone.now() - BLOB_DELETE_GRACE * 2)
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        first, second = self.upload(), self.upload()
+        self.assertEqual(first.file.name, second.file.name)
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+
+        first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_replacing_a_file_moves_the_reference(self):
+        material = self.upload()
+        old_name = material.file.name
+        material.file = SimpleUploadedFile('protocol.txt', b'new content')
+        material.save()
+        self.assertEqual(StoredBlob.objects.get(name=old_name).ref_count, 0)
+        self.assertEqual(StoredBlob.objects.get(name=material.file.name).ref_count, 1)
+
+    def test_unreferenced_blob_is_deleted_after_the_grace_period(self):
+        material = self.upload()
+        name, storage = material.file.name, material.file.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            material.delete()
+        # Still within the grace period
+        self.assertTrue(storage.exists(name))
+
+        self.expire(StoredBlob.objects.get(name=name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(delete_unreferenced_blob(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+        self.assertFalse(storage.exists(name))
+
+    def test_referenced_blob_is_kept(self):
+        material = self.upload()
+        name = material.file.name
+        blob = StoredBlob.objects.get(name=name)
+        StoredBlob.objects.filter(pk=blob.pk).update(ref_count=0)
+        self.expire(blob)
+
+        add_blob_reference(name)
+        self.assertFalse(delete_unreferenced_blob(name))
+        self.assertTrue(material.file.storage.exists(name))
+
+    def test_upload_before_the_file_is_deleted_keeps_it(self):
+        material = self.upload()
+        name, storage = material.file.name, material.file.storage
+        material.delete()
+        self.expire(StoredBlob.objects.get(name=name))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(delete_unreferenced_blob(name))
+        # The same content is uploaded again before the deletion's commit callback runs
+        self.upload()
+        for callback in callbacks:
+            callback()
+
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 1)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def upload(self):
+        image = BytesIO()
+        Image.new('RGB', (1000, 500), 'red').save(image, format='PNG')
+        return CustomUser.objects.create_user(
+            'student', password='password', profile_picture=SimpleUploadedFile('photo.png', image.getvalue())
+        )
+
+    def test_variants_are_rendered_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self.upload()
+
+        picture = user.profile_picture
+        variant_name = get_variant_name(picture.name, 'small')
+        self.assertTrue(picture.storage.exists(variant_name))
+        self.assertEqual(get_image_variant_url(picture, 'small'), picture.storage.url(variant_name))
+        with picture.storage.open(variant_name) as variant:
+            self.assertEqual(Image.open(variant).size, (320, 160))
+
+    def test_missing_variant_serves_the_original_until_rendered(self):
+        # The variants of the upload were never rendered, as on a fresh deploy
+        with self.captureOnCommitCallbacks():
+            user = self.upload()
+        cache.clear()
+        picture = user.profile_picture
+        variant_name = get_variant_name(picture.name, 'medium')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(get_image_variant_url(picture, 'medium'), picture.url)
+            self.assertFalse(picture.storage.exists(variant_name))
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(get_image_variant_url(picture, 'medium'), picture.storage.url(variant_name))
+
+
+class StepProgressBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        student = CustomUser.objects.create_user('student', password='password')
+        course = Course.objects.create(title='Course', description='', author=author)
+        module = Module.objects.create(course=course, title='Module')
+        cls.lesson = Lesson.objects.create(module=module, title='Lesson')
+        cls.other_lesson = Lesson.objects.create(module=module, title='Other lesson', order=2)
+        cls.progress = UserProgress.objects.create(user=student, course=course)
+
+    def setUp(self):
+        cache.clear()
+        # Flushes are triggered by the tests, not by a timer thread
+        patcher = mock.patch.object(step_progress, '_schedule_flush')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(step_progress._pending.clear)
+
+    def stored_steps(self):
+        return set(StepCompletion.objects.filter(progress=self.progress).values_list('lesson_id', 'step'))
+
+    @override_settings(STEP_PROGRESS_FLUSH_INTERVAL=0)
+    def test_steps_are_written_at_once_without_buffering(self):
+        step_progress.record_step(self.progress, self.lesson, 1)
+        self.assertEqual(self.stored_steps(), {(self.lesson.pk, 1)})
+        self.assertEqual(step_progress.flush(), 0)
+
+    @override_settings(STEP_PROGRESS_FLUSH_INTERVAL=60)
+    def test_reads_merge_buffered_steps_until_the_flush(self):
+        self.progress.mark_step_completed(self.lesson, 1)
+        step_progress.record_step(self.progress, self.lesson, 1)
+        step_progress.record_step(self.progress, self.lesson, 2)
+        step_progress.record_step(self.progress, self.other_lesson, 1)
+
+        self.assertEqual(self.stored_steps(), {(self.lesson.pk, 1)})
+        self.assertEqual(step_progress.get_completed_steps(self.progress, self.lesson), {1, 2})
+        self.assertEqual(
+            step_progress.merge_completed_step_counts(self.progress, {self.lesson.pk: 1}),
+            {self.lesson.pk: 2, self.other_lesson.pk: 1}
+        )
+
+        self.assertEqual(step_progress.flush(), 3)
+        self.assertEqual(
+            self.stored_steps(), {(self.lesson.pk, 1), (self.lesson.pk, 2), (self.other_lesson.pk, 1)}
+        )
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.steps_completed_count, 3)
+        self.assertEqual(step_progress.flush(), 0)
+
+    @override_settings(STEP_PROGRESS_FLUSH_INTERVAL=60)
+    def test_flush_enrollment_writes_steps_buffered_by_other_processes(self):
+        step_progress.record_step(self.progress, self.lesson, 1)
+        step_progress.record_step(self.progress, self.lesson, 2)
+        # Only the shared cache knows the steps of another process
+        step_progress._pending.clear()
+
+        step_progress.flush_enrollment(self.progress)
+
+        self.assertEqual(self.stored_steps(), {(self.lesson.pk, 1), (self.lesson.pk, 2)})
+        self.assertEqual(step_progress.flush(), 0)
@@ -20,6 +20,8 @@ urlpatterns = [
     path('api/comments/', views.CommentListView.as_view(), name='comment-list'),
     path('api/comments/<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
     path('api/courses/<int:course_id>/progress/', views.UserProgressView.as_view(), name='user-progress'),
+    path('api/search/', views.SearchView.as_view(), name='api-search'),
+    path('api/query-stats/', views.QueryStatsView.as_view(), name='api-query-stats'),
     
     # Comment URLs
     path('comments/create/', views.comment_create, name='comment-create'),
@@ -45,6 +47,7 @@ urlpatterns = [
     # Material URLs
     path('materials/', views.MaterialListView.as_view(), name='material-list'),
     path('materials/<int:pk>/', views.material_detail, name='material-detail'),
+    path('materials/<int:pk>/download/', views.material_download, name='material-download'),
     path('materials/create/', views.MaterialCreateView.as_view(), name='material-create'),
     path('materials/<int:pk>/update/', views.MaterialUpdateView.as_view(), name='material-update'),
     path('materials/<int:pk>/delete/', views.MaterialDeleteView.as_view(), name='material-delete'),
@@ -2,11 +2,13 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q, Count, Prefetch
-from django.http import HttpResponse, JsonResponse
+from django.db.models import Q, Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.utils.translation import gettext as _
+from django.views.decorators.clickjacking import xframe_options_sameorigin
+from django.utils.translation import gettext as _, get_language
 from django.conf import settings
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
@@ -30,7 +32,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from .models import (
     CustomUser, Course, Material, Comment, Test, Question, Answer,
-    Certificate, UserProgress, Module, Lesson, LessonContent, LearningOutcome
+    Certificate, UserProgress, Module, Lesson, LessonContent, LearningOutcome, SearchDocument
 )
 from .serializers import (
     CustomUserSerializer, CourseSerializer, MaterialSerializer,
@@ -41,11 +43,42 @@ from .serializers import (
 from .forms import (
     CourseForm, MaterialForm, CommentForm, ModuleForm, LessonForm, LessonContentForm
 )
+from .outline import get_course_outline, get_outline_version
+from .progress import resolve_course_progress
+from .dashboard import get_student_dashboard_data
+from .comments import CommentCursorPagination, attach_replies, get_material_thread
+from .search import search as full_text_search, search_object_ids
+from .downloads import serve_material_file, user_can_access_material
+from .query_stats import get_view_summary
+from . import step_progress
 
 # Helper functions
 def get_user_role(user):
     return user.role if user.is_authenticated else None
 
+def get_next_lesson_url(outline, lesson_id, completed_lesson_ids):
+    """
+    Return the URL to continue with after a lesson: the next lesson of the module,
+    the module quiz once all module lessons are completed, or the next module.
+    """
+    next_lesson_id = outline.get_next_lesson_in_module(lesson_id)
+    if next_lesson_id:
+        return reverse('lesson-detail', kwargs={'lesson_id': next_lesson_id})
+    
+    lesson = outline.get_lesson(lesson_id)
+    if not lesson:
+        return None
+    
+    module_quiz = outline.get_module_quiz(lesson['module_id'])
+    module_lesson_ids = outline.get_module_lesson_ids(lesson['module_id'])
+    if module_quiz and all(module_lesson_id in completed_lesson_ids for module_lesson_id in module_lesson_ids):
+        return reverse('quiz:quiz_detail', kwargs={'pk': module_quiz['id']})
+    
+    next_lesson_id = outline.get_next_lesson_id(lesson_id)
+    if next_lesson_id:
+        return reverse('lesson-detail', kwargs={'lesson_id': next_lesson_id})
+    return None
+
 def get_tokens_for_user(user):
     refresh = RefreshToken.for_user(user)
     return {
@@ -141,11 +174,30 @@ class CourseViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
-        # If user is admin or author, show all courses
-        if user.is_staff or Course.objects.filter(author=user).exists():
-            return Course.objects.all()
-        # Others can only see published courses
-        return Course.objects.filter(is_published=True)
+        # Admins see all courses, authors also see their own unpublished ones
+        if user.is_staff:
+            queryset = Course.objects.all()
+        elif user.is_authenticated:
+            queryset = Course.objects.filter(Q(is_published=True) | Q(author=user))
+        else:
+            queryset = Course.objects.filter(is_published=True)
+        
+        # Only join and count what the requested fields need
+        requested = CourseSerializer.get_requested_fields(self.request)
+        if requested is None or 'author_name' in requested:
+            queryset = queryset.select_related('author')
+        if requested is None or 'materials_count' in requested:
+            queryset = queryset.annotate(materials_total=Coalesce(Subquery(
+                Material.objects.filter(course_id=OuterRef('pk')).order_by().values('course_id')
+                .annotate(total=Count('id')).values('total')
+            ), 0))
+        if requested is None or 'tests_count' in requested:
+            queryset = queryset.annotate(tests_total=Coalesce(Subquery(
+                Test.objects.filter(course_id=OuterRef('pk')).order_by().values('course_id')
+                .annotate(total=Count('id')).values('total')
+            ), 0))
+        
+        return queryset.order_by('-created_at')
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -178,10 +230,14 @@ class MaterialViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         # Admins and content creators see all
+        materials = Material.objects.select_related('author').annotate(comments_total=Coalesce(Subquery(
+            Comment.objects.filter(material_id=OuterRef('pk')).order_by().values('material_id')
+            .annotate(total=Count('id')).values('total')
+        ), 0))
         if user.is_staff or Material.objects.filter(author=user).exists():
-            return Material.objects.all().order_by('-created_at')
+            return materials.order_by('-created_at')
         # Filter by language or course if specified
-        queryset = Material.objects.filter(
+        queryset = materials.filter(
             Q(course__is_published=True) | Q(course__isnull=True)
         ).order_by('-created_at')
         
@@ -218,7 +274,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
         return Response({"detail": _("Material marked as completed.")})
 
 class TestViewSet(viewsets.ModelViewSet):
-    queryset = Test.objects.all()
+    queryset = Test.objects.prefetch_related('questions__answers')
     serializer_class = TestSerializer
     authentication_classes = [JWTAuthentication, SessionAuthentication]
     
@@ -228,16 +284,21 @@ class TestViewSet(viewsets.ModelViewSet):
         user = request.user
         answers = request.data.get('answers', [])
         
-        total_points = sum(q.points for q in test.questions.all())
+        # Questions and answers come prefetched with the test, grade from memory
+        questions = {str(question.id): question for question in test.questions.all()}
+        total_points = sum(q.points for q in questions.values())
         earned_points = 0
         
         for answer_data in answers:
-            question_id = answer_data.get('question_id')
-            answer_id = answer_data.get('answer_id')
-            
-            question = get_object_or_404(Question, id=question_id, test=test)
-            correct_answers = Answer.objects.filter(question=question, is_correct=True)
-            selected_answer = get_object_or_404(Answer, id=answer_id, question=question)
+            question = questions.get(str(answer_data.get('question_id')))
+            if question is None:
+                raise Http404
+            selected_answer = next(
+                (answer for answer in question.answers.all() if str(answer.id) == str(answer_data.get('answer_id'))),
+                None
+            )
+            if selected_answer is None:
+                raise Http404
             
             if selected_answer.is_correct:
                 earned_points += question.points
@@ -253,10 +314,12 @@ class TestViewSet(viewsets.ModelViewSet):
         # Check if user passed the test
         if score_percentage >= test.passing_score:
             # Generate certificate if all tests are completed
-            course_tests = Test.objects.filter(course=test.course)
-            completed_tests = progress.tests_completed.all()
+            # Compare in the database instead of loading both querysets
+            missing_tests = Test.objects.filter(course=test.course).exclude(
+                id__in=progress.tests_completed.values('id')
+            )
             
-            if set(course_tests) <= set(completed_tests):
+            if not missing_tests.exists():
                 certificate_id = f"{test.course.id}-{user.id}-{uuid.uuid4().hex[:8]}"
                 certificate, created = Certificate.objects.get_or_create(
                     user=user,
@@ -285,20 +348,30 @@ class CertificateViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        certificates = Certificate.objects.select_related('user', 'course')
         if user.is_staff:
-            return Certificate.objects.all()
-        return Certificate.objects.filter(user=user)
+            return certificates
+        return certificates.filter(user=user)
 
 class CommentListView(generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication, SessionAuthentication]
     
+    pagination_class = CommentCursorPagination
+    
     def get_queryset(self):
         material_id = self.request.query_params.get('material')
+        queryset = Comment.objects.filter(parent__isnull=True).select_related('author')
         if material_id:
-            return Comment.objects.filter(material_id=material_id, parent__isnull=True)
-        return Comment.objects.filter(parent__isnull=True)
+            return queryset.filter(material_id=material_id)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # A page of top-level comments, then all of their replies in one more query
+        roots = attach_replies(self.paginate_queryset(self.get_queryset()))
+        serializer = self.get_serializer(roots, many=True)
+        return self.get_paginated_response(serializer.data)
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -325,8 +398,62 @@ class UserProgressView(APIView):
             user=request.user, course=course
         )
         
-        serializer = UserProgressSerializer(progress)
-        return Response(serializer.data)
+        course_progress = resolve_course_progress(
+            request.user, course.id, user_progress=progress,
+            outline=get_course_outline(course.id, course.outline_version)
+        )
+        
+        data = UserProgressSerializer(progress).data
+        data['modules'] = list(course_progress.modules.values())
+        data['lessons'] = list(course_progress.lessons.values())
+        return Response(data)
+
+class SearchView(APIView):
+    """Ranked full-text search over courses, lessons, lesson steps and materials"""
+    permission_classes = [AllowAny]
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    max_limit = 50
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        
+        object_types = [
+            object_type for object_type in request.query_params.get('type', '').split(',')
+            if object_type in dict(SearchDocument.OBJECT_TYPES)
+        ]
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            limit = 20
+        
+        # Staff and doctors also find unpublished content, like in the course list
+        include_private = request.user.is_staff or get_user_role(request.user) == 'doctor'
+        
+        results = full_text_search(
+            query,
+            object_types=object_types or None,
+            language=request.query_params.get('language') or None,
+            include_private=include_private,
+            limit=limit
+        )
+        return Response({'query': query, 'count': len(results), 'results': results})
+
+class QueryStatsView(APIView):
+    """Per-view query statistics recorded by QueryInstrumentationMiddleware, for staff"""
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    order_fields = ('queries', 'avg_queries', 'max_queries', 'db_time', 'repeated')
+    
+    def get(self, request):
+        order_by = request.query_params.get('order_by')
+        if order_by not in self.order_fields:
+            order_by = 'queries'
+        try:
+            minutes = int(request.query_params['minutes'])
+        except (KeyError, ValueError):
+            minutes = None
+        return Response({'order_by': order_by, 'views': get_view_summary(minutes, order_by)})
 
 # Template-based Views
 @cache_page(60 * 5)  # Cache for 5 minutes
@@ -437,105 +564,9 @@ def dashboard(request):
         'user_role': user_role,
     }
     
-    # Get all courses the user is enrolled in
-    user_progress_list = UserProgress.objects.filter(user=user).select_related('course').prefetch_related(
-        'materials_completed', 'tests_completed', 'lessons_completed'
-    )
-    
     # For student and parent dashboard
     if user_role in ['student', 'parent']:
-        enrolled_courses = []
-        completed_lessons_count = 0
-        total_lessons_count = 0
-        completed_quizzes_count = 0
-        total_quizzes_count = 0
-        
-        # Process each course enrollment
-        for progress in user_progress_list:
-            course = progress.course
-            
-            # Calculate progress percentage
-            total_lessons = Lesson.objects.filter(module__course=course).count()
-            completed_lessons = progress.lessons_completed.count()
-            
-            if total_lessons > 0:
-                progress_percentage = (completed_lessons / total_lessons) * 100
-            else:
-                progress_percentage = 0
-                
-            # Find next lesson to continue
-            next_lesson = None
-            for module in course.modules.all().order_by('order'):
-                if not next_lesson:
-                    for lesson in module.lessons.all().order_by('order'):
-                        if lesson not in progress.lessons_completed.all():
-                            next_lesson = lesson
-                            break
-            
-            enrolled_courses.append({
-                'course': course,
-                'progress_percentage': round(progress_percentage),
-                'last_access': progress.last_access,
-                'next_lesson': next_lesson
-            })
-            
-            # Update statistics
-            completed_lessons_count += completed_lessons
-            total_lessons_count += total_lessons
-            completed_quizzes_count += progress.tests_completed.count()
-            total_quizzes_count += course.quizzes.count()
-        
-        # Get certificates
-        certificates = Certificate.objects.filter(user=user).select_related('course')
-        
-        # Calculate averages for statistics
-        completed_lessons_percentage = 0
-        if total_lessons_count > 0:
-            completed_lessons_percentage = (completed_lessons_count / total_lessons_count) * 100
-            
-        completed_quizzes_percentage = 0
-        if total_quizzes_count > 0:
-            completed_quizzes_percentage = (completed_quizzes_count / total_quizzes_count) * 100
-        
-        # Find next content to study
-        next_content = None
-        if enrolled_courses:
-            for enrollment in enrolled_courses:
-                if enrollment['next_lesson']:
-                    next_content = {
-                        'type': 'lesson',
-                        'title': enrollment['next_lesson'].title,
-                        'course': enrollment['course'],
-                        'estimated_time': enrollment['next_lesson'].estimated_time,
-                        'url': f"/lessons/{enrollment['next_lesson'].id}/"
-                    }
-                    break
-        
-        # Get suggested courses based on user's interests and enrollment history
-        suggested_courses = Course.objects.filter(is_published=True).exclude(
-            id__in=[enrollment['course'].id for enrollment in enrolled_courses]
-        )[:3]
-        
-        # Get recent activities (placeholder - implement actual activity tracking)
-        recent_activities = []
-        
-        context.update({
-            'enrolled_courses': enrolled_courses,
-            'enrolled_courses_count': len(enrolled_courses),
-            'completed_courses_count': Certificate.objects.filter(user=user).count(),
-            'certificates_count': certificates.count(),
-            'certificates': certificates[:3],  # Show only the most recent certificates
-            'completed_lessons_count': completed_lessons_count,
-            'total_lessons_count': total_lessons_count,
-            'completed_lessons_percentage': round(completed_lessons_percentage),
-            'completed_quizzes_count': completed_quizzes_count,
-            'total_quizzes_count': total_quizzes_count,
-            'completed_quizzes_percentage': round(completed_quizzes_percentage),
-            'average_quiz_score': 0,  # Placeholder - implement actual calculation
-            'next_content': next_content,
-            'suggested_courses': suggested_courses,
-            'recent_activities': recent_activities
-        })
+        context.update(get_student_dashboard_data(user))
     
     # For doctor dashboard
     elif user_role == 'doctor':
@@ -576,214 +607,136 @@ class ModuleWithProgress:
         self.completed = completed
         self.quiz = None
         self.quiz_completed = False
+        self.lessons_with_status = []
 
-def course_detail(request, pk):
-    # Try to get from cache first
-    cache_key = f'course_detail_{pk}_{request.user.id if request.user.is_authenticated else 0}'
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        return render(request, 'core/course_detail.html', cached_data)
+def get_course_page_data(course_id, version):
+    """
+    Return the user-independent part of the course page.
+    It is cached once per course and language under the course outline version,
+    so structure changes are picked up right away.
+    """
+    from quiz.models import Quiz
+    
+    language = get_language()
+    cache_key = f'course_page_{course_id}_{language}_{version}'
+    page_data = cache.get(cache_key)
+    
+    if page_data is None:
+        course = Course.objects.select_related('author').filter(pk=course_id).first()
+        if course is None:
+            return None
+        
+        outline = get_course_outline(course_id, version)
+        quiz_time = sum(module['quiz']['time_limit'] for module in outline.modules if module['quiz'])
+        lesson_time = sum(lesson['estimated_time'] for lesson in outline.lessons.values())
+        
+        page_data = {
+            'course': course,
+            'language_display': str(course.get_language_display()),
+            'learning_outcomes': list(course.learning_outcomes.all()),
+            'first_lesson': outline.get_lesson(outline.lesson_ids[0]) if outline.lesson_ids else None,
+            'course_stats': {
+                'modules_count': len(outline.modules),
+                'lessons_count': outline.lesson_count,
+                'quizzes_count': Quiz.objects.filter(course_id=course_id).count(),
+                'students_count': UserProgress.objects.filter(course_id=course_id).count(),
+                'total_duration': lesson_time + quiz_time,
+            },
+            # Related courses are picked deterministically so the page can be shared
+            'related_courses': list(
+                Course.objects.filter(is_published=True, language=course.language)
+                .exclude(id=course_id).order_by('-created_at').only('id', 'title')[:3]
+            ),
+        }
+        cache.set(cache_key, page_data, 60 * 5)
     
-    # Fetch course with author in a single query
-    course = get_object_or_404(
-        Course.objects.select_related('author'),
-        pk=pk
-    )
+    return page_data
+
+def course_detail(request, pk):
+    # Shared structure of the course page, identical for every user
+    # The outline version is read from the database, it also tells if the course exists
+    version = get_outline_version(pk)
+    if version is None:
+        raise Http404
+    
+    page_data = get_course_page_data(pk, version)
+    if page_data is None:
+        raise Http404
+    
+    course = page_data['course']
+    outline = get_course_outline(course.id, version)
     user_role = get_user_role(request.user)
     
-    # Check if the user is enrolled
-    is_enrolled = False
-    user_progress = None
+    # Per-user overlay, resolved with a fixed number of queries
+    progress = resolve_course_progress(request.user, course.id, outline=outline)
+    user_progress = progress.user_progress
+    is_enrolled = progress.is_enrolled
     next_lesson = None
-    progress_percentage = 0
     
-    if request.user.is_authenticated:
-        # Get user progress with all completed items in a single query
-        user_progress = UserProgress.objects.filter(
-            user=request.user, course=course
-        ).prefetch_related(
-            'materials_completed', 
-            'tests_completed', 
-            'lessons_completed'
-        ).first()
-        is_enrolled = user_progress is not None
-    
-    # Import Quiz model here to avoid circular imports
-    from quiz.models import Quiz, QuizAttempt
-    
-    # Get modules with their lessons and quizzes in an efficient query
-    course_modules = list(
-        Module.objects.filter(course=course)
-        .prefetch_related(
-            'quiz',
-            Prefetch('lessons', queryset=Lesson.objects.order_by('order'))
-        )
-        .order_by('order')
-    )
-    
-    # Get quizzes for this course with all related data
-    quizzes = Quiz.objects.filter(course=course).select_related(
-        'module', 'course'
-    ).prefetch_related(
-        'questions', 
-        'questions__choices'
-    )
-    
-    # Create a dictionary mapping module IDs to quizzes for efficient access
-    module_quizzes = {}
-    for quiz in quizzes:
-        if quiz.module_id:
-            module_quizzes[quiz.module_id] = quiz
-    
-    # Check for completed quizzes
-    completed_quizzes = {}
-    if is_enrolled and request.user.is_authenticated:
-        # Get all passed attempts
-        passed_attempts = QuizAttempt.objects.filter(
-            user=request.user,
-            quiz__in=quizzes,
-            is_completed=True
-        ).values_list('quiz_id', flat=True)
-        
-        # Mark quizzes as completed
-        completed_quizzes = {quiz_id: True for quiz_id in passed_attempts}
-        
-        # Find the next lesson to continue with
-        if user_progress:
-            # Get all lessons for this course
-            all_lessons = Lesson.objects.filter(module__course=course).order_by('module__order', 'order')
-            
-            # Get the completed lessons IDs
-            completed_lesson_ids = set(user_progress.lessons_completed.values_list('id', flat=True))
-            
-            # Calculate progress percentage
-            total_lessons = all_lessons.count()
-            completed_lessons_count = len(completed_lesson_ids)
-            
-            if total_lessons > 0:
-                progress_percentage = (completed_lessons_count / total_lessons) * 100
-            
-            # Find the first uncompleted lesson
-            for lesson in all_lessons:
-                if lesson.id not in completed_lesson_ids:
-                    next_lesson = lesson
-                    break
+    if is_enrolled:
+        next_lesson_id = progress.next_lesson_id
+        
+        # If all lessons are completed, look for uncompleted quizzes
+        if next_lesson_id is None:
+            for module in outline.modules:
+                quiz = module['quiz']
+                if quiz and not progress.is_quiz_completed(quiz['id']):
+                    # All lessons in this module are completed, suggest the quiz
+                    return redirect('quiz:quiz_detail', quiz['id'])
             
-            # If all lessons are completed but no next lesson is set, look for uncompleted quizzes
-            if next_lesson is None:
-                for quiz in quizzes:
-                    if quiz.id not in passed_attempts:
-                        if quiz.module_id:
-                            # Check if all lessons in this module are completed
-                            module_lessons = Lesson.objects.filter(module=quiz.module)
-                            module_lesson_ids = set(module_lessons.values_list('id', flat=True))
-                            if module_lesson_ids.issubset(completed_lesson_ids):
-                                # All lessons in this module are completed, suggest the quiz
-                                return redirect('quiz:quiz_detail', quiz.id)
-                
-                # If still no next content and all lessons exists, set to first lesson
-                if next_lesson is None and all_lessons.exists():
-                    next_lesson = all_lessons.first()
+            # If still no next content, start over from the first lesson
+            if outline.lesson_ids:
+                next_lesson_id = outline.lesson_ids[0]
+        
+        next_lesson = outline.get_lesson(next_lesson_id)
     
     # Calculate module progress information
     modules_with_progress = []
-    if course_modules:
-        for module in course_modules:
-            # Use the new method to get progress for this user
-            if is_enrolled and request.user.is_authenticated:
-                progress_percentage, is_completed = module.get_progress_for_user(request.user)
-                
-                # Create a ModuleWithProgress object with the calculated values
-                module_with_progress = ModuleWithProgress(
-                    module=module,
-                    progress_percentage=progress_percentage,
-                    completed=is_completed
-                )
-                
-                # Mark lessons as finished or not for this user
-                if module_with_progress.module.lessons.exists():
-                    # Create a list of lessons with their completion status
-                    module_with_progress.lessons_with_status = []
-                    for lesson in module_with_progress.module.lessons.all().order_by('order'):
-                        is_finished = lesson.is_finished(request.user)
-                        module_with_progress.lessons_with_status.append({
-                            'lesson': lesson,
-                            'is_finished': is_finished
-                        })
-            else:
-                # If user is not enrolled, create with default values
-                module_with_progress = ModuleWithProgress(
-                    module=module,
-                    progress_percentage=0,
-                    completed=False
-                )
-                
-                # Mark all lessons as not finished
-                if module_with_progress.module.lessons.exists():
-                    module_with_progress.lessons_with_status = []
-                    for lesson in module_with_progress.module.lessons.all().order_by('order'):
-                        module_with_progress.lessons_with_status.append({
-                            'lesson': lesson,
-                            'is_finished': False
-                        })
-            
-            # Get the quiz for this module (if any)
-            try:
-                if hasattr(module, 'quiz') and module.quiz:
-                    module_with_progress.quiz = module.quiz
-                    if is_enrolled and module.quiz.id in completed_quizzes:
-                        module_with_progress.quiz_completed = True
-            except:
-                # If there's an issue with the quiz relationship, use the dictionary
-                if module.id in module_quizzes:
-                    module_with_progress.quiz = module_quizzes[module.id]
-                    if is_enrolled and module_with_progress.quiz.id in completed_quizzes:
-                        module_with_progress.quiz_completed = True
-            
-            modules_with_progress.append(module_with_progress)
+    for module in outline.modules:
+        module_status = progress.get_module(module['id'])
+        
+        module_with_progress = ModuleWithProgress(
+            module=module,
+            progress_percentage=module_status['progress_percentage'],
+            completed=module_status['completed']
+        )
+        module_with_progress.quiz = module['quiz']
+        module_with_progress.quiz_completed = module_status['quiz_completed']
+        
+        for lesson_id in module['lesson_ids']:
+            module_with_progress.lessons_with_status.append({
+                'lesson': outline.get_lesson(lesson_id),
+                'is_finished': progress.is_lesson_finished(lesson_id),
+                'is_current': next_lesson is not None and lesson_id == next_lesson['id'],
+            })
+        
+        modules_with_progress.append(module_with_progress)
     
     # Build context with all the data
-    context = {
-        'course': course,
-        'materials': Material.objects.filter(course=course).select_related('author'),
-        'tests': quizzes,
+    context = dict(page_data)
+    context.update({
         'is_enrolled': is_enrolled,
         'user_progress': user_progress,
         'user_role': user_role,
-        'completed_quizzes': completed_quizzes,
+        'completed_quizzes': {quiz_id: True for quiz_id in progress.completed_quiz_ids},
         'next_lesson': next_lesson,
-        'progress_percentage': round(progress_percentage) if progress_percentage is not None else 0,
+        'progress_percentage': user_progress.completion_percentage if is_enrolled else 0,
         'modules': modules_with_progress,
-    }
+    })
     
     # Check if user has a certificate for this course
     context['course_completed'] = False
     context['user_has_certificate'] = False
     context['user_certificate'] = None
     
-    if is_enrolled and request.user.is_authenticated:
-        # Check if all lessons are completed
-        all_lessons = Lesson.objects.filter(module__course=course)
-        total_lessons = all_lessons.count()
-        completed_lessons = user_progress.lessons_completed.count()
+    if is_enrolled and user_progress.is_completed:
+        context['course_completed'] = True
         
-        if total_lessons > 0 and completed_lessons >= total_lessons:
-            context['course_completed'] = True
-            
-            # Check for certificate
-            certificate = Certificate.objects.filter(user=request.user, course=course).first()
-            if certificate:
-                context['user_has_certificate'] = True
-                context['user_certificate'] = certificate
-    
-    # Add related courses
-    context['related_courses'] = Course.objects.filter(
-        is_published=True
-    ).exclude(id=course.id).order_by('?')[:3]
-    
-    # Cache for 5 minutes
-    cache.set(cache_key, context, 60 * 5)
+        # Check for certificate
+        certificate = Certificate.objects.filter(user=request.user, course=course).first()
+        if certificate:
+            context['user_has_certificate'] = True
+            context['user_certificate'] = certificate
     
     return render(request, 'core/course_detail.html', context)
 
@@ -792,8 +745,8 @@ def material_detail(request, pk):
     material = get_object_or_404(Material.objects.select_related('author', 'course'), pk=pk)
     user_role = get_user_role(request.user)
     
-    # Get comments with their authors
-    comments = Comment.objects.filter(material=material, parent__isnull=True).select_related('author')
+    # Get the whole comment thread with its authors in one query
+    comments = get_material_thread(material.id)
     
     # Check if material is completed by user
     is_completed = False
@@ -812,6 +765,21 @@ def material_detail(request, pk):
     }
     return render(request, 'core/material_detail.html', context)
 
+@login_required
+@xframe_options_sameorigin  # Documents and presentations are shown in an iframe
+def material_download(request, pk):
+    """Stream the file of a material after checking access, with byte range support"""
+    material = get_object_or_404(
+        Material.objects.select_related('course').only(
+            'id', 'name', 'file', 'author_id', 'content_hash', 'updated_at', 'course__id', 'course__is_published'
+        ),
+        pk=pk
+    )
+    if not material.file or not user_can_access_material(request.user, material):
+        raise Http404
+    
+    return serve_material_file(request, material, as_attachment=request.GET.get('download') == '1')
+
 @login_required
 def comment_create(request):
     if request.method == 'POST':
@@ -823,6 +791,9 @@ def comment_create(request):
         
         if parent_id:
             parent = get_object_or_404(Comment, id=parent_id)
+            if not parent.accepts_replies:
+                messages.error(request, _("Слишком глубокая вложенность ответов, ответьте на комментарий выше."))
+                return redirect('material-detail', pk=material_id)
             Comment.objects.create(
                 content=content,
                 author=request.user,
@@ -866,7 +837,7 @@ def add_comment(request, material_id):
             Comment.objects.create(
                 material=material,
                 author=request.user,
-                text=text,
+                content=text,
                 parent=None
             )
             messages.success(request, _("Комментарий добавлен."))
@@ -884,11 +855,13 @@ def add_reply(request, comment_id):
     
     if request.method == 'POST':
         text = request.POST.get('text')
-        if text:
+        if not parent_comment.accepts_replies:
+            messages.error(request, _("Слишком глубокая вложенность ответов, ответьте на комментарий выше."))
+        elif text:
             Comment.objects.create(
                 material=parent_comment.material,
                 author=request.user,
-                text=text,
+                content=text,
                 parent=parent_comment
             )
             messages.success(request, _("Ответ добавлен."))
@@ -1043,7 +1016,7 @@ class CourseListView(ListView):
         # Filter by search term
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(title__icontains=search)
+            queryset = queryset.filter(id__in=search_object_ids(search, SearchDocument.COURSE))
         
         # Filter by language
         language = self.request.GET.get('language')
@@ -1121,7 +1094,7 @@ class MaterialListView(ListView):
         # Filter by search term
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(name__icontains=search)
+            queryset = queryset.filter(id__in=search_object_ids(search, SearchDocument.MATERIAL))
         
         # Filter by type
         material_type = self.request.GET.get('type')
@@ -1248,37 +1221,18 @@ class MaterialDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 @login_required
 def lesson_detail(request, lesson_id):
-    # Use caching to speed up navigation between lessons
-    cache_key = f'lesson_detail_{lesson_id}_{request.user.id}'
-    cached_data = cache.get(cache_key)
-    
-    # Get the step parameter before possibly returning cached data
-    current_step_param = int(request.GET.get('step', '1'))
-    
-    if cached_data and 'steps' in cached_data:
-        # Only update the current step in the cached data
-        total_steps = len(cached_data['steps'])
-        if current_step_param < 1 or current_step_param > total_steps:
-            current_step_param = 1
-        
-        cached_data['current_step'] = current_step_param
-        cached_data['current_content'] = cached_data['steps'][current_step_param - 1] if cached_data['steps'] else None
-        
-        if total_steps > 0:
-            cached_data['current_step_percentage'] = (current_step_param / total_steps) * 100
-        
-        return render(request, 'core/lesson_detail.html', cached_data)
+    current_step = int(request.GET.get('step', '1'))
     
     # Use select_related and prefetch_related to optimize queries
     lesson = get_object_or_404(
         Lesson.objects.select_related(
             'module', 
             'module__course', 
-            'module__course__author'
+            'module__course__author',
+            'quiz'
         ).prefetch_related(
             'additional_resources',
-            'steps',
-            'quiz'
+            'steps'
         ), 
         id=lesson_id
     )
@@ -1286,11 +1240,13 @@ def lesson_detail(request, lesson_id):
     module = lesson.module
     course = module.course
     
+    # Course structure used for navigation comes from the cached outline
+    outline = get_course_outline(course.id, course.outline_version)
+    
     # Get all steps for this lesson
-    steps = list(LessonContent.objects.filter(lesson=lesson).order_by('order'))
+    steps = list(lesson.steps.all())
     
     # Determine which step to show
-    current_step = current_step_param
     if current_step < 1 or current_step > len(steps):
         current_step = 1
     
@@ -1302,14 +1258,15 @@ def lesson_detail(request, lesson_id):
         user=request.user, 
         course=course
     ).prefetch_related(
-        'lessons_completed',
-        'tests_completed'
+        'lessons_completed'
     ).first()
     
     if not user_progress:
         # Create progress record if it doesn't exist
         user_progress = UserProgress.objects.create(user=request.user, course=course)
     
+    completed_lesson_ids = {completed.id for completed in user_progress.lessons_completed.all()}
+    
     # Calculate percentage for progress bar
     total_steps = len(steps)
     if total_steps > 0:
@@ -1318,96 +1275,18 @@ def lesson_detail(request, lesson_id):
         progress_percentage = 0
     
     # Check if the user has already completed this step/lesson
-    lesson_steps_completed = user_progress.lesson_steps_completed or {}
-    str_lesson_id = str(lesson.id)  # Use string key for JSON
+    completed_steps = step_progress.get_completed_steps(user_progress, lesson)
     
-    # Ensure the dict format is consistent
-    if not isinstance(lesson_steps_completed, dict):
-        lesson_steps_completed = {}
-    
-    # Mark current step as viewed if not already
-    if str_lesson_id not in lesson_steps_completed:
-        lesson_steps_completed[str_lesson_id] = []
-    
-    completed_steps = lesson_steps_completed.get(str_lesson_id, [])
-    
-    # If coming to step for first time, mark it as viewed
+    # If coming to step for first time, mark it as viewed (buffered, see step_progress)
     if current_step not in completed_steps:
-        completed_steps.append(current_step)
-        lesson_steps_completed[str_lesson_id] = completed_steps
-        user_progress.lesson_steps_completed = lesson_steps_completed
-        user_progress.save()
+        step_progress.record_step(user_progress, lesson, current_step)
+        completed_steps.add(current_step)
     
     # If all steps are completed, mark the lesson as completed (if not already)
-    if total_steps <= len(completed_steps) and lesson not in user_progress.lessons_completed.all():
-        user_progress.lessons_completed.add(lesson)
-    
-    # Precompute next lesson data more efficiently
-    next_lesson = None
-    next_lesson_url = None
-    
-    # Check for next lesson in module (optimize by using cached course structure)
-    module_lessons_key = f'module_lessons_{module.id}'
-    module_lessons = cache.get(module_lessons_key)
-    
-    if not module_lessons:
-        module_lessons = list(Lesson.objects.filter(
-            module=module
-        ).order_by('order').values('id', 'order'))
-        cache.set(module_lessons_key, module_lessons, 300)  # Cache for 5 minutes
-    
-    # Find next lesson in the same module
-    current_lesson_index = None
-    for i, l in enumerate(module_lessons):
-        if l['id'] == lesson.id:
-            current_lesson_index = i
-            break
-    
-    if current_lesson_index is not None and current_lesson_index < len(module_lessons) - 1:
-        next_lesson_id = module_lessons[current_lesson_index + 1]['id']
-        next_lesson_url = reverse('lesson-detail', kwargs={'lesson_id': next_lesson_id})
-    else:
-        # Check if this module has a quiz
-        from quiz.models import Quiz
-        module_quiz_key = f'module_quiz_{module.id}'
-        module_quiz = cache.get(module_quiz_key)
-        
-        if module_quiz is None:
-            module_quiz = Quiz.objects.filter(module=module).first()
-            cache.set(module_quiz_key, module_quiz, 300)  # Cache for 5 minutes
-        
-        if module_quiz:
-            # If all lessons in module are completed, point to the quiz
-            module_lessons_count = len(module_lessons)
-            completed_module_lessons = user_progress.lessons_completed.filter(module=module).count()
-            
-            if module_lessons_count > 0 and module_lessons_count == completed_module_lessons:
-                next_lesson_url = reverse('quiz:quiz_detail', kwargs={'pk': module_quiz.id})
-        else:
-            # Look for first lesson in next module
-            course_modules_key = f'course_modules_{course.id}'
-            course_modules = cache.get(course_modules_key)
-            
-            if not course_modules:
-                course_modules = list(Module.objects.filter(
-                    course=course
-                ).order_by('order').values('id', 'order'))
-                cache.set(course_modules_key, course_modules, 300)
-            
-            current_module_index = None
-            for i, m in enumerate(course_modules):
-                if m['id'] == module.id:
-                    current_module_index = i
-                    break
-            
-            if current_module_index is not None and current_module_index < len(course_modules) - 1:
-                next_module_id = course_modules[current_module_index + 1]['id']
-                next_module_first_lesson = Lesson.objects.filter(
-                    module_id=next_module_id
-                ).order_by('order').first()
-                
-                if next_module_first_lesson:
-                    next_lesson_url = reverse('lesson-detail', kwargs={'lesson_id': next_module_first_lesson.id})
+    if total_steps <= len(completed_steps) and lesson.id not in completed_lesson_ids:
+        step_progress.flush_enrollment(user_progress)
+        user_progress.mark_lesson_completed(lesson)
+        completed_lesson_ids.add(lesson.id)
     
     context = {
         'lesson': lesson,
@@ -1416,14 +1295,11 @@ def lesson_detail(request, lesson_id):
         'current_content': current_step_content,
         'total_steps': total_steps,
         'current_step_percentage': progress_percentage,
-        'course_progress': round(progress_percentage),
-        'next_lesson_url': next_lesson_url,
+        'course_progress': user_progress.completion_percentage,
+        'next_lesson_url': get_next_lesson_url(outline, lesson.id, completed_lesson_ids),
         'completed_steps': completed_steps  # Add this for UI highlighting
     }
     
-    # Cache the result for faster subsequent access
-    cache.set(cache_key, context, 180)  # Cache for 3 minutes
-    
     return render(request, 'core/lesson_detail.html', context)
 
 @login_required
@@ -1444,138 +1320,52 @@ def mark_step_completed(request):
             return JsonResponse(cached_result)
         
         # Get lesson with minimal related data
-        lesson = get_object_or_404(
-            Lesson.objects.select_related('module', 'module__course'),
-            id=lesson_id
-        )
-        course = lesson.module.course
-        current_module = lesson.module
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+        course_id = lesson.module.course_id
+        
+        # Course structure used for navigation comes from the cached outline
+        outline = get_course_outline(course_id, lesson.module.course.outline_version)
         
         # Get user progress with minimal related data
         user_progress = UserProgress.objects.filter(
-            user=request.user, course=course
+            user=request.user, course_id=course_id
         ).prefetch_related('lessons_completed').first()
         
         if not user_progress:
             # Create a new progress record if it doesn't exist
-            user_progress = UserProgress.objects.create(user=request.user, course=course)
-        
-        # Update completed steps
-        lesson_steps_completed = user_progress.lesson_steps_completed or {}
-        str_lesson_id = str(lesson_id)  # Convert to string for JSON compatibility
+            user_progress = UserProgress.objects.create(user=request.user, course_id=course_id)
         
-        # Initialize array for this lesson if not present
-        if str_lesson_id not in lesson_steps_completed:
-            lesson_steps_completed[str_lesson_id] = []
+        completed_lesson_ids = {completed.id for completed in user_progress.lessons_completed.all()}
         
-        # Add step if not already marked
-        if step not in lesson_steps_completed[str_lesson_id]:
-            lesson_steps_completed[str_lesson_id].append(step)
-            user_progress.lesson_steps_completed = lesson_steps_completed
-            
-            # Get total steps for this lesson (use cache)
-            steps_count_key = f'lesson_steps_count_{lesson_id}'
-            total_steps = cache.get(steps_count_key)
-            if total_steps is None:
-                total_steps = LessonContent.objects.filter(lesson=lesson).count()
-                cache.set(steps_count_key, total_steps, 3600)  # Cache for 1 hour
-            
-            # Mark lesson as completed if all steps are done
-            lesson_completed = (total_steps == len(lesson_steps_completed.get(str_lesson_id, [])))
-            if lesson_completed and lesson not in user_progress.lessons_completed.all():
-                user_progress.lessons_completed.add(lesson)
-            
-            # Save changes
-            user_progress.save()
-        else:
-            # Step already completed, no need to save
-            lesson_completed = True
-        
-        # Check if all lessons in this module are completed (use cached data if available)
-        module_completion_key = f'module_completion_{current_module.id}_{request.user.id}'
-        module_completion_data = cache.get(module_completion_key)
-        
-        if module_completion_data is None:
-            # Calculate module completion data
-            module_lessons_key = f'module_lessons_{current_module.id}'
-            module_lessons = cache.get(module_lessons_key)
-            
-            if not module_lessons:
-                module_lessons = list(Lesson.objects.filter(
-                    module=current_module
-                ).values_list('id', flat=True))
-                cache.set(module_lessons_key, module_lessons, 300)  # Cache for 5 minutes
-                
-            total_module_lessons = len(module_lessons)
-            completed_module_lessons = user_progress.lessons_completed.filter(
-                module=current_module
-            ).count()
-            
-            module_completed = (total_module_lessons > 0 and 
-                                total_module_lessons == completed_module_lessons)
-            
-            module_completion_data = {
-                'total_lessons': total_module_lessons,
-                'completed_lessons': completed_module_lessons,
-                'module_completed': module_completed
-            }
-            
-            # Cache module completion data
-            cache.set(module_completion_key, module_completion_data, 60)  # Cache for 1 minute
-        else:
-            module_completed = module_completion_data['module_completed']
-        
-        # Get quiz for this module if it exists (use cached data)
-        quiz_key = f'module_quiz_{current_module.id}'
-        module_quiz = cache.get(quiz_key)
-        
-        if module_quiz is None:
-            from quiz.models import Quiz
-            module_quiz = Quiz.objects.filter(module=current_module).first()
-            cache.set(quiz_key, module_quiz, 300)  # Cache for 5 minutes
+        # Update completed steps
+        completed_steps = step_progress.get_completed_steps(user_progress, lesson)
+        
+        # Add step if not already marked (buffered, see step_progress)
+        if step not in completed_steps:
+            step_progress.record_step(user_progress, lesson, step)
+            completed_steps.add(step)
+        
+        # Mark lesson as completed if all steps are done
+        lesson_completed = len(completed_steps) >= outline.get_step_count(lesson.id)
+        if lesson_completed and lesson.id not in completed_lesson_ids:
+            step_progress.flush_enrollment(user_progress)
+            user_progress.mark_lesson_completed(lesson)
+            completed_lesson_ids.add(lesson.id)
+        
+        # Check if all lessons in this module are completed
+        module_lesson_ids = outline.get_module_lesson_ids(lesson.module_id)
+        module_completed = bool(module_lesson_ids) and all(
+            module_lesson_id in completed_lesson_ids for module_lesson_id in module_lesson_ids
+        )
         
         # Prepare response data
+        module_quiz = outline.get_module_quiz(lesson.module_id)
         has_quiz = module_quiz is not None
-        quiz_url = reverse('quiz:quiz_detail', kwargs={'pk': module_quiz.id}) if has_quiz else None
+        quiz_url = reverse('quiz:quiz_detail', kwargs={'pk': module_quiz['id']}) if has_quiz else None
         
-        # Get next lesson URL (use cached data)
         next_lesson_url = None
-        
         if lesson_completed:
-            # Check if there's already a computed next lesson URL in cache
-            next_url_key = f'next_lesson_url_{lesson_id}_{request.user.id}'
-            next_lesson_url = cache.get(next_url_key)
-            
-            if next_lesson_url is None:
-                # Find next lesson in the same module
-                next_lesson = Lesson.objects.filter(
-                    module=current_module, 
-                    order__gt=lesson.order
-                ).order_by('order').first()
-                
-                if next_lesson:
-                    next_lesson_url = reverse('lesson-detail', kwargs={'lesson_id': next_lesson.id})
-                elif module_completed and has_quiz:
-                    next_lesson_url = quiz_url
-                else:
-                    # Try to find the first lesson in the next module
-                    next_module = Module.objects.filter(
-                        course=course, 
-                        order__gt=current_module.order
-                    ).order_by('order').first()
-                    
-                    if next_module:
-                        first_lesson_in_next_module = Lesson.objects.filter(
-                            module=next_module
-                        ).order_by('order').first()
-                        
-                        if first_lesson_in_next_module:
-                            next_lesson_url = reverse('lesson-detail', 
-                                                     kwargs={'lesson_id': first_lesson_in_next_module.id})
-                
-                # Cache the computed next URL
-                if next_lesson_url:
-                    cache.set(next_url_key, next_lesson_url, 300)  # Cache for 5 minutes
+            next_lesson_url = get_next_lesson_url(outline, lesson.id, completed_lesson_ids)
         
         # Prepare response
         result = {
@@ -63,4 +63,4 @@ class MedicalHistorySerializer(serializers.ModelSerializer):
         model = MedicalHistory
         fields = ['id', 'patient', 'patient_details', 'disease', 'disease_details', 
                  'doctor', 'doctor_details', 'status', 'status_display', 
-                 'start_date', 'end_date', 'notes'] 
\ No newline at end of file
+                 'created_at', 'updated_at'] 
\ No newline at end of file
@@ -1,3 +1,36 @@
-from django.test import TestCase
+from core import query_budgets
+from core.query_budgets import Budget
 
-# Create your tests here.
+
+class MedicalQueryBudgetTests(query_budgets.QueryBudgetTestCase):
+    urlconf = 'medical.urls'
+    url_prefix = '/medical/'
+    budgets = {
+        'api/^doctors/$': 4,
+        'api/^doctors/by_specialization/$': 2,
+        'api/^doctors/(?P<pk>[^/.]+)/$': Budget(3, pk='doctor_profile'),
+        'api/^specializations/$': 4,
+        'api/^specializations/(?P<pk>[^/.]+)/$': Budget(3, pk='specialization'),
+        'api/^patients/$': 4,
+        'api/^patients/my_profile/$': 3,
+        'api/^patients/(?P<pk>[^/.]+)/$': Budget(3, pk='patient'),
+        'api/^medical-histories/$': 6,
+        'api/^medical-histories/by_status/$': 2,
+        'api/^medical-histories/(?P<pk>[^/.]+)/$': Budget(5, pk='medical_history'),
+        'api/^diseases/$': 4,
+        'api/^diseases/(?P<pk>[^/.]+)/$': Budget(3, pk='disease'),
+        'api/': 2,
+        'dashboard/': 12,
+        'mark-as-cured/<int:history_id>/': Budget(2, history_id='medical_history'),
+    }
+
+    @classmethod
+    def seed(cls):
+        from medical.models import Disease, MedicalHistory, Specialization
+
+        super().seed()
+        cls.medical_history = MedicalHistory.objects.select_related('doctor', 'patient').order_by('pk').first()
+        cls.doctor_profile = cls.medical_history.doctor
+        cls.patient = cls.medical_history.patient
+        cls.disease = Disease.objects.order_by('pk').first()
+        cls.specialization = Specialization.objects.order_by('pk').first()
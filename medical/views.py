@@ -19,7 +19,7 @@ class SpecializationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 class DoctorViewSet(viewsets.ModelViewSet):
-    queryset = Doctor.objects.all()
+    queryset = Doctor.objects.select_related('user', 'specialization')
     serializer_class = DoctorSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -27,7 +27,7 @@ class DoctorViewSet(viewsets.ModelViewSet):
     def by_specialization(self, request):
         specialization_id = request.query_params.get('specialization_id')
         if specialization_id:
-            doctors = Doctor.objects.filter(specialization_id=specialization_id)
+            doctors = self.get_queryset().filter(specialization_id=specialization_id)
             serializer = self.get_serializer(doctors, many=True)
             return Response(serializer.data)
         return Response({"error": "Specialization ID is required"}, status=400)
@@ -44,14 +44,14 @@ class ContactViewSet(viewsets.ModelViewSet):
         return Contact.objects.filter(user=user)
 
 class PatientViewSet(viewsets.ModelViewSet):
-    queryset = Patient.objects.all()
+    queryset = Patient.objects.select_related('user')
     serializer_class = PatientSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     @action(detail=False, methods=['get'])
     def my_profile(self, request):
         try:
-            patient = Patient.objects.get(user=request.user)
+            patient = Patient.objects.select_related('user').get(user=request.user)
             serializer = self.get_serializer(patient)
             return Response(serializer.data)
         except Patient.DoesNotExist:
@@ -69,16 +69,19 @@ class MedicalHistoryViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        histories = MedicalHistory.objects.select_related(
+            'patient__user', 'disease', 'doctor__user', 'doctor__specialization'
+        )
         if user.is_staff:
-            return MedicalHistory.objects.all()
+            return histories
         
         try:
             patient = Patient.objects.get(user=user)
-            return MedicalHistory.objects.filter(patient=patient)
+            return histories.filter(patient=patient)
         except Patient.DoesNotExist:
             try:
                 doctor = Doctor.objects.get(user=user)
-                return MedicalHistory.objects.filter(doctor=doctor)
+                return histories.filter(doctor=doctor)
             except Doctor.DoesNotExist:
                 return MedicalHistory.objects.none()
     
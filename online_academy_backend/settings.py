@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',  # Query counts, Server-Timing and N+1 detection
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -66,7 +67,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.gzip.GZipMiddleware',  # Compress all responses
+    'core.middleware.FileAwareGZipMiddleware',  # Compress all responses except file downloads
 ]
 
 ROOT_URLCONF = 'online_academy_backend.urls'
@@ -162,7 +163,8 @@ LOCALE_PATHS = [
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = 'static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Both roots can be moved, the HTTP benchmark runs the app against its own work directory
+STATIC_ROOT = env('STATIC_ROOT', default=os.path.join(BASE_DIR, 'staticfiles'))
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 # Whitenoise settings for static files
@@ -181,7 +183,29 @@ WHITENOISE_MIMETYPES = {
 
 # Media files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = env('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+
+# Background threads extracting the text of uploaded materials (0 runs it inline)
+MATERIAL_EXTRACTION_WORKERS = env.int('MATERIAL_EXTRACTION_WORKERS', default=2)
+
+# Background threads rendering certificate PDFs (0 renders inline)
+CERTIFICATE_RENDER_WORKERS = env.int('CERTIFICATE_RENDER_WORKERS', default=1)
+
+# Background threads rendering resized image variants (0 renders inline)
+IMAGE_VARIANT_WORKERS = env.int('IMAGE_VARIANT_WORKERS', default=1)
+
+# Internal nginx location serving MEDIA_ROOT; when set, material downloads are
+# offloaded with X-Accel-Redirect instead of being streamed by Django
+MATERIAL_ACCEL_REDIRECT_PREFIX = env('MATERIAL_ACCEL_REDIRECT_PREFIX', default=None)
+
+# Per-request query instrumentation (core.middleware.QueryInstrumentationMiddleware).
+# A query repeated QUERY_REPEAT_THRESHOLD times in one request is reported as an N+1;
+# per-view statistics are kept for QUERY_STATS_WINDOWS minutes (manage.py query_stats)
+QUERY_INSTRUMENTATION = env.bool('QUERY_INSTRUMENTATION', default=True)
+QUERY_SERVER_TIMING = env.bool('QUERY_SERVER_TIMING', default=True)
+QUERY_REPEAT_THRESHOLD = env.int('QUERY_REPEAT_THRESHOLD', default=5)
+QUERY_STATS_FLUSH_INTERVAL = env.int('QUERY_STATS_FLUSH_INTERVAL', default=30)
+QUERY_STATS_WINDOWS = env.int('QUERY_STATS_WINDOWS', default=60)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -217,6 +241,13 @@ if not DEBUG:
         SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
         SESSION_CACHE_ALIAS = 'default'
 
+# Seconds lesson step completions are buffered before being written in one batch,
+# 0 writes every step at once. Buffering needs a cache shared by all processes
+STEP_PROGRESS_FLUSH_INTERVAL = env.int(
+    'STEP_PROGRESS_FLUSH_INTERVAL',
+    default=0 if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache' else 5
+)
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -238,7 +269,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
-        'user': '1000/day'
+        'user': '1000/day',
+        'certificate_verify': env('CERTIFICATE_VERIFY_RATE', default='60/minute'),
     },
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -40,10 +40,11 @@ class StudentAnswerInline(admin.TabularInline):
 
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
-    list_display = ('user', 'quiz', 'start_time', 'end_time', 'score', 'is_passed')
-    list_filter = ('quiz', 'is_completed', 'start_time')
+    list_display = ('user', 'quiz', 'start_time', 'end_time', 'score', 'score_percentage', 'is_passed')
+    list_filter = ('quiz', 'is_completed', 'is_passed', 'start_time')
+    list_select_related = ('user', 'quiz')
     search_fields = ('user__username', 'user__email', 'quiz__title')
-    readonly_fields = ('user', 'quiz', 'start_time', 'end_time', 'score', 'is_completed')
+    readonly_fields = ('user', 'quiz', 'start_time', 'end_time', 'score', 'score_percentage', 'is_passed', 'is_completed')
     inlines = [StudentAnswerInline]
     
     def has_add_permission(self, request):
@@ -0,0 +1,149 @@
+"""
+Compiled answer keys used to grade quiz answers.
+
+The key of a quiz maps every question to its type, points, choice IDs,
+correct choice IDs and accepted short answers, so grading an answer is a
+dictionary lookup and a set comparison. Keys are cached per quiz under the
+quiz's answer_key_version, which the signals in quiz/signals.py bump in the
+database whenever a question or choice changes. The version is read with
+the attempt being graded, so every process grades against the current key
+even with a cache that isn't shared by the processes.
+"""
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Quiz, Question, Choice
+
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 10  # 10 minutes, invalidation is handled by versions
+
+CHOICE_QUESTION_TYPES = ('single', 'multiple', 'true_false')
+
+
+def normalize_answer(text):
+    """Normalize a short answer the same way for the key and the student's text"""
+    return (text or '').strip().lower()
+
+
+class QuestionKey:
+    """Grading data of a single question"""
+
+    __slots__ = ('question_id', 'question_type', 'points', 'choice_ids', 'correct_choice_ids', 'accepted_answers')
+
+    def __init__(self, question_id, question_type, points, choice_ids, correct_choice_ids, accepted_answers):
+        self.question_id = question_id
+        self.question_type = question_type
+        self.points = points
+        self.choice_ids = choice_ids
+        self.correct_choice_ids = correct_choice_ids
+        self.accepted_answers = accepted_answers
+
+    def valid_choice_ids(self, choice_ids):
+        """Return the given choice IDs that belong to this question"""
+        selected = set()
+        for choice_id in choice_ids or []:
+            try:
+                choice_id = int(choice_id)
+            except (TypeError, ValueError):
+                continue
+            if choice_id in self.choice_ids:
+                selected.add(choice_id)
+        return frozenset(selected)
+
+    def grade(self, choice_ids=None, text_answer=None):
+        """
+        Grade an answer to this question.
+        Returns (is_correct, points_earned, valid selected choice IDs).
+        """
+        selected = self.valid_choice_ids(choice_ids)
+        is_correct = False
+
+        if self.question_type in ('single', 'true_false'):
+            # Single choice - correct if the one selected choice is correct
+            is_correct = len(selected) == 1 and selected <= self.correct_choice_ids
+        elif self.question_type == 'multiple':
+            # Multiple choice - all correct choices must be selected and no incorrect ones
+            is_correct = bool(selected) and selected == self.correct_choice_ids
+        elif self.question_type == 'short_answer':
+            is_correct = bool(text_answer) and normalize_answer(text_answer) in self.accepted_answers
+
+        return is_correct, (self.points if is_correct else 0), selected
+
+
+class AnswerKey:
+    """Answer key of a quiz"""
+
+    def __init__(self, quiz_id, questions, choices):
+        self.quiz_id = quiz_id
+
+        choices_by_question = {}
+        for choice in choices:
+            choices_by_question.setdefault(choice['question_id'], []).append(choice)
+
+        self.questions = {}
+        for question in questions:
+            question_choices = choices_by_question.get(question['id'], [])
+            correct = [choice for choice in question_choices if choice['is_correct']]
+            self.questions[question['id']] = QuestionKey(
+                question_id=question['id'],
+                question_type=question['question_type'],
+                points=question['points'],
+                choice_ids=frozenset(choice['id'] for choice in question_choices),
+                correct_choice_ids=frozenset(choice['id'] for choice in correct),
+                accepted_answers=frozenset(normalize_answer(choice['text']) for choice in correct),
+            )
+
+        self.question_ids = list(self.questions)
+
+    def __contains__(self, question_id):
+        return question_id in self.questions
+
+    def get(self, question_id):
+        try:
+            return self.questions.get(int(question_id))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def question_count(self):
+        return len(self.questions)
+
+    @property
+    def total_points(self):
+        return sum(question.points for question in self.questions.values())
+
+
+def get_answer_key_version(quiz_id):
+    """Return the current answer key version of a quiz"""
+    return Quiz.objects.filter(pk=quiz_id).values_list('answer_key_version', flat=True).first()
+
+
+def invalidate_answer_key(quiz_id):
+    """Bump the answer key version of the quiz so the cached key is rebuilt"""
+    Quiz.objects.filter(pk=quiz_id).update(answer_key_version=F('answer_key_version') + 1)
+
+
+def build_answer_key(quiz_id):
+    """Build the answer key of a quiz straight from the database"""
+    questions = Question.objects.filter(quiz_id=quiz_id).order_by('order', 'id').values(
+        'id', 'question_type', 'points'
+    )
+    choices = Choice.objects.filter(question__quiz_id=quiz_id).values('id', 'question_id', 'text', 'is_correct')
+
+    return AnswerKey(quiz_id, list(questions), list(choices))
+
+
+def get_answer_key(quiz_id, version=None):
+    """
+    Return the cached answer key of a quiz, building it if needed.
+    Pass the answer key version when the caller has already loaded the quiz.
+    """
+    if version is None:
+        version = get_answer_key_version(quiz_id)
+    cache_key = f'quiz_answer_key_{quiz_id}_{version}'
+    answer_key = cache.get(cache_key)
+
+    if answer_key is None:
+        answer_key = build_answer_key(quiz_id)
+        cache.set(cache_key, answer_key, ANSWER_KEY_CACHE_TIMEOUT)
+
+    return answer_key
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_totals(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    
+    for quiz in Quiz.objects.annotate(
+        questions_total=Count('questions'), points_total=Sum('questions__points')
+    ).iterator():
+        Quiz.objects.filter(pk=quiz.pk).update(
+            question_count=quiz.questions_total,
+            total_points=quiz.points_total or 0
+        )
+    
+    for attempt in QuizAttempt.objects.annotate(
+        answers_total=Count('answers'), points_total=Sum('answers__points_earned')
+    ).filter(answers_total__gt=0).iterator():
+        updates = {'answered_count': attempt.answers_total}
+        # Unfinished attempts now keep a running score
+        if attempt.end_time is None:
+            updates['score'] = attempt.points_total or 0
+        QuizAttempt.objects.filter(pk=attempt.pk).update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_alter_question_order_alter_question_question_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:06
+
+from django.db import migrations, models
+
+
+def fill_attempt_results(apps, schema_editor):
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    
+    for attempt in QuizAttempt.objects.filter(is_completed=True).select_related('quiz').iterator():
+        total_points = attempt.quiz.total_points
+        if not total_points or attempt.score is None:
+            continue
+        score_percentage = round((attempt.score / total_points) * 100, 2)
+        QuizAttempt.objects.filter(pk=attempt.pk).update(
+            score_percentage=score_percentage,
+            is_passed=attempt.score >= attempt.quiz.passing_score * total_points / 100.0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_quiz_totals_attempt_answered_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='is_passed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='score_percentage',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'is_passed'], name='quiz_quizat_quiz_id_021227_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'score_percentage'], name='quiz_quizat_quiz_id_7afe53_idx'),
+        ),
+        migrations.RunPython(fill_attempt_results, migrations.RunPython.noop),
+    ]
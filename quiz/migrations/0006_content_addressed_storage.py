@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:17
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_quizattempt_score_percentage_is_passed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_content_addressed_storage, upload_to='question_images/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_quiz_answer_key_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='total_points',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from core.models import CustomUser, Course, Module
+from core.storage import get_content_addressed_storage
 
 class Quiz(models.Model):
     """Quiz model with more interactive features than Test model"""
@@ -14,6 +15,12 @@ class Quiz(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True, db_index=True)
     
+    # Denormalized totals so that grading doesn't have to aggregate the questions, see refresh_totals
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    total_points = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped whenever a question or choice changes, see quiz/answer_keys.py
+    answer_key_version = models.PositiveIntegerField(default=0, editable=False)
+    
     class Meta:
         verbose_name = _('Quiz')
         verbose_name_plural = _('Quizzes')
@@ -25,13 +32,32 @@ class Quiz(models.Model):
     def __str__(self):
         return self.title
     
-    @property
-    def total_points(self):
-        return sum(question.points for question in self.questions.all())
+    # Only written by queries in the database, a stale instance must not write older values back
+    DATABASE_MAINTAINED_FIELDS = ('question_count', 'total_points', 'answer_key_version')
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DATABASE_MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def total_questions(self):
-        return self.questions.count()
+        return self.question_count
+    
+    @classmethod
+    def refresh_totals(cls, quiz_id):
+        """Re-sync the question count and total points of a quiz"""
+        from django.db.models import Count, OuterRef, Subquery, Sum
+        from django.db.models.functions import Coalesce
+        
+        questions = Question.objects.filter(quiz_id=OuterRef('pk')).order_by().values('quiz_id')
+        cls.objects.filter(pk=quiz_id).update(
+            question_count=Coalesce(Subquery(questions.annotate(total=Count('id')).values('total')), 0),
+            total_points=Coalesce(Subquery(questions.annotate(total=Sum('points')).values('total')), 0),
+        )
 
 class Question(models.Model):
     """Quiz question with different question types"""
@@ -47,7 +73,9 @@ class Question(models.Model):
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES, default='single', db_index=True)
     points = models.PositiveIntegerField(default=1)
     explanation = models.TextField(blank=True, help_text=_('Объяснение правильного ответа'))
-    image = models.ImageField(upload_to='question_images/', null=True, blank=True)
+    image = models.ImageField(
+        upload_to='question_images/', storage=get_content_addressed_storage, null=True, blank=True
+    )
     order = models.PositiveIntegerField(default=0, db_index=True)
     
     class Meta:
@@ -78,10 +106,19 @@ class QuizAttempt(models.Model):
     score = models.FloatField(null=True, blank=True)
     is_completed = models.BooleanField(default=False, db_index=True)
     
+    # Running totals, updated as each answer is stored
+    answered_count = models.PositiveIntegerField(default=0)
+    
+    # Stored when the attempt is finished so reports can filter on them in SQL
+    score_percentage = models.FloatField(default=0)
+    is_passed = models.BooleanField(default=False)
+    
     class Meta:
         indexes = [
             models.Index(fields=['quiz', 'user']),
             models.Index(fields=['user', 'is_completed']),
+            models.Index(fields=['quiz', 'is_passed']),
+            models.Index(fields=['quiz', 'score_percentage']),
         ]
     
     def __str__(self):
@@ -93,15 +130,55 @@ class QuizAttempt(models.Model):
             return (self.end_time - self.start_time).total_seconds() / 60
         return None
     
-    @property
-    def score_percentage(self):
-        if self.score is not None and self.quiz.total_points > 0:
-            return (self.score / self.quiz.total_points) * 100
-        return 0
+    def record_answers(self, count, points):
+        """
+        Add stored answers to the running totals of the attempt.
+        The update is atomic, so concurrent answers can't overwrite each other.
+        """
+        from django.db.models import F, Value
+        from django.db.models.functions import Coalesce
+        
+        QuizAttempt.objects.filter(pk=self.pk).update(
+            answered_count=F('answered_count') + count,
+            score=Coalesce(F('score'), Value(0.0)) + points
+        )
+        self.refresh_from_db(fields=['answered_count', 'score'])
     
-    @property
-    def is_passed(self):
-        return self.score_percentage >= self.quiz.passing_score if self.is_completed else False
+    def finish(self):
+        """
+        Finish the attempt with the score accumulated from its answers and store
+        its percentage and pass state.
+        Returns False if the attempt was already finished by a concurrent request.
+        """
+        from django.db.models import Case, F, Value, When
+        from django.db.models.functions import Coalesce, Round
+        from django.utils import timezone
+        
+        quiz = self.quiz
+        score = Coalesce(F('score'), Value(0.0))
+        is_completed = quiz.total_points > 0
+        
+        if is_completed:
+            score_percentage = Round(score * 100.0 / quiz.total_points, 2)
+            # Compare points rather than the rounded percentage
+            is_passed = Case(
+                When(score__gte=quiz.passing_score * quiz.total_points / 100.0, then=Value(True)),
+                default=Value(False)
+            )
+        else:
+            score_percentage = Value(0.0)
+            is_passed = Value(False)
+        
+        finished = QuizAttempt.objects.filter(pk=self.pk, end_time__isnull=True).update(
+            end_time=timezone.now(),
+            is_completed=is_completed,
+            score=score,
+            score_percentage=score_percentage,
+            is_passed=is_passed
+        )
+        if finished:
+            self.refresh_from_db(fields=['end_time', 'is_completed', 'score', 'score_percentage', 'is_passed'])
+        return bool(finished)
 
 class StudentAnswer(models.Model):
     """Student's answer to a question"""
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.serializers import ImageVariantsField
 from .models import Quiz, Question, Choice, QuizAttempt, StudentAnswer
 
 class ChoiceSerializer(serializers.ModelSerializer):
@@ -9,10 +10,11 @@ class ChoiceSerializer(serializers.ModelSerializer):
 
 class QuestionSerializer(serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, read_only=True)
+    image_variants = ImageVariantsField(source='image', variants=('small', 'medium', 'large'))
     
     class Meta:
         model = Question
-        fields = ['id', 'text', 'question_type', 'points', 'explanation', 'image', 'order', 'choices']
+        fields = ['id', 'text', 'question_type', 'points', 'explanation', 'image', 'image_variants', 'order', 'choices']
         extra_kwargs = {'explanation': {'write_only': True}}  # Hide explanation initially
 
 class ChoiceCreateSerializer(serializers.ModelSerializer):
@@ -136,28 +138,31 @@ class QuizCreateUpdateSerializer(serializers.ModelSerializer):
 
 class StudentAnswerSerializer(serializers.ModelSerializer):
     question_text = serializers.SerializerMethodField()
+    selected_choices = serializers.PrimaryKeyRelatedField(source='choices', many=True, read_only=True)
     selected_choice_texts = serializers.SerializerMethodField()
     
     class Meta:
         model = StudentAnswer
         fields = ['id', 'question', 'question_text', 'selected_choices', 'selected_choice_texts', 
-                 'text_answer', 'is_correct', 'points_earned', 'created_at']
+                 'text_answer', 'is_correct', 'points_earned']
     
     def get_question_text(self, obj):
         return obj.question.text
     
     def get_selected_choice_texts(self, obj):
-        return [choice.text for choice in obj.selected_choices.all()]
+        return [choice.text for choice in obj.choices.all()]
 
 class QuizAttemptListSerializer(serializers.ModelSerializer):
     quiz_title = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
+    # Stored with two decimals, the API keeps exposing whole percents
     score_percentage = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = QuizAttempt
         fields = ['id', 'quiz', 'quiz_title', 'user', 'user_name', 'start_time', 
                  'end_time', 'score', 'score_percentage', 'is_passed']
+        read_only_fields = ['is_passed']
     
     def get_quiz_title(self, obj):
         return obj.quiz.title
@@ -169,12 +174,14 @@ class QuizAttemptDetailSerializer(serializers.ModelSerializer):
     quiz_title = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
     answers = StudentAnswerSerializer(many=True, read_only=True)
+    # Stored with two decimals, the API keeps exposing whole percents
     score_percentage = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = QuizAttempt
         fields = ['id', 'quiz', 'quiz_title', 'user', 'user_name', 'start_time', 
                  'end_time', 'score', 'score_percentage', 'is_passed', 'answers']
+        read_only_fields = ['is_passed']
     
     def get_quiz_title(self, obj):
         return obj.quiz.title
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Quiz, Question, Choice
+from .answer_keys import invalidate_answer_key
+
+
+def schedule_answer_key_invalidation(quiz_id):
+    """Drop the cached answer key of a quiz once the current transaction commits"""
+    if quiz_id:
+        transaction.on_commit(lambda: invalidate_answer_key(quiz_id))
+
+
+def schedule_totals_refresh(quiz_id):
+    """Re-sync the question count and total points of a quiz once the current transaction commits"""
+    if quiz_id:
+        transaction.on_commit(lambda: Quiz.refresh_totals(quiz_id))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    schedule_answer_key_invalidation(instance.quiz_id)
+    schedule_totals_refresh(instance.quiz_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    quiz_id = Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    schedule_answer_key_invalidation(quiz_id)
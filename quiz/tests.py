@@ -1,3 +1,232 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 
-# Create your tests here.
+from core import query_budgets
+from core.models import Course, CustomUser
+from core.query_budgets import JSON, Budget
+from quiz.answer_keys import QuestionKey, get_answer_key, get_answer_key_version
+from quiz.models import Choice, Question, Quiz, QuizAttempt, StudentAnswer
+from quiz.serializers import QuizAttemptListSerializer
+from quiz.views import submit_all_answers
+
+
+class QuizQueryBudgetTests(query_budgets.QueryBudgetTestCase):
+    urlconf = 'quiz.urls'
+    url_prefix = '/quiz/'
+    budgets = {
+        'api/^quizzes/$': 6,
+        'api/^quizzes/(?P<pk>[^/.]+)/$': Budget(5, pk='quiz'),
+        'api/^quizzes/(?P<pk>[^/.]+)/attempts/$': Budget(6, pk='quiz'),
+        'api/^quizzes/(?P<pk>[^/.]+)/start_attempt/$': Budget({'student': 9, 'default': 8}, method='post', pk='quiz'),
+        'api/^quiz-attempts/$': 7,
+        'api/^quiz-attempts/(?P<pk>[^/.]+)/$': Budget(6, pk='attempt'),
+        'api/^quiz-attempts/(?P<pk>[^/.]+)/complete/$': Budget({'student': 12, 'default': 3}, method='post', pk='open_attempt'),
+        'api/^quiz-attempts/(?P<pk>[^/.]+)/submit_all/$': Budget({'student': 25, 'default': 3}, method='post', content_type=JSON, data=lambda test: {
+            'answers': [
+                {'question_id': question.pk, 'selected_choice_ids': [question.choices.first().pk]}
+                for question in test.quiz.questions.all()
+            ]
+        }, pk='open_attempt'),
+        'api/^quiz-attempts/(?P<pk>[^/.]+)/submit_answer/$': Budget({'student': 15, 'default': 3}, method='post', content_type=JSON, data=lambda test: {
+            'question_id': test.question.pk, 'selected_choice_ids': [test.question.choices.first().pk]
+        }, pk='open_attempt'),
+        'api/': 2,
+        '': 6,
+        '<int:pk>/': Budget(6, pk='quiz'),
+        '<int:pk>/take/': Budget({'student': 8, 'default': 9}, pk='quiz'),
+        'attempts/<int:attempt_id>/submit/': Budget({'student': 12, 'default': 3}, method='post', data=lambda test: {
+            'question_id': test.question.pk, 'choice_id': test.question.choices.first().pk
+        }, attempt_id='open_attempt'),
+        'attempts/<int:attempt_id>/submit-all/': Budget({'student': 21, 'default': 3}, method='post', data=lambda test: {
+            f'choice_ids_{question.pk}': [question.choices.first().pk] for question in test.quiz.questions.all()
+        }, attempt_id='open_attempt'),
+        'attempts/<int:attempt_id>/results/': Budget(5, attempt_id='attempt'),
+        'create/': Budget(2, known_failure='quiz/quiz_form.html is missing'),
+        '<int:pk>/edit/': Budget(7, pk='quiz'),
+        '<int:pk>/delete/': Budget(4, known_failure='quiz/delete_quiz.html is missing', pk='quiz'),
+        '<int:quiz_id>/questions/create/': Budget(4, quiz_id='quiz'),
+        'questions/<int:question_id>/edit/': Budget(4, known_failure='quiz/edit_question.html is missing', question_id='question'),
+        'questions/<int:question_id>/delete/': Budget(4, question_id='question'),
+    }
+
+
+class QuestionKeyGradeTests(SimpleTestCase):
+    def make_key(self, question_type, correct=(1,), choices=(1, 2, 3), accepted=()):
+        return QuestionKey(
+            question_id=10, question_type=question_type, points=2,
+            choice_ids=frozenset(choices), correct_choice_ids=frozenset(correct),
+            accepted_answers=frozenset(accepted)
+        )
+
+    def test_single_choice(self):
+        key = self.make_key('single')
+        self.assertEqual(key.grade(['1']), (True, 2, frozenset({1})))
+        self.assertEqual(key.grade([2]), (False, 0, frozenset({2})))
+        # Selecting the correct choice and another one is wrong
+        self.assertFalse(key.grade([1, 2])[0])
+
+    def test_multiple_choice_needs_exactly_the_correct_choices(self):
+        key = self.make_key('multiple', correct=(1, 2))
+        self.assertEqual(key.grade([2, 1]), (True, 2, frozenset({1, 2})))
+        self.assertFalse(key.grade([1])[0])
+        self.assertFalse(key.grade([1, 2, 3])[0])
+        self.assertFalse(key.grade([])[0])
+
+    def test_choices_of_other_questions_are_ignored(self):
+        key = self.make_key('single')
+        self.assertEqual(key.grade([1, 99, 'x', None]), (True, 2, frozenset({1})))
+
+    def test_short_answer_is_normalized(self):
+        key = self.make_key('short_answer', correct=(), accepted=('лейкоз',))
+        self.assertEqual(key.grade(text_answer='  Лейкоз '), (True, 2, frozenset()))
+        self.assertFalse(key.grade(text_answer='')[0])
+        self.assertFalse(key.grade(text_answer='лимфома')[0])
+
+
+class AnswerKeyVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        course = Course.objects.create(title='Course', description='', author=author)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='', course=course)
+        cls.question = Question.objects.create(quiz=cls.quiz, text='Question')
+        cls.right = Choice.objects.create(question=cls.question, text='Right', is_correct=True)
+        cls.wrong = Choice.objects.create(question=cls.question, text='Wrong')
+
+    def test_choice_change_bumps_version_in_database(self):
+        version = get_answer_key_version(self.quiz.pk)
+        self.assertTrue(get_answer_key(self.quiz.pk).get(self.question.pk).grade([self.right.pk])[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.right.is_correct = False
+            self.right.save()
+            self.wrong.is_correct = True
+            self.wrong.save()
+
+        self.assertGreater(get_answer_key_version(self.quiz.pk), version)
+        question_key = get_answer_key(self.quiz.pk).get(self.question.pk)
+        self.assertFalse(question_key.grade([self.right.pk])[0])
+        self.assertTrue(question_key.grade([self.wrong.pk])[0])
+
+
+class QuizTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        cls.student = CustomUser.objects.create_user('student', password='password')
+        course = Course.objects.create(title='Course', description='', author=author)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='', course=course)
+        cls.questions = []
+        cls.right_choices = []
+        with cls.captureOnCommitCallbacks(execute=True):
+            for points in (1, 2, 3):
+                question = Question.objects.create(quiz=cls.quiz, text='Question', points=points)
+                cls.questions.append(question)
+                cls.right_choices.append(Choice.objects.create(question=question, text='Right', is_correct=True))
+                Choice.objects.create(question=question, text='Wrong')
+
+    def test_question_changes_refresh_quiz_totals(self):
+        self.quiz.refresh_from_db()
+        self.assertEqual((self.quiz.question_count, self.quiz.total_points), (3, 6))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.questions[0].points = 4
+            self.questions[0].save()
+            self.questions[1].delete()
+
+        self.quiz.refresh_from_db()
+        self.assertEqual((self.quiz.question_count, self.quiz.total_points), (2, 7))
+
+    def test_stale_instance_does_not_write_older_totals(self):
+        stale = Quiz.objects.get(pk=self.quiz.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(quiz=self.quiz, text='Question', points=4)
+
+        stale.title = 'Renamed'
+        stale.save()
+
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        self.assertEqual(quiz.title, 'Renamed')
+        self.assertEqual((quiz.question_count, quiz.total_points), (4, 10))
+
+    def test_record_answers_adds_to_the_stored_totals(self):
+        attempt = QuizAttempt.objects.create(quiz=self.quiz, user=self.student)
+        # Another request holding the same attempt
+        stale = QuizAttempt.objects.get(pk=attempt.pk)
+
+        attempt.record_answers(1, 2)
+        stale.record_answers(2, 1.5)
+
+        self.assertEqual((stale.answered_count, stale.score), (3, 3.5))
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.answered_count, attempt.score), (3, 3.5))
+
+    def test_submit_all_keeps_earlier_answers(self):
+        attempt = QuizAttempt.objects.create(quiz=self.quiz, user=self.student)
+        StudentAnswer.objects.create(attempt=attempt, question=self.questions[0], is_correct=True, points_earned=1)
+        attempt.record_answers(1, 1)
+        answer_key = get_answer_key(self.quiz.pk)
+
+        submitted = [
+            (answer_key.get(question.pk), [choice.pk], None)
+            for question, choice in zip(self.questions, self.right_choices)
+        ]
+        self.assertTrue(submit_all_answers(attempt, submitted))
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answers.count(), 3)
+        self.assertEqual((attempt.answered_count, attempt.score), (3, 6))
+        self.assertTrue(attempt.is_completed)
+        self.assertFalse(submit_all_answers(attempt, submitted))
+
+
+class QuizAttemptFinishTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user('author', password='password', role='doctor')
+        cls.student = CustomUser.objects.create_user('student', password='password')
+        course = Course.objects.create(title='Course', description='', author=author)
+        cls.quiz = Quiz.objects.create(title='Quiz', description='', course=course, passing_score=70)
+        with cls.captureOnCommitCallbacks(execute=True):
+            for points in (1, 1, 1):
+                Question.objects.create(quiz=cls.quiz, text='Question', points=points)
+        cls.quiz.refresh_from_db()
+
+    def test_finish_stores_percentage_and_pass_state(self):
+        attempt = QuizAttempt.objects.create(quiz=self.quiz, user=self.student)
+        attempt.record_answers(3, 2)
+
+        self.assertTrue(attempt.finish())
+
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_completed)
+        self.assertEqual(attempt.score, 2)
+        self.assertEqual(attempt.score_percentage, 66.67)
+        self.assertFalse(attempt.is_passed)
+        # The API keeps exposing whole percents
+        self.assertEqual(QuizAttemptListSerializer(attempt).data['score_percentage'], 66)
+
+    def test_pass_state_compares_points(self):
+        attempt = QuizAttempt.objects.create(quiz=self.quiz, user=self.student)
+        attempt.record_answers(3, 3)
+        attempt.finish()
+        self.assertTrue(attempt.is_passed)
+        self.assertEqual(attempt.score_percentage, 100)
+
+    def test_attempt_is_finished_only_once(self):
+        attempt = QuizAttempt.objects.create(quiz=self.quiz, user=self.student)
+        attempt.record_answers(1, 1)
+        self.assertTrue(attempt.finish())
+        end_time = attempt.end_time
+
+        # A concurrent request still holding the unfinished attempt
+        stale = QuizAttempt.objects.get(pk=attempt.pk)
+        stale.end_time = None
+        self.assertFalse(stale.finish())
+        self.assertEqual(QuizAttempt.objects.get(pk=attempt.pk).end_time, end_time)
+
+    def test_finish_without_points_is_not_completed(self):
+        empty_quiz = Quiz.objects.create(title='Empty', description='', course=self.quiz.course)
+        attempt = QuizAttempt.objects.create(quiz=empty_quiz, user=self.student)
+        self.assertTrue(attempt.finish())
+        self.assertFalse(attempt.is_completed)
+        self.assertEqual(attempt.score_percentage, 0)
@@ -17,6 +17,7 @@ urlpatterns = [
     path('<int:pk>/', views.quiz_detail, name='quiz_detail'),
     path('<int:pk>/take/', views.take_quiz, name='take_quiz'),
     path('attempts/<int:attempt_id>/submit/', views.submit_answer, name='submit_answer'),
+    path('attempts/<int:attempt_id>/submit-all/', views.submit_all, name='submit_all'),
     path('attempts/<int:attempt_id>/results/', views.quiz_results, name='quiz_results'),
     
     # Quiz management
@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.db import transaction
 from django.db.models import Count, Sum, Q, Prefetch
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib import messages
 from django.utils.translation import gettext as _
 from django.urls import reverse
@@ -20,12 +20,82 @@ from .serializers import (
     QuestionCreateSerializer, QuestionSerializer, ChoiceSerializer,
     QuizAttemptListSerializer, QuizAttemptDetailSerializer, StudentAnswerSerializer
 )
-from core.models import Course, CustomUser
+from core.models import Course, CustomUser, UserProgress
 from .forms import QuizForm, QuestionForm
+from .answer_keys import get_answer_key
+
+# Helper functions
+def update_course_progress(attempt):
+    """Refresh the quiz counters of the enrollment a completed attempt belongs to"""
+    progress = UserProgress.objects.filter(
+        user_id=attempt.user_id,
+        course_id=attempt.quiz.course_id
+    ).first()
+    if progress:
+        progress.update_counters()
+
+def complete_attempt(attempt):
+    """
+    Finish an attempt and refresh the course progress of its user.
+    Returns False if the attempt was already finished by a concurrent request.
+    """
+    if not attempt.finish():
+        return False
+    
+    update_course_progress(attempt)
+    return True
+
+def submit_all_answers(attempt, submitted_answers):
+    """
+    Grade every submitted answer of an attempt in memory, store them in bulk
+    and finish the attempt, all in one transaction.
+    submitted_answers is an iterable of (question_key, choice_ids, text_answer).
+    Returns False if the attempt was already finished by a concurrent request.
+    """
+    with transaction.atomic():
+        # Lock the attempt so it can't be finished twice
+        attempt = QuizAttempt.objects.select_for_update().get(pk=attempt.pk)
+        if attempt.end_time is not None:
+            return False
+        
+        # Questions answered one by one before keep their answers
+        answered_ids = set(StudentAnswer.objects.filter(attempt=attempt).values_list('question_id', flat=True))
+        
+        answers = []
+        selected_choices = []
+        for question_key, choice_ids, text_answer in submitted_answers:
+            if question_key.question_id in answered_ids:
+                continue
+            
+            is_correct, points_earned, valid_choice_ids = question_key.grade(choice_ids, text_answer)
+            answered_ids.add(question_key.question_id)
+            answers.append(StudentAnswer(
+                attempt=attempt,
+                question_id=question_key.question_id,
+                text_answer=text_answer,
+                is_correct=is_correct,
+                points_earned=points_earned
+            ))
+            selected_choices.append(valid_choice_ids)
+        
+        StudentAnswer.objects.bulk_create(answers)
+        
+        # Selected choices go straight into the through table
+        Selection = StudentAnswer.choices.through
+        Selection.objects.bulk_create([
+            Selection(studentanswer_id=answer.id, choice_id=choice_id)
+            for answer, choice_ids in zip(answers, selected_choices)
+            for choice_id in choice_ids
+        ])
+        
+        attempt.record_answers(len(answers), sum(answer.points_earned for answer in answers))
+        complete_attempt(attempt)
+    
+    return True
 
 # API Viewsets
 class QuizViewSet(viewsets.ModelViewSet):
-    queryset = Quiz.objects.all().select_related('course', 'module')
+    queryset = Quiz.objects.all().select_related('course__author', 'module').prefetch_related('questions__choices')
     permission_classes = [IsAuthenticated]
     
     def get_serializer_class(self):
@@ -39,19 +109,19 @@ class QuizViewSet(viewsets.ModelViewSet):
         
         # If staff user, return all quizzes
         if user.is_staff:
-            return Quiz.objects.all().select_related('course', 'module')
+            return Quiz.objects.all().select_related('course__author', 'module').prefetch_related('questions__choices')
         
         # If teacher/doctor, return published quizzes + quizzes for their courses
         if user.role == 'doctor':
             return Quiz.objects.filter(
                 Q(is_published=True) |
                 Q(course__author=user)
-            ).select_related('course', 'module')
+            ).select_related('course__author', 'module').prefetch_related('questions__choices')
         
         # For students, only return published quizzes
         return Quiz.objects.filter(
             is_published=True
-        ).select_related('course', 'module')
+        ).select_related('course__author', 'module').prefetch_related('questions__choices')
     
     @action(detail=True, methods=['post'])
     def start_attempt(self, request, pk=None):
@@ -88,6 +158,12 @@ class QuizViewSet(viewsets.ModelViewSet):
             attempts = QuizAttempt.objects.filter(quiz=quiz)
         else:
             attempts = QuizAttempt.objects.filter(quiz=quiz, user=user)
+        attempts = attempts.select_related('quiz', 'user')
+        
+        # Filter by result, e.g. ?passed=1 for everyone who passed
+        passed = request.query_params.get('passed')
+        if passed is not None:
+            attempts = attempts.filter(is_completed=True, is_passed=passed in ('1', 'true'))
         
         serializer = QuizAttemptListSerializer(attempts, many=True)
         return Response(serializer.data)
@@ -98,9 +174,12 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = QuizAttempt.objects.select_related('quiz', 'user').order_by('-start_time')
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related('answers__question', 'answers__choices')
         if user.is_staff:
-            return QuizAttempt.objects.all()
-        return QuizAttempt.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
     
     def create(self, request, *args, **kwargs):
         # This endpoint is not directly accessible, use start_attempt on quiz
@@ -134,96 +213,94 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
         text_answer = request.data.get('text_answer')
         
         # Validate question belongs to quiz
-        try:
-            question = Question.objects.get(id=question_id, quiz=attempt.quiz)
-        except Question.DoesNotExist:
+        question_key = get_answer_key(attempt.quiz_id, attempt.quiz.answer_key_version).get(question_id)
+        if question_key is None:
             return Response(
                 {"detail": _("Question not found or does not belong to this quiz")}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         # Check if question was already answered
-        if StudentAnswer.objects.filter(attempt=attempt, question=question).exists():
+        if StudentAnswer.objects.filter(attempt=attempt, question_id=question_key.question_id).exists():
             return Response(
                 {"detail": _("This question was already answered")}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Grade the answer against the compiled answer key
+        is_correct, points_earned, valid_choice_ids = question_key.grade(selected_choice_ids, text_answer)
+        
         # Create the answer
         with transaction.atomic():
             answer = StudentAnswer.objects.create(
                 attempt=attempt,
-                question=question,
-                text_answer=text_answer
+                question_id=question_key.question_id,
+                text_answer=text_answer,
+                is_correct=is_correct,
+                points_earned=points_earned
             )
+            if valid_choice_ids:
+                answer.choices.add(*valid_choice_ids)
+            attempt.record_answers(1, points_earned)
             
-            # For choice-based questions
-            if question.question_type in ['single', 'multiple', 'true_false']:
-                # Get choices and add them to the answer
-                valid_choices = Choice.objects.filter(
-                    id__in=selected_choice_ids,
-                    question=question
-                )
-                answer.selected_choices.set(valid_choices)
-                
-                # Calculate if answer is correct
-                if question.question_type == 'single' or question.question_type == 'true_false':
-                    # Single choice - correct if the one selected choice is correct
-                    if valid_choices.count() == 1 and valid_choices.first().is_correct:
-                        answer.is_correct = True
-                        answer.points_earned = question.points
-                elif question.question_type == 'multiple':
-                    # Multiple choice - all correct choices must be selected and no incorrect ones
-                    all_choices = Choice.objects.filter(question=question)
-                    correct_choices = all_choices.filter(is_correct=True)
-                    
-                    # Get sets of IDs for comparison
-                    selected_ids = set(valid_choices.values_list('id', flat=True))
-                    correct_ids = set(correct_choices.values_list('id', flat=True))
-                    
-                    if selected_ids == correct_ids:
-                        answer.is_correct = True
-                        answer.points_earned = question.points
-            
-            # For short answer questions (to be evaluated manually or by exact match)
-            elif question.question_type == 'short_answer':
-                # Simple exact match validation
-                correct_choices = Choice.objects.filter(question=question, is_correct=True)
-                
-                if correct_choices.exists():
-                    # Check if text answer matches any of the correct answers
-                    for choice in correct_choices:
-                        if text_answer and text_answer.lower().strip() == choice.text.lower().strip():
-                            answer.is_correct = True
-                            answer.points_earned = question.points
-                            break
-            
-            answer.save()
-        
-        # Check if all questions have been answered
-        total_questions = attempt.quiz.questions.count()
-        answered_questions = StudentAnswer.objects.filter(attempt=attempt).count()
-        
-        if answered_questions >= total_questions:
-            # Complete the attempt
-            total_points = StudentAnswer.objects.filter(attempt=attempt).aggregate(
-                total=Sum('points_earned')
-            )['total'] or 0
-            
-            attempt.score = total_points
-            attempt.end_time = timezone.now()
-            
-            # Check if passed
-            max_points = attempt.quiz.total_points
-            if max_points > 0:
-                percentage = (total_points / max_points) * 100
-                attempt.is_completed = True
-            
-            attempt.save()
+            # Complete the attempt once all questions have been answered
+            if attempt.answered_count >= attempt.quiz.question_count:
+                complete_attempt(attempt)
         
         serializer = StudentAnswerSerializer(answer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['post'])
+    def submit_all(self, request, pk=None):
+        attempt = self.get_object()
+        user = request.user
+        
+        # Verify this attempt belongs to the user
+        if attempt.user != user:
+            return Response(
+                {"detail": _("This attempt does not belong to you")}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Verify attempt is not already completed
+        if attempt.end_time is not None:
+            return Response(
+                {"detail": _("This attempt is already completed")}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        answers_data = request.data.get('answers')
+        if not isinstance(answers_data, list):
+            return Response(
+                {"detail": _("A list of answers is required")}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validate every question belongs to quiz before grading anything
+        answer_key = get_answer_key(attempt.quiz_id, attempt.quiz.answer_key_version)
+        submitted_answers = []
+        for answer_data in answers_data:
+            question_key = answer_key.get(answer_data.get('question_id')) if isinstance(answer_data, dict) else None
+            if question_key is None:
+                return Response(
+                    {"detail": _("Question not found or does not belong to this quiz")}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            submitted_answers.append((
+                question_key,
+                answer_data.get('selected_choice_ids', []),
+                answer_data.get('text_answer')
+            ))
+        
+        if not submit_all_answers(attempt, submitted_answers):
+            return Response(
+                {"detail": _("This attempt is already completed")}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = self.get_serializer(self.reload_with_answers(attempt))
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         attempt = self.get_object()
@@ -244,24 +321,20 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
             )
         
         # Complete the attempt
-        with transaction.atomic():
-            total_points = StudentAnswer.objects.filter(attempt=attempt).aggregate(
-                total=Sum('points_earned')
-            )['total'] or 0
-            
-            attempt.score = total_points
-            attempt.end_time = timezone.now()
-            
-            # Check if passed
-            max_points = attempt.quiz.total_points
-            if max_points > 0:
-                percentage = (total_points / max_points) * 100
-                attempt.is_completed = True
-            
-            attempt.save()
+        if not complete_attempt(attempt):
+            return Response(
+                {"detail": _("This attempt is already completed")}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = self.get_serializer(attempt)
+        serializer = self.get_serializer(self.reload_with_answers(attempt))
         return Response(serializer.data)
+    
+    def reload_with_answers(self, attempt):
+        """The attempt with its stored answers loaded for the detail serializer"""
+        return QuizAttempt.objects.select_related('quiz', 'user').prefetch_related(
+            'answers__question', 'answers__choices'
+        ).get(pk=attempt.pk)
 
 # Template Views
 @login_required
@@ -283,7 +356,7 @@ def quiz_list(request):
         quizzes = quizzes.filter(course_id=course_id)
     
     if user_quizzes:
-        quizzes = quizzes.filter(author=request.user)
+        quizzes = quizzes.filter(course__author=request.user)
     
     # Get user's attempts for these quizzes
     user_attempts = QuizAttempt.objects.filter(
@@ -328,15 +401,12 @@ def quiz_detail(request, pk):
     # Get latest attempt
     latest_attempt = attempts.first()
     
-    # Get question count in one query
-    question_count = Question.objects.filter(quiz=quiz).count()
-    
     context = {
         'quiz': quiz,
         'attempts': attempts,
         'latest_attempt': latest_attempt,
         'user_role': request.user.role,
-        'question_count': question_count
+        'question_count': quiz.question_count
     }
     
     return render(request, 'quiz/quiz_detail.html', context)
@@ -386,6 +456,17 @@ def take_quiz(request, pk):
             current_question = question
             break
     
+    # Show every remaining question on one page, submitted together
+    if current_question and request.GET.get('mode') == 'all':
+        return render(request, 'quiz/take_quiz_all.html', {
+            'quiz': quiz,
+            'attempt': attempt,
+            'questions': [question for question in questions if question.id not in answered_questions],
+            'total_questions': len(questions),
+            'answered_count': len(answered_questions),
+            'user_role': request.user.role,
+        })
+    
     # If all questions are answered, show completion page
     if not current_question:
         return render(request, 'quiz/quiz_complete.html', {
@@ -415,104 +496,89 @@ def submit_answer(request, attempt_id):
     if request.method != 'POST':
         return JsonResponse({'error': _('Method not allowed')}, status=405)
     
-    attempt = get_object_or_404(QuizAttempt, pk=attempt_id, user=request.user)
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('quiz'), pk=attempt_id, user=request.user)
     
     # Ensure attempt is not already completed
     if attempt.end_time:
         return JsonResponse({'error': _('This attempt is already completed')}, status=400)
     
     # Get POST data
-    question_id = request.POST.get('question_id')
-    question = get_object_or_404(Question, pk=question_id, quiz=attempt.quiz)
+    question_key = get_answer_key(attempt.quiz_id, attempt.quiz.answer_key_version).get(request.POST.get('question_id'))
+    if question_key is None:
+        raise Http404
     
     # Check if already answered
-    if StudentAnswer.objects.filter(attempt=attempt, question=question).exists():
+    if StudentAnswer.objects.filter(attempt=attempt, question_id=question_key.question_id).exists():
         return JsonResponse({'error': _('Question already answered')}, status=400)
     
+    # Handle different question types
+    choice_ids = []
+    text_answer = None
+    
+    if question_key.question_type in ['single', 'true_false']:
+        choice_id = request.POST.get('choice_id')
+        if choice_id:
+            if not question_key.valid_choice_ids([choice_id]):
+                raise Http404
+            choice_ids = [choice_id]
+    
+    elif question_key.question_type == 'multiple':
+        choice_ids = request.POST.getlist('choice_ids')
+    
+    elif question_key.question_type == 'short_answer':
+        text_answer = request.POST.get('text_answer', '').strip()
+    
+    # Grade the answer against the compiled answer key
+    is_correct, points_earned, valid_choice_ids = question_key.grade(choice_ids, text_answer)
+    
     # Process the answer
     with transaction.atomic():
-        answer = StudentAnswer(
+        answer = StudentAnswer.objects.create(
             attempt=attempt,
-            question=question,
-            is_correct=False,
-            points_earned=0
+            question_id=question_key.question_id,
+            text_answer=text_answer,
+            is_correct=is_correct,
+            points_earned=points_earned
         )
+        if valid_choice_ids:
+            answer.choices.add(*valid_choice_ids)
+        attempt.record_answers(1, points_earned)
         
-        # Handle different question types
-        if question.question_type in ['single', 'true_false']:
-            choice_id = request.POST.get('choice_id')
-            
-            if choice_id:
-                choice = get_object_or_404(Choice, pk=choice_id, question=question)
-                answer.save()  # Save to get an ID before setting many-to-many
-                answer.choices.add(choice)
-                
-                if choice.is_correct:
-                    answer.is_correct = True
-                    answer.points_earned = question.points
-        
-        elif question.question_type == 'multiple':
-            choice_ids = request.POST.getlist('choice_ids')
-            
-            if choice_ids:
-                answer.save()  # Save to get an ID before setting many-to-many
-                
-                selected_choices = Choice.objects.filter(id__in=choice_ids, question=question)
-                answer.choices.set(selected_choices)
-                
-                # Check if all correct choices are selected and no incorrect ones
-                all_choices = Choice.objects.filter(question=question)
-                correct_choices = all_choices.filter(is_correct=True)
-                
-                selected_ids = set(selected_choices.values_list('id', flat=True))
-                correct_ids = set(correct_choices.values_list('id', flat=True))
-                
-                if selected_ids == correct_ids:
-                    answer.is_correct = True
-                    answer.points_earned = question.points
-        
-        elif question.question_type == 'short_answer':
-            text_answer = request.POST.get('text_answer', '').strip()
-            answer.text_answer = text_answer
-            
-            # Check against correct answers
-            correct_choices = Choice.objects.filter(question=question, is_correct=True)
-            
-            for choice in correct_choices:
-                if text_answer.lower() == choice.text.lower().strip():
-                    answer.is_correct = True
-                    answer.points_earned = question.points
-                    break
-        
-        answer.save()
-        
-        # Check if all questions are now answered
-        total_questions = attempt.quiz.questions.count()
-        answered_questions = StudentAnswer.objects.filter(attempt=attempt).count()
-        
-        if answered_questions >= total_questions:
-            # Complete the attempt
-            total_points = StudentAnswer.objects.filter(attempt=attempt).aggregate(
-                total=Sum('points_earned')
-            )['total'] or 0
-            
-            attempt.score = total_points
-            attempt.end_time = timezone.now()
-            
-            # Check if passed
-            max_points = attempt.quiz.total_points
-            if max_points > 0:
-                percentage = (total_points / max_points) * 100
-                attempt.is_completed = True
-            
-            attempt.save()
+        # Complete the attempt once all questions are answered
+        if attempt.answered_count >= attempt.quiz.question_count:
+            complete_attempt(attempt)
     
     # Redirect to next question or results page
-    if answered_questions >= total_questions:
+    if attempt.end_time:
         return redirect('quiz:quiz_results', attempt_id=attempt.id)
     else:
         return redirect('quiz:take_quiz', pk=attempt.quiz.id)
 
+@login_required
+def submit_all(request, attempt_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': _('Method not allowed')}, status=405)
+    
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('quiz'), pk=attempt_id, user=request.user)
+    
+    # Ensure attempt is not already completed
+    if attempt.end_time:
+        return JsonResponse({'error': _('This attempt is already completed')}, status=400)
+    
+    # Every question of the quiz is submitted at once, unanswered ones earn no points
+    submitted_answers = []
+    for question_key in get_answer_key(attempt.quiz_id, attempt.quiz.answer_key_version).questions.values():
+        question_id = question_key.question_id
+        if question_key.question_type == 'short_answer':
+            submitted_answers.append((question_key, [], request.POST.get(f'text_answer_{question_id}', '').strip()))
+        else:
+            submitted_answers.append((question_key, request.POST.getlist(f'choice_ids_{question_id}'), None))
+    
+    if not submit_all_answers(attempt, submitted_answers):
+        return JsonResponse({'error': _('This attempt is already completed')}, status=400)
+    
+    return redirect('quiz:quiz_results', attempt_id=attempt.id)
+
 @login_required
 def quiz_results(request, attempt_id):
     attempt = get_object_or_404(QuizAttempt, pk=attempt_id, user=request.user)
@@ -618,7 +684,7 @@ def edit_quiz(request, pk):
         
         quiz.save()
         messages.success(request, _("Тест успешно обновлен"))
-        return redirect('edit_quiz', pk=quiz.id)
+        return redirect('quiz:edit_quiz', pk=quiz.id)
     
     context = {
         'quiz': quiz,
@@ -713,7 +779,7 @@ def edit_question(request, question_id):
                 )
         
         messages.success(request, _("Вопрос успешно обновлен"))
-        return redirect('edit_quiz', pk=quiz.id)
+        return redirect('quiz:edit_quiz', pk=quiz.id)
     
     context = {
         'question': question,
@@ -738,7 +804,7 @@ def delete_question(request, question_id):
         question.delete()
         messages.success(request, _("Вопрос успешно удален"))
     
-    return redirect('edit_quiz', pk=quiz.id)
+    return redirect('quiz:edit_quiz', pk=quiz.id)
 
 @login_required
 def delete_quiz(request, pk):